@@ -0,0 +1,42 @@
+"""Fixtures shared by the test modules."""
+import sys
+import types
+
+import pytest
+
+
+@pytest.fixture
+def tethys_app(monkeypatch, tmp_path):
+    """Stub the tethysapp.tethysdash modules the plugin imports, with the app workspace in tmp_path.
+
+    The real VisualizationError and App.get_app_workspace() only work inside a
+    configured Tethys portal, so lightweight stand-ins are injected instead.
+
+    Returns:
+        module: the stub tethysapp.tethysdash.exceptions, holding VisualizationError
+    """
+    class VisualizationError(Exception):
+        pass
+
+    class _Workspace:
+        path = str(tmp_path)
+
+    class App:
+        @classmethod
+        def get_app_workspace(cls):
+            return _Workspace()
+
+    tethysapp = types.ModuleType("tethysapp")
+    tethysapp.__path__ = []
+    tethysdash = types.ModuleType("tethysapp.tethysdash")
+    tethysdash.__path__ = []
+    exceptions = types.ModuleType("tethysapp.tethysdash.exceptions")
+    exceptions.VisualizationError = VisualizationError
+    app_mod = types.ModuleType("tethysapp.tethysdash.app")
+    app_mod.App = App
+
+    monkeypatch.setitem(sys.modules, "tethysapp", tethysapp)
+    monkeypatch.setitem(sys.modules, "tethysapp.tethysdash", tethysdash)
+    monkeypatch.setitem(sys.modules, "tethysapp.tethysdash.exceptions", exceptions)
+    monkeypatch.setitem(sys.modules, "tethysapp.tethysdash.app", app_mod)
+    return exceptions
@@ -0,0 +1,283 @@
+"""Offline benchmarks of the plotting engines on synthetic 85-year series.
+
+These compare an engine with the implementation it replaced, check that both
+give the same answer, and report the speedup. They are deselected by default;
+run them with ``pytest -m benchmark -s``.
+"""
+import time
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+import pytest
+
+pytestmark = pytest.mark.benchmark
+
+RIVER = 760400565
+
+
+@pytest.fixture(scope="module")
+def retro_daily():
+    index = pd.date_range("1940-01-01", "2024-12-31", freq="D", tz="UTC", name="time")
+    rng = np.random.default_rng(0)
+    flows = 50 + 40 * np.sin(np.arange(len(index)) / 58.0) + rng.gamma(2, 5, len(index))
+    return pd.DataFrame({RIVER: flows}, index=index)
+
+
+def _best_of(function, repeat=5):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = function()
+        timings.append(time.perf_counter() - start)
+    return min(timings), result
+
+
+def _report(name, legacy_seconds, seconds):
+    print(f"\n{name}: legacy {legacy_seconds * 1000:.1f} ms, now {seconds * 1000:.1f} ms "
+          f"({legacy_seconds / seconds:.1f}x)")
+
+
+def _legacy_annual_status(df_retro_daily, df_retro_monthly, river_id, status_percentiles):
+    """The per-month filter and sort loops plot_retro_annual_status used before."""
+    df_daily = df_retro_daily.copy()
+    df_daily["month"] = df_daily.index.strftime("%m")
+    thresholds = []
+    for month in [f"{i:02d}" for i in range(1, 13)]:
+        values = df_daily[df_daily["month"] == month].sort_values(by=river_id, ascending=False)[river_id].to_list()
+        thresholds.append([values[int(len(values) * perc / 100)] for perc in status_percentiles])
+
+    df_monthly = df_retro_monthly.copy()
+    df_monthly["year"] = df_monthly.index.year
+    df_monthly["month"] = df_monthly.index.month
+    yearly = [
+        df_monthly[df_monthly["year"] == year].set_index("month").reindex(range(1, 13))[river_id].values
+        for year in sorted(df_monthly["year"].unique())
+    ]
+    return np.array(thresholds), np.array(yearly)
+
+
+def test_annual_status_engine(retro_daily):
+    from tethysdash_plugin_geoglows.utils.flow_statistics import monthly_status_thresholds, yearly_monthly_means
+
+    percentiles = [0, 13, 28, 72, 87]
+    retro_monthly = retro_daily.resample("MS").mean()
+
+    legacy_seconds, (legacy_thresholds, legacy_yearly) = _best_of(
+        lambda: _legacy_annual_status(retro_daily, retro_monthly, RIVER, percentiles)
+    )
+    seconds, (thresholds, yearly) = _best_of(
+        lambda: (
+            monthly_status_thresholds(retro_daily[RIVER], percentiles),
+            yearly_monthly_means(retro_monthly[RIVER]),
+        )
+    )
+    _report("retro-status thresholds + yearly pivot", legacy_seconds, seconds)
+
+    np.testing.assert_array_equal(thresholds.to_numpy(), legacy_thresholds)
+    np.testing.assert_array_equal(yearly.to_numpy(), legacy_yearly)
+    assert seconds < legacy_seconds
+
+
+def _legacy_fdc(df, river_id, percentiles):
+    """The string-month filter and sort loops plot_retro_fdc used before."""
+    percentiles_reversed = percentiles[::-1]
+
+    def sorted_array_to_percentiles(array):
+        return [array[len(array) * p // 100 - (1 if p == 100 else 0)] for p in percentiles_reversed]
+
+    df = df.copy()
+    df["month"] = df.index.strftime("%m")
+    fdc = sorted_array_to_percentiles(df.sort_values(by=river_id)[river_id].to_list())
+    monthly = [
+        sorted_array_to_percentiles(df[df["month"] == f"{m:02d}"].sort_values(by=river_id)[river_id].to_list())
+        for m in range(1, 13)
+    ]
+    return np.array([fdc] + monthly)
+
+
+def test_flow_duration_curve_engine(retro_daily):
+    from tethysdash_plugin_geoglows.utils.flow_statistics import flow_duration_curves
+
+    percentiles = [i * 2 for i in range(51)]
+    corrected = retro_daily * 1.1
+
+    legacy_seconds, legacy = _best_of(
+        lambda: [_legacy_fdc(df, RIVER, percentiles) for df in (retro_daily, corrected)]
+    )
+    seconds, curves = _best_of(
+        lambda: flow_duration_curves({"simulated": retro_daily[RIVER], "corrected": corrected[RIVER]}, percentiles)
+    )
+    _report("retro-fdc simulated + corrected", legacy_seconds, seconds)
+
+    np.testing.assert_array_equal(curves["simulated"].to_numpy(), legacy[0])
+    np.testing.assert_array_equal(curves["corrected"].to_numpy(), legacy[1])
+    assert seconds < legacy_seconds
+
+
+def _forecast_ensembles():
+    index = pd.date_range("2025-01-01", periods=241, freq="h", tz="UTC", name="time")
+    rng = np.random.default_rng(0)
+    columns = [f"ensemble_{i:02}" for i in range(1, 53)]
+    return pd.DataFrame(60 + rng.normal(0, 5, (len(index), 52)).cumsum(axis=0), index=index, columns=columns)
+
+
+@pytest.mark.parametrize("plot_name", ["retro-simulation", "forecast-ensembles", "retro-status", "retro-fdc"])
+def test_figure_serialization(retro_daily, plot_name):
+    import json
+
+    from tethysdash_plugin_geoglows.utils import bias_plots, simu_plots
+    from tethysdash_plugin_geoglows.utils.serialization import figure_to_dict
+
+    retro_monthly = retro_daily.resample("MS").mean()
+    match plot_name:
+        case "retro-simulation":
+            fig = simu_plots.plot_retro_simulation(retro_daily, retro_monthly, RIVER)
+        case "forecast-ensembles":
+            df = _forecast_ensembles()
+            fig = bias_plots.plot_forecast_ensembles_bias_corrected(df, df * 0.8)
+        case "retro-status":
+            fig = simu_plots.plot_retro_annual_status(retro_daily, retro_monthly, RIVER)
+        case "retro-fdc":
+            fig = simu_plots.plot_retro_fdc(retro_daily, RIVER, df_corrected=retro_daily * 1.1)
+
+    legacy_seconds, legacy = _best_of(lambda: json.loads(fig.to_json()))
+    seconds, result = _best_of(lambda: figure_to_dict(fig))
+    _report(f"{plot_name} figure serialization", legacy_seconds, seconds)
+
+    assert result == legacy
+    assert seconds < legacy_seconds
+
+
+def _legacy_probability_table(ensem_df, rperiods_df):
+    """The per-return-period comparisons and per-cell colors plot_flood_probabilities used before."""
+    ens = ensem_df.drop(columns=['ensemble_52'], errors='ignore').dropna()
+    ens = ens.groupby(ens.index.date).max()
+    ens.index = pd.to_datetime(ens.index).strftime('%Y-%m-%d')
+    rperiods_df = rperiods_df.T
+    percent = pd.DataFrame(
+        {rp: (ens > rperiods_df[rp].values[0]).mean(axis=1).values.tolist() for rp in rperiods_df}, index=ens.index
+    )
+    percent.index.name = 'Date'
+    percent.columns = [f'{c} Year' for c in percent.columns]
+    percent = (percent * 100).round(1).reset_index()
+    colors = {'2 Year': 'rgba(254, 240, 1, {0})', '5 Year': 'rgba(253, 154, 1, {0})',
+              '10 Year': 'rgba(255, 56, 5, {0})', '25 Year': 'rgba(255, 0, 0, {0})',
+              '50 Year': 'rgba(128, 0, 106, {0})', '100 Year': 'rgba(128, 0, 246, {0})'}
+    fill_color = [['rgba(0, 0, 0, 0)'] * len(percent)]
+    for col in percent.columns[1:]:
+        fill_color.append([colors[col].format(round(val * 0.005, 2)) for val in percent[col]])
+    return go.Table(
+        header=dict(values=list(percent.columns), fill_color='rgba(0, 0, 0, 0)'),
+        cells=dict(values=[percent[col] for col in percent.columns], fill_color=fill_color),
+        domain=dict(x=[0, 1], y=[0, 1])
+    )
+
+
+def test_flood_probability_tables():
+    from tethysdash_plugin_geoglows.utils.simu_plots import (
+        _probability_table, exceedance_probabilities, plot_flood_probabilities
+    )
+
+    index = pd.date_range("2025-01-01", periods=15 * 24, freq="h", tz="UTC", name="time")
+    rng = np.random.default_rng(1)
+    columns = [f"ensemble_{i:02}" for i in range(1, 53)]
+    ensem = pd.DataFrame(80 + rng.normal(0, 4, (len(index), 52)).cumsum(axis=0), index=index, columns=columns)
+    ensem.iloc[::3, :51] = np.nan
+    rperiods = pd.DataFrame({RIVER: [80.0, 95.0, 105.0, 118.0, 127.0, 136.0]},
+                            index=pd.Index([2, 5, 10, 25, 50, 100], name="return_period"))
+    ensembles = {"raw": ensem, "corrected": ensem * 0.9}
+    return_periods = {"raw": rperiods, "corrected": rperiods * 0.9}
+
+    legacy_seconds, legacy = _best_of(
+        lambda: [_legacy_probability_table(ensembles[name], return_periods[name]) for name in ensembles]
+    )
+    seconds, tables = _best_of(
+        lambda: [_probability_table(t) for t in exceedance_probabilities(ensembles, return_periods).values()]
+    )
+    _report("exceedance probability tables", legacy_seconds, seconds)
+
+    fig = plot_flood_probabilities(ensem, rperiods, ensem * 0.9, rperiods * 0.9)
+    for table, figure_table, legacy_table in zip(tables, fig.data, legacy):
+        for built in (table, figure_table):
+            assert built.header.values == legacy_table.header.values
+            assert [list(column) for column in built.cells.values] == [list(c) for c in legacy_table.cells.values]
+            assert built.cells.fill.color == legacy_table.cells.fill.color
+    assert len({color for column in tables[0].cells.fill.color[1:] for color in column}) > 6
+    assert seconds < legacy_seconds
+
+
+# Budget for importing both intake drivers, as TethysDash does at startup, after intake itself.
+DRIVER_IMPORT_BUDGET_SECONDS = 0.25
+HEAVY_MODULES = ("geoglows", "scipy", "plotly", "pytz", "pyproj", "pandas", "numpy")
+
+_DRIVER_IMPORT_SCRIPT = """
+import json, sys, time, types
+exceptions = types.ModuleType("tethysapp.tethysdash.exceptions")
+exceptions.VisualizationError = type("VisualizationError", (Exception,), {})
+for name in ("tethysapp", "tethysapp.tethysdash"):
+    sys.modules[name] = types.ModuleType(name)
+    sys.modules[name].__path__ = []
+sys.modules["tethysapp.tethysdash.exceptions"] = exceptions
+import intake.source.base
+start = time.perf_counter()
+from tethysdash_plugin_geoglows.map import Map
+from tethysdash_plugin_geoglows.plots import Plots
+seconds = time.perf_counter() - start
+assert Plots.visualization_args and Map.visualization_args["country"]
+print(json.dumps({"seconds": seconds, "modules": sorted(sys.modules)}))
+"""
+
+
+def test_driver_import_time():
+    import json
+    import subprocess
+    import sys
+
+    timings = []
+    for _ in range(3):
+        output = subprocess.run(
+            [sys.executable, "-c", _DRIVER_IMPORT_SCRIPT], capture_output=True, text=True, check=True
+        ).stdout
+        result = json.loads(output)
+        timings.append(result["seconds"])
+    print(f"\ndriver import: {min(timings) * 1000:.1f} ms (budget {DRIVER_IMPORT_BUDGET_SECONDS * 1000:.0f} ms)")
+
+    loaded = {module.split(".")[0] for module in result["modules"]}
+    assert not loaded.intersection(HEAVY_MODULES)
+    assert min(timings) < DRIVER_IMPORT_BUDGET_SECONDS
+
+
+# Most a span may add while tracing is off; the fastest plot opens a few dozen in ~10 ms.
+DISABLED_SPAN_BUDGET_SECONDS = 1e-6
+
+
+def test_disabled_tracing_overhead(retro_daily):
+    from tethysdash_plugin_geoglows.utils import tracing
+    from tethysdash_plugin_geoglows.utils.simu_plots import plot_retro_fdc
+
+    calls = 100_000
+
+    def spans():
+        for _ in range(calls):
+            with tracing.span("cache.read", dataset="retro-daily") as trace:
+                trace.set_attribute("cache", "memory")
+
+    def bare():
+        for _ in range(calls):
+            pass
+
+    previous = tracing.set_span_sink(None)
+    try:
+        bare_seconds, _ = _best_of(bare)
+        disabled_seconds, _ = _best_of(spans)
+        tracing.set_span_sink(lambda span: None)
+        enabled_seconds, _ = _best_of(spans)
+        plot_seconds, _ = _best_of(lambda: plot_retro_fdc(retro_daily, RIVER))
+    finally:
+        tracing.set_span_sink(previous)
+    per_span = (disabled_seconds - bare_seconds) / calls
+    print(f"\nspan overhead: off {per_span * 1e9:.0f} ns, on {(enabled_seconds - bare_seconds) / calls * 1e9:.0f} ns "
+          f"(retro-fdc plot {plot_seconds * 1000:.1f} ms)")
+
+    assert per_span < DISABLED_SPAN_BUDGET_SECONDS
@@ -0,0 +1,66 @@
+"""Shape and size tests for the bias corrected plot builders."""
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+MEMBERS = [f"ensemble_{i:02}" for i in range(1, 53)]
+
+
+def _forecast_ensembles(seed=0):
+    index = pd.date_range("2025-01-01", periods=85, freq="3h", tz="UTC", name="time")
+    flows = np.random.default_rng(seed).gamma(4.0, 25.0, size=(len(index), len(MEMBERS)))
+    df = pd.DataFrame(flows, index=index, columns=MEMBERS)
+    # members 01-51 stop at day 10 while the high-resolution member 52 runs on hourly steps
+    df.iloc[::2, :51] = np.nan
+    df.iloc[3, 7] = np.nan
+    return df
+
+
+def _trace_json_size(fig):
+    return len(json.dumps(json.loads(fig.to_json())["data"]))
+
+
+def test_compact_ensemble_packs_members_into_one_trace():
+    from tethysdash_plugin_geoglows.utils.bias_plots import plot_forecast_ensembles_bias_corrected
+
+    df = _forecast_ensembles()
+    members = plot_forecast_ensembles_bias_corrected(df, df * 0.8)
+    compact = plot_forecast_ensembles_bias_corrected(df, df * 0.8, ensemble_mode="compact")
+
+    assert len(members.data) == 104
+    assert [trace.name for trace in compact.data] == ["Simulated Ensemble", None, "Bias-Corrected Ensemble", None]
+    packed = compact.data[1]
+    # every member drawn without its NaNs and ended by one gap
+    assert len(packed.y) == df.iloc[:, :51].count().sum() + 51
+    assert np.isnan(packed.y).sum() == 51
+    segment = np.asarray(packed.y[:np.flatnonzero(np.isnan(packed.y))[0]])
+    np.testing.assert_array_equal(segment, df["ensemble_01"].dropna().to_numpy())
+    assert compact.layout.yaxis.range == members.layout.yaxis.range
+    # the same points, without the per-trace styling of 102 member traces
+    assert _trace_json_size(compact) < _trace_json_size(members)
+
+
+def test_summary_ensemble_draws_percentile_bands():
+    from tethysdash_plugin_geoglows.utils.bias_plots import plot_forecast_ensembles
+
+    df = _forecast_ensembles()
+    fig = plot_forecast_ensembles(df, ensemble_mode="summary")
+
+    assert [trace.name for trace in fig.data] == [
+        None, "Simulated Ensemble Min-Max", None, "Simulated Ensemble 25-75%",
+        "Simulated Ensemble Median", "Simulated Ensemble",
+    ]
+    members = df.iloc[:, :51].dropna(how="all")
+    np.testing.assert_allclose(fig.data[0].y, members.max(axis=1))
+    np.testing.assert_allclose(fig.data[1].y, members.min(axis=1))
+    np.testing.assert_allclose(fig.data[4].y, members.median(axis=1))
+    assert fig.data[1].fill == "tonexty" and fig.data[3].fill == "tonexty"
+
+
+def test_unknown_ensemble_mode_raises():
+    from tethysdash_plugin_geoglows.utils.bias_plots import plot_forecast_ensembles
+
+    with pytest.raises(ValueError):
+        plot_forecast_ensembles(_forecast_ensembles(), ensemble_mode="spaghetti")
@@ -0,0 +1,222 @@
+"""Unit tests for the plot data cache building blocks."""
+import threading
+from datetime import datetime, timedelta, timezone
+
+import pandas as pd
+import pytest
+from unittest.mock import MagicMock
+
+from tethysdash_plugin_geoglows.utils.memory_cache import FrameCache, frame_nbytes
+
+
+def _frame(rows=100, value=1.0):
+    return pd.DataFrame({12345: [value] * rows})
+
+
+def test_frame_cache_evicts_least_recently_used_to_fit_budget():
+    size = frame_nbytes(_frame())
+    cache = FrameCache(max_bytes=size * 2)
+    cache.put("a", _frame())
+    cache.put("b", _frame())
+    cache.get("a")  # "b" is now the least recently used
+
+    cache.put("c", _frame())
+
+    assert "a" in cache and "c" in cache and "b" not in cache
+    assert cache.nbytes == size * 2
+    assert cache.evictions == 1
+
+
+def test_frame_cache_skips_frames_larger_than_budget():
+    cache = FrameCache(max_bytes=frame_nbytes(_frame()) - 1)
+    cache.put("a", _frame())
+    assert len(cache) == 0 and cache.get("a") is None
+
+
+def test_frame_cache_returns_independent_copies():
+    cache = FrameCache(max_bytes=1 << 20)
+    original = _frame()
+    cache.put("a", original)
+    original.iloc[0, 0] = -1.0
+
+    served = cache.get("a")
+    served.iloc[0, 0] = -2.0
+    served["month"] = 1
+
+    assert cache.get("a").equals(_frame())
+
+
+def test_frame_cache_is_consistent_under_concurrent_puts():
+    size = frame_nbytes(_frame())
+    cache = FrameCache(max_bytes=size * 8)
+
+    def worker(offset):
+        for i in range(200):
+            cache.put((offset, i % 16), _frame())
+            cache.get((offset, (i + 3) % 16))
+
+    threads = [threading.Thread(target=worker, args=(n,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(cache) == 8
+    assert cache.nbytes == size * 8
+
+
+def test_catalog_records_exact_entries_in_sharded_layout(tmp_path):
+    from tethysdash_plugin_geoglows.utils.cache_catalog import CacheCatalog
+
+    catalog = CacheCatalog(str(tmp_path))
+    path = catalog.entry_path("forecast", 760400565, "20250101", ".parquet")
+    assert path == str(tmp_path / "565" / "760400565" / "forecast-20250101.parquet")
+    (tmp_path / "565" / "760400565").mkdir(parents=True)
+    with open(path, "wb") as file:
+        file.write(b"1234")
+
+    catalog.record("forecast", 760400565, path, "20250101")
+
+    entry = catalog.lookup("forecast", 760400565)
+    assert (entry.path, entry.version, entry.nbytes) == (path, "20250101", 4)
+    assert catalog.lookup("forecast", 76040056) is None
+    assert catalog.lookup("forecast-stats", 760400565) is None
+    catalog.remove("forecast", 760400565)
+    assert catalog.lookup("forecast", 760400565) is None
+
+
+def _entry(version, fetched_at):
+    from tethysdash_plugin_geoglows.utils.cache_catalog import CatalogEntry
+
+    return CatalogEntry("retro-daily", 12345, "unused", version, fetched_at, 0)
+
+
+def test_ttl_policy_expires_on_age_and_on_source_change(monkeypatch):
+    from tethysdash_plugin_geoglows.utils.freshness import get_freshness_policy
+
+    monkeypatch.setenv("GEOGLOWS_PLOTS_TTL_DAYS_RETRO_DAILY", "2")
+    policy = get_freshness_policy("retro-daily")
+    now = datetime(2025, 3, 1, tzinfo=timezone.utc)
+    entry = _entry(policy.new_version(now, None), now.timestamp())
+
+    assert policy.is_fresh(entry, now + timedelta(days=1))
+    assert not policy.is_fresh(entry, now + timedelta(days=2))
+
+    monkeypatch.setenv("PYGEOGLOWS_RETRO_DAILY_URI", "s3://example/retrospective/daily-v3.zarr")
+    assert not policy.is_fresh(entry, now + timedelta(hours=1))
+
+
+def _forecast_frame(cycle):
+    index = pd.date_range(cycle, periods=4, freq="3h", tz="UTC", name="time")
+    return pd.DataFrame({"flow_median": [1.0, 2.0, 3.0, 4.0]}, index=index)
+
+
+@pytest.fixture
+def published_cycles(monkeypatch):
+    """Stub geoglows.data.dates and reset the process-wide cycle memo."""
+    from tethysdash_plugin_geoglows.utils import freshness
+
+    monkeypatch.setitem(freshness._latest_cycle, "checked_at", None)
+    monkeypatch.setitem(freshness._latest_cycle, "cycle", None)
+    dates_spy = MagicMock(return_value=pd.DataFrame({"dates": ["2025030200", "2025030100"]}))
+    monkeypatch.setattr(freshness.geoglows.data, "dates", dates_spy, raising=False)
+    return dates_spy
+
+
+def test_forecast_policy_versions_by_issuance_cycle(published_cycles):
+    from tethysdash_plugin_geoglows.utils.freshness import get_freshness_policy
+
+    policy = get_freshness_policy("forecast")
+    just_after_midnight = datetime(2025, 3, 2, 0, 30, tzinfo=timezone.utc)
+
+    assert policy.new_version(just_after_midnight, _forecast_frame("2025-03-01")) == "2025030100"
+
+
+def test_forecast_policy_rechecks_only_once_a_newer_cycle_is_due(published_cycles):
+    from tethysdash_plugin_geoglows.utils.freshness import get_freshness_policy
+
+    policy = get_freshness_policy("forecast")
+    entry = _entry("2025030100", 0)
+
+    assert policy.is_fresh(entry, datetime(2025, 3, 1, 23, tzinfo=timezone.utc))
+    published_cycles.assert_not_called()
+    assert not policy.is_fresh(entry, datetime(2025, 3, 2, 9, tzinfo=timezone.utc))
+    assert policy.is_fresh(_entry("2025030200", 0), datetime(2025, 3, 3, 1, tzinfo=timezone.utc))
+    published_cycles.assert_called_once()  # answer is memoized for the recheck interval
+
+
+def test_prefetch_runs_loaders_concurrently():
+    from tethysdash_plugin_geoglows.utils.prefetch import prefetch
+
+    barrier = threading.Barrier(3, timeout=5)
+
+    def loader(value):
+        barrier.wait()  # only passes if all three loaders run at the same time
+        return value
+
+    results = prefetch({name: (lambda name=name: loader(name)) for name in "abc"}, max_workers=3)
+
+    assert results == {"a": "a", "b": "b", "c": "c"}
+
+
+def test_prefetch_reuses_one_pool_across_calls():
+    from tethysdash_plugin_geoglows.utils.prefetch import prefetch
+
+    threads = set()
+    for _ in range(5):
+        threads.update(prefetch({"a": threading.current_thread, "b": threading.current_thread}, max_workers=2).values())
+
+    assert len(threads) <= 2 and threading.current_thread() not in threads
+
+
+def test_prefetch_times_out_slow_loaders():
+    from tethysdash_plugin_geoglows.utils.prefetch import PrefetchTimeoutError, prefetch
+
+    release = threading.Event()
+    with pytest.raises(PrefetchTimeoutError) as excinfo:
+        prefetch({"fast": lambda: 1, "slow": release.wait}, max_workers=2, timeout=0.05)
+    release.set()
+
+    assert excinfo.value.name == "slow"
+
+
+def test_single_flight_waits_for_a_lock_held_by_another_process(tmp_path):
+    import fcntl
+
+    from tethysdash_plugin_geoglows.utils.single_flight import single_flight
+
+    lock_path = str(tmp_path / ".retro-daily.lock")
+    entered = threading.Event()
+
+    def worker():
+        with single_flight(lock_path):
+            entered.set()
+
+    # flock locks belong to the open file, so a second handle in this process
+    # contends exactly like another worker process would.
+    with open(lock_path, "a") as other_process:
+        fcntl.flock(other_process, fcntl.LOCK_EX)
+        thread = threading.Thread(target=worker)
+        thread.start()
+        assert not entered.wait(0.2)
+        fcntl.flock(other_process, fcntl.LOCK_UN)
+    thread.join(5)
+
+    assert entered.is_set()
+
+
+def test_cache_stats_are_dumped_at_most_once_per_interval(monkeypatch):
+    from tethysdash_plugin_geoglows.utils import cache_stats
+
+    dump_spy = MagicMock()
+    monkeypatch.setattr(cache_stats, "dump_cache_stats", dump_spy)
+    monkeypatch.setitem(cache_stats._last_dump, "at", 0.0)
+
+    monkeypatch.setattr(cache_stats, "_dump_interval", 0)
+    cache_stats.dump_cache_stats_if_due("/cache")
+    assert dump_spy.call_count == 0
+
+    monkeypatch.setattr(cache_stats, "_dump_interval", 60)
+    cache_stats.dump_cache_stats_if_due("/cache")
+    cache_stats.dump_cache_stats_if_due("/cache")
+    dump_spy.assert_called_once_with("/cache")
@@ -0,0 +1,53 @@
+"""Min/max decimation and date-range clipping of long retrospective series."""
+import numpy as np
+import pandas as pd
+import pytest
+
+from tethysdash_plugin_geoglows.utils.decimation import clip_to_range, decimate, minmax_indices, parse_date_range
+
+
+def _daily(years=85):
+    index = pd.date_range("1940-01-01", periods=365 * years, freq="D", tz="UTC", name="time")
+    flows = 50 + 40 * np.sin(np.arange(len(index)) / 58.0) + np.random.default_rng(0).gamma(2, 5, len(index))
+    return pd.Series(flows, index=index)
+
+
+def test_decimate_keeps_every_bucket_extreme():
+    series = _daily()
+    series.iloc[12_345] = 5_000.0
+
+    thinned = decimate(series, 1_000)
+
+    assert len(thinned) <= 1_000
+    assert thinned.index.is_monotonic_increasing
+    assert thinned.index[0] == series.index[0] and thinned.index[-1] == series.index[-1]
+    assert thinned.max() == series.max() == 5_000.0 and thinned.min() == series.min()
+    pd.testing.assert_series_equal(thinned, series.loc[thinned.index])
+
+
+def test_decimate_leaves_short_series_alone():
+    series = _daily(1)
+
+    assert decimate(series, 4_000) is series
+    assert decimate(series, None) is series
+
+
+def test_all_nan_bucket_keeps_a_gap():
+    values = np.arange(100, dtype=float)
+    values[40:60] = np.nan
+
+    positions = minmax_indices(values, 12)
+
+    assert np.isnan(values[positions]).any()
+
+
+def test_clip_to_range_takes_naive_bounds_in_the_frame_zone():
+    df = _daily(3).to_frame()
+
+    window = clip_to_range(df, parse_date_range("1941-02-01, 1941-02-28"))
+
+    assert len(window) == 28
+    assert clip_to_range(df, parse_date_range(",1940-01-10")).index[-1] == pd.Timestamp("1940-01-10", tz="UTC")
+    assert parse_date_range("") is None
+    with pytest.raises(ValueError):
+        parse_date_range("1941-03-01,1941-02-01")
@@ -0,0 +1,74 @@
+"""Unit tests for the array-based monthly flow statistics."""
+import numpy as np
+import pandas as pd
+
+
+def _daily(years=3, seed=0):
+    index = pd.date_range("2000-01-01", periods=365 * years, freq="D", tz="UTC")
+    return pd.Series(np.random.default_rng(seed).gamma(2, 10, len(index)), index=index)
+
+
+def test_status_thresholds_match_a_per_month_sort():
+    from tethysdash_plugin_geoglows.utils.flow_statistics import monthly_status_thresholds
+
+    series = _daily()
+    percentiles = [0, 13, 28, 72, 87]
+
+    thresholds = monthly_status_thresholds(series, percentiles)
+
+    for month in (1, 2, 12):
+        values = series[series.index.month == month].sort_values(ascending=False).to_list()
+        expected = [values[int(len(values) * perc / 100)] for perc in percentiles]
+        assert thresholds.loc[month].tolist() == expected
+
+
+def test_months_without_data_are_nan():
+    from tethysdash_plugin_geoglows.utils.flow_statistics import monthly_status_thresholds
+
+    series = _daily(years=1).loc["2000-03-01":"2000-05-31"]
+
+    thresholds = monthly_status_thresholds(series, [0, 50])
+
+    assert thresholds.loc[[3, 4, 5]].notna().all().all()
+    assert thresholds.drop(index=[3, 4, 5]).isna().all().all()
+
+
+def test_yearly_monthly_means_pivots_years_by_month():
+    from tethysdash_plugin_geoglows.utils.flow_statistics import yearly_monthly_means
+
+    monthly = _daily(years=2).resample("MS").mean().loc["2000-02-01":]
+
+    table = yearly_monthly_means(monthly)
+
+    assert list(table.columns) == list(range(1, 13))
+    assert np.isnan(table.loc[2000, 1])
+    assert table.loc[2001, 7] == monthly.loc["2001-07-01"]
+
+
+def test_flow_duration_curve_matches_sorted_positions():
+    from tethysdash_plugin_geoglows.utils.flow_statistics import flow_duration_curve
+
+    series = _daily(seed=3)
+    exceedance = [0, 2, 50, 98, 100]
+
+    curve = flow_duration_curve(series, exceedance)
+
+    def expected(values):
+        values = sorted(values)
+        return [values[len(values) * (100 - p) // 100 - (1 if p == 0 else 0)] for p in exceedance]
+
+    assert curve.loc[0].tolist() == expected(series.to_list())
+    for month in (1, 6, 12):
+        assert curve.loc[month].tolist() == expected(series[series.index.month == month].to_list())
+    assert curve.loc[0, 0] == series.max() and curve.loc[0, 100] == series.min()
+
+
+def test_flow_duration_curves_keep_each_series_period():
+    from tethysdash_plugin_geoglows.utils.flow_statistics import flow_duration_curve, flow_duration_curves
+
+    simulated = _daily(seed=4)
+    corrected = simulated.loc["2001-01-01":] * 2
+
+    curves = flow_duration_curves({"simulated": simulated, "corrected": corrected}, [0, 50, 100])
+
+    pd.testing.assert_frame_equal(curves["corrected"], flow_duration_curve(corrected, [0, 50, 100]))
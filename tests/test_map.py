@@ -0,0 +1,47 @@
+"""Map extents and per-country map configs are built without per-request I/O."""
+import builtins
+import json
+
+import pytest
+
+from tethysdash_plugin_geoglows.map import Map
+from tethysdash_plugin_geoglows.utils.map import convert_4326_to_3857, load_map_config, load_map_extents
+
+
+def _streamflow_params(config):
+    (layer,) = [layer for layer in config["layers"] if layer["configuration"]["props"]["name"] == "Geoglows Streamflow"]
+    return layer["configuration"]["props"]["source"]["props"]["params"]
+
+
+def test_read_filters_the_streamflow_layer_without_touching_the_template(monkeypatch):
+    template = json.dumps(load_map_config())
+    monkeypatch.setattr(builtins, "open", lambda *args, **kwargs: pytest.fail("Map.read() opened a file"))
+
+    peru = Map("Peru").read()
+    everywhere = Map("All Countries").read()
+
+    assert _streamflow_params(peru)["LAYERDEFS"] == "0: rivercountry='Peru'"
+    assert _streamflow_params(everywhere)["LAYERDEFS"] == ""
+    assert json.dumps(load_map_config()) == template
+    assert list(peru) == list(load_map_config())
+
+
+def test_changing_a_result_does_not_change_later_reads():
+    peru = Map("Peru").read()
+    expected = json.dumps(peru)
+    _streamflow_params(peru)["LAYERDEFS"] = "0: rivercountry='Chile'"
+    for layer in peru["layers"]:
+        layer["configuration"]["props"]["name"] = "changed"
+    peru["layers"].append({"configuration": {}})
+
+    assert json.dumps(Map("Peru").read()) == expected
+
+
+def test_map_extents_match_single_point_conversion():
+    lon_min, lat_min, lon_max, lat_max = Map.country_extents["Peru"]
+    x, y = convert_4326_to_3857((lon_min + lon_max) / 2, (lat_min + lat_max) / 2)
+
+    assert Map("Peru").get_map_extent() == f"{x},{y},6"
+    assert Map("All Countries").get_map_extent() == Map("Atlantis").get_map_extent() == "0, 2273030.9269876895,2"
+    with pytest.raises(TypeError):
+        load_map_extents()["Peru"] = "0,0,1"
@@ -0,0 +1,234 @@
+"""Offline benchmarks of every plot through Plots.read() on synthetic GEOGLOWS-shaped data.
+
+Each plot_name x bias_correction combination is built from realistic frames
+(an 85-year daily retrospective, 52-member ensembles, forecast statistics and
+return periods) with get_plot_data and the Global discharge transform stubbed,
+so nothing touches the network. Every combination is timed (best of a few cold
+reads) and memory-profiled with tracemalloc, and compared against
+plot_benchmark_baseline.json, so a slower or heavier plot shows up as a failing
+benchmark and as a diff of that file in review.
+
+They are deselected by default; run them with ``pytest -m benchmark -s``.
+After an intended change, rewrite the baseline with
+``GEOGLOWS_PLOTS_BENCHMARK_UPDATE=1 pytest -m benchmark tests/test_plot_benchmarks.py``
+and commit it with the change.
+"""
+import importlib
+import json
+import os
+import shutil
+import sys
+import time
+import tracemalloc
+
+import geoglows
+import numpy as np
+import pandas as pd
+import pytest
+
+from tethysdash_plugin_geoglows.utils import plot_data
+from tethysdash_plugin_geoglows.utils.memory_cache import frame_cache
+
+pytestmark = pytest.mark.benchmark
+
+RIVER = 760400565
+BASELINE_PATH = os.path.join(os.path.dirname(__file__), "plot_benchmark_baseline.json")
+UPDATE_BASELINE_ENV = "GEOGLOWS_PLOTS_BENCHMARK_UPDATE"
+BIAS_CORRECTIONS = ("None", "Local", "Global")
+REPEAT = 3
+# a run fails when it is this much slower or heavier than the baseline, plus
+# an absolute slack so that millisecond plots do not fail on timer noise
+TIME_TOLERANCE = 1.5
+TIME_SLACK_SECONDS = 0.05
+MEMORY_TOLERANCE = 1.25
+MEMORY_SLACK_MB = 2.0
+# the serialized size may move a little with float formatting across library versions
+SIZE_TOLERANCE = 0.02
+RETURN_PERIODS = [2, 5, 10, 25, 50, 100]
+PLOT_NAMES = (
+    "forecast", "forecast-stats", "forecast-ensembles", "exceedance", "retro-simulation", "retro-daily",
+    "retro-monthly", "retro-yearly", "retro-yearly-volume", "retro-status", "retro-fdc", "ssi-monthly",
+    "ssi-one-month", "bias-performance",
+)
+
+
+def _retro_daily(rng):
+    index = pd.date_range("1940-01-01", "2024-12-31", freq="D", tz="UTC", name="time")
+    seasonal = 50 + 40 * np.sin(2 * np.pi * index.dayofyear.to_numpy() / 365.25)
+    flows = seasonal + rng.gamma(2, 5, len(index)) + 0.002 * np.arange(len(index))
+    df = pd.DataFrame({RIVER: flows}, index=index)
+    df.columns.name = "river_id"
+    return df
+
+
+def _forecast_ensembles(rng):
+    """15 days of 52 members: 51 are 3-hourly for 6 days then 6-hourly, the high-res one 3-hourly for 10 days."""
+    index = pd.date_range("2025-03-01", periods=15 * 8 + 1, freq="3h", tz="UTC", name="time")
+    columns = [f"ensemble_{i:02d}" for i in range(1, 53)]
+    flows = 60 + rng.normal(0, 3, (len(index), 52)).cumsum(axis=0)
+    df = pd.DataFrame(np.abs(flows), index=index, columns=columns)
+    coarse = (index >= index[0] + pd.Timedelta(days=6)) & (index.hour % 6 != 0)
+    df.iloc[coarse, :51] = np.nan
+    df.iloc[index >= index[0] + pd.Timedelta(days=10), 51] = np.nan
+    return df
+
+
+def _forecast_stats(ensembles):
+    members = ensembles.iloc[:, :51]
+    return pd.DataFrame({
+        "flow_max": members.max(axis=1),
+        "flow_75p": members.quantile(0.75, axis=1),
+        "flow_avg": members.mean(axis=1),
+        "flow_med": members.median(axis=1),
+        "flow_25p": members.quantile(0.25, axis=1),
+        "flow_min": members.min(axis=1),
+        "high_res": ensembles["ensemble_52"],
+    })
+
+
+def _forecast(ensembles):
+    members = ensembles.iloc[:, :51]
+    return pd.DataFrame({
+        "flow_uncertainty_upper": members.quantile(0.8, axis=1),
+        "flow_median": members.median(axis=1),
+        "flow_uncertainty_lower": members.quantile(0.2, axis=1),
+    })
+
+
+def _return_periods(retro_daily):
+    annual_max = retro_daily[RIVER].groupby(retro_daily.index.year).max()
+    flows = [annual_max.quantile(1 - 1 / rp) for rp in RETURN_PERIODS]
+    return pd.DataFrame({RIVER: flows}, index=pd.Index(RETURN_PERIODS, name="return_period"))
+
+
+def _observed_json(retro_daily, rng):
+    """30 years of a gauge reading about 10% under the simulation, with a few gaps."""
+    observed = retro_daily.loc["1990":"2019", RIVER] * 0.9 + rng.normal(0, 2, len(retro_daily.loc["1990":"2019"]))
+    observed = observed[rng.random(len(observed)) > 0.02]
+    return json.dumps({
+        "Datetime": observed.index.strftime("%Y-%m-%d").tolist(),
+        "Streamflow (m3/s)": observed.round(3).tolist(),
+    })
+
+
+@pytest.fixture(scope="module")
+def synthetic():
+    """The datasets get_plot_data serves, keyed by product name, and an observed record."""
+    rng = np.random.default_rng(0)
+    retro_daily = _retro_daily(rng)
+    ensembles = _forecast_ensembles(rng)
+    datasets = {
+        "retro-daily": retro_daily,
+        "retro-monthly": retro_daily.resample("MS").mean(),
+        "retro-yearly": retro_daily.resample("YS").mean(),
+        "forecast": _forecast(ensembles),
+        "forecast-stats": _forecast_stats(ensembles),
+        "forecast-ensembles": ensembles,
+        "return-periods": _return_periods(retro_daily),
+    }
+    return datasets, _observed_json(retro_daily, rng)
+
+
+@pytest.fixture(scope="module")
+def results():
+    """Measurements of this run, written over the baseline at the end when updating."""
+    measured = {}
+    yield measured
+    if os.environ.get(UPDATE_BASELINE_ENV) and measured:
+        baseline = _load_baseline()
+        baseline.update(measured)
+        with open(BASELINE_PATH, "w") as file:
+            json.dump(dict(sorted(baseline.items())), file, indent=2)
+            file.write("\n")
+
+
+def _load_baseline():
+    if not os.path.exists(BASELINE_PATH):
+        return {}
+    with open(BASELINE_PATH) as file:
+        return json.load(file)
+
+
+@pytest.fixture
+def plots(monkeypatch, tethys_app, synthetic):
+    """The plots module with tethysapp stubbed and the data layer serving the synthetic frames."""
+    monkeypatch.delitem(sys.modules, "tethysdash_plugin_geoglows.plots", raising=False)
+    module = importlib.import_module("tethysdash_plugin_geoglows.plots")
+
+    datasets, _observed = synthetic
+    monkeypatch.setattr(plot_data, "get_plot_data", lambda river_id, kind="forecast": datasets[kind].copy())
+    # the real transform downloads a table of flow corrections for the river
+    monkeypatch.setattr(geoglows.bias, "discharge_transform", lambda df, river_id: df * 1.1)
+    return module
+
+
+def _cold_read(workspace, reader):
+    """Read with the memory and disk caches empty, so corrections are computed every time."""
+    frame_cache.clear()
+    shutil.rmtree(workspace, ignore_errors=True)
+    os.makedirs(workspace)
+    return reader.read()
+
+
+def _measure(workspace, reader):
+    seconds = []
+    for _ in range(REPEAT):
+        start = time.perf_counter()
+        result = _cold_read(workspace, reader)
+        seconds.append(time.perf_counter() - start)
+    tracemalloc.start()
+    try:
+        _cold_read(workspace, reader)
+        _current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+        frame_cache.clear()
+    return {
+        "seconds": round(min(seconds), 4),
+        "peak_mb": round(peak / 2 ** 20, 2),
+        "traces": len(result["data"]),
+        "json_bytes": len(json.dumps(result)),
+    }
+
+
+def _regressions(measured, expected):
+    """Human-readable differences of a measurement from its baseline entry."""
+    if "error" in measured or "error" in expected:
+        return [] if measured.get("error") == expected.get("error") else [f"{expected} became {measured}"]
+    problems = []
+    if measured["traces"] != expected["traces"]:
+        problems.append(f"{measured['traces']} traces, baseline {expected['traces']}")
+    if abs(measured["json_bytes"] - expected["json_bytes"]) > SIZE_TOLERANCE * expected["json_bytes"]:
+        problems.append(f"{measured['json_bytes']} JSON bytes, baseline {expected['json_bytes']}")
+    if measured["seconds"] > expected["seconds"] * TIME_TOLERANCE + TIME_SLACK_SECONDS:
+        problems.append(f"{measured['seconds']} s, baseline {expected['seconds']} s")
+    if measured["peak_mb"] > expected["peak_mb"] * MEMORY_TOLERANCE + MEMORY_SLACK_MB:
+        problems.append(f"{measured['peak_mb']} MB peak, baseline {expected['peak_mb']} MB")
+    return problems
+
+
+def test_every_plot_is_benchmarked(plots):
+    assert [option["value"] for option in plots.Plots.visualization_args["plot_name"]] == list(PLOT_NAMES)
+
+
+@pytest.mark.parametrize("bias_correction", BIAS_CORRECTIONS)
+@pytest.mark.parametrize("plot_name", PLOT_NAMES)
+def test_plot_read(plots, synthetic, results, tmp_path, plot_name, bias_correction):
+    _datasets, observed = synthetic
+    reader = plots.Plots(RIVER, plot_name, observed_historical_data=observed, bias_correction=bias_correction)
+    workspace = str(tmp_path)
+
+    try:
+        measured = _measure(workspace, reader)
+    except plots.VisualizationError as exc:
+        measured = {"error": type(exc).__name__}
+    key = f"{plot_name}/{bias_correction}"
+    results[key] = measured
+    print(f"\n{key}: {measured}")
+
+    if os.environ.get(UPDATE_BASELINE_ENV):
+        return
+    expected = _load_baseline().get(key)
+    assert expected is not None, f"{key} has no baseline; rerun with {UPDATE_BASELINE_ENV}=1 to record one"
+    problems = _regressions(measured, expected)
+    assert not problems, f"{key} regressed: " + "; ".join(problems)
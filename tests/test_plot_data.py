@@ -1,45 +1,30 @@
 """Regression tests for utils.plot_data."""
-import sys
-import types
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
 
 import pandas as pd
+import pytest
 from unittest.mock import MagicMock
 
 
-def _install_fake_app(monkeypatch, tmp_path):
-    """Shadow tethysapp.tethysdash.app so get_plot_data resolves a workspace.
+@pytest.fixture(autouse=True)
+def _empty_memory_cache():
+    """Keep the process-wide memory tier from leaking frames between tests."""
+    from tethysdash_plugin_geoglows.utils.memory_cache import frame_cache
 
-    The real App.get_app_workspace() only works inside a Tethys app/request
-    context, so we inject a lightweight stand-in pointing at a temp dir.
-    """
-    class _Workspace:
-        path = str(tmp_path)
-
-    class App:
-        @classmethod
-        def get_app_workspace(cls):
-            return _Workspace()
-
-    tethysapp = types.ModuleType("tethysapp")
-    tethysapp.__path__ = []
-    tethysdash = types.ModuleType("tethysapp.tethysdash")
-    tethysdash.__path__ = []
-    app_mod = types.ModuleType("tethysapp.tethysdash.app")
-    app_mod.App = App
-
-    monkeypatch.setitem(sys.modules, "tethysapp", tethysapp)
-    monkeypatch.setitem(sys.modules, "tethysapp.tethysdash", tethysdash)
-    monkeypatch.setitem(sys.modules, "tethysapp.tethysdash.app", app_mod)
+    frame_cache.clear()
+    yield
+    frame_cache.clear()
 
 
-def test_return_periods_requests_gumbel_distribution(monkeypatch, tmp_path):
+def test_return_periods_requests_gumbel_distribution(tethys_app, monkeypatch):
     """return-periods must request the 'gumbel' distribution.
 
     geoglows 2.x defaults distribution='logpearson3', which is absent from the
     current return-period dataset and raises KeyError, breaking every plot.
     """
-    _install_fake_app(monkeypatch, tmp_path)
-
     from tethysdash_plugin_geoglows.utils import plot_data
 
     canned = pd.DataFrame({12345: [1.0, 2.0]})
@@ -50,3 +35,405 @@ def test_return_periods_requests_gumbel_distribution(monkeypatch, tmp_path):
 
     return_periods_spy.assert_called_once_with(12345, distribution="gumbel")
     assert result is canned
+
+
+def _retro_frame(river_id=12345, periods=5):
+    index = pd.date_range("1940-01-01", periods=periods, freq="D", tz="UTC", name="time")
+    df = pd.DataFrame({river_id: [float(i) for i in range(periods)]}, index=index)
+    df.columns.name = "river_id"
+    return df
+
+
+@pytest.mark.parametrize("fmt", ["csv", "parquet", "feather"])
+def test_cache_formats_round_trip_exactly(tmp_path, fmt):
+    """Every cache format keeps datetime indexes, named or not, and integer river ids."""
+    from tethysdash_plugin_geoglows.utils import cache_formats
+
+    cache_format = cache_formats.CACHE_FORMATS[fmt]
+    if not cache_format.is_available():
+        pytest.skip(f"{fmt} engine not installed")
+    df = _retro_frame()
+    path = str(tmp_path / f"retro-daily-12345-20250101{cache_format.extension}")
+
+    cache_formats.write_frame(df, path)
+
+    pd.testing.assert_frame_equal(cache_formats.read_frame(path), df, check_freq=False)
+    assert list(tmp_path.iterdir()) == [tmp_path / os.path.basename(path)]
+
+    # corrections from geoglows.bias have an unnamed index
+    corrected = pd.DataFrame(
+        {"Corrected Simulated Streamflow": [1.5, 2.5]}, index=pd.date_range("1940-01-01", periods=2, tz="UTC")
+    )
+    naive = corrected.tz_localize(None)
+    for name, expected in (("local", corrected), ("naive", naive)):
+        path = str(tmp_path / f"retro-daily-corrected-{name}{cache_format.extension}")
+        cache_formats.write_frame(expected, path)
+        pd.testing.assert_frame_equal(cache_formats.read_frame(path), expected, check_freq=False)
+
+
+def test_legacy_csv_cache_is_read_and_migrated(tethys_app, monkeypatch, tmp_path):
+    """Today's CSV left by an older release is served and rewritten in the new format; older ones are removed."""
+    monkeypatch.setenv("GEOGLOWS_PLOTS_CACHE_FORMAT", "parquet")
+
+    from tethysdash_plugin_geoglows.utils import plot_data
+
+    today = datetime.now(timezone.utc).strftime("%Y%m%d")
+    cache_dir = tmp_path / "geoglows_plots_cache"
+    cache_dir.mkdir()
+    _retro_frame().to_csv(cache_dir / f"retro-daily-12345-{today}.csv")
+    (cache_dir / "retro-daily-12345-20240101.csv").write_text("time,12345\n")
+    (cache_dir / "retro-daily-123456-20240101.csv").write_text("time,123456\n")
+    fetch_spy = MagicMock()
+    monkeypatch.setattr(plot_data.geoglows.data, "retro_daily", fetch_spy)
+
+    result = plot_data.get_plot_data(12345, "retro-daily")
+
+    fetch_spy.assert_not_called()
+    pd.testing.assert_frame_equal(result, _retro_frame(), check_freq=False)
+    assert not (cache_dir / f"retro-daily-12345-{today}.csv").exists()
+    assert not (cache_dir / "retro-daily-12345-20240101.csv").exists()
+    assert (cache_dir / "retro-daily-123456-20240101.csv").exists()
+    assert [p.suffix for p in (cache_dir / "345" / "12345").iterdir()] == [".parquet"]
+
+
+def test_out_of_date_legacy_csv_is_refetched_and_removed(tethys_app, monkeypatch, tmp_path):
+    """A CSV from an earlier day is never served, and is deleted once the key is cataloged."""
+    from tethysdash_plugin_geoglows.utils import plot_data
+
+    cache_dir = tmp_path / "geoglows_plots_cache"
+    cache_dir.mkdir()
+    (cache_dir / "retro-daily-12345-20240101.csv").write_text("time,12345\n")
+    fetch_spy = MagicMock(return_value=_retro_frame())
+    monkeypatch.setattr(plot_data.geoglows.data, "retro_daily", fetch_spy)
+
+    result = plot_data.get_plot_data(12345, "retro-daily")
+
+    fetch_spy.assert_called_once()
+    pd.testing.assert_frame_equal(result, _retro_frame(), check_freq=False)
+    assert not (cache_dir / "retro-daily-12345-20240101.csv").exists()
+
+
+def test_repeat_reads_are_served_from_memory_as_copies(tethys_app, monkeypatch):
+    """A second read skips the disk, and mutating a result never reaches the cache."""
+    from tethysdash_plugin_geoglows.utils import plot_data
+
+    monkeypatch.setattr(plot_data.geoglows.data, "retro_monthly", MagicMock(return_value=_retro_frame()))
+    first = plot_data.get_plot_data(12345, "retro-monthly")
+    first["month"] = first.index.strftime("%m")
+    read_spy = MagicMock()
+    monkeypatch.setattr("tethysdash_plugin_geoglows.utils.data_cache.read_frame", read_spy)
+
+    second = plot_data.get_plot_data(12345, "retro-monthly")
+
+    read_spy.assert_not_called()
+    pd.testing.assert_frame_equal(second, _retro_frame(), check_freq=False)
+
+
+def test_catalog_lookup_is_exact_per_dataset_and_river(tethys_app, monkeypatch):
+    """forecast-123 must not be served forecast-stats-123 or forecast-1234 data."""
+    from tethysdash_plugin_geoglows.utils import plot_data
+    from tethysdash_plugin_geoglows.utils.memory_cache import frame_cache
+
+    frames = {
+        ("forecast_stats", 123): pd.DataFrame({"flow_avg": [1.0]}),
+        ("forecast", 1234): pd.DataFrame({"flow_median": [2.0]}),
+        ("forecast", 123): pd.DataFrame({"flow_median": [3.0]}),
+    }
+    for name in ("forecast", "forecast_stats"):
+        monkeypatch.setattr(
+            plot_data.geoglows.data, name, lambda river_id, name=name: frames[(name, river_id)]
+        )
+    plot_data.get_plot_data(123, "forecast-stats")
+    plot_data.get_plot_data(1234, "forecast")
+    plot_data.get_plot_data(123, "forecast")
+    frame_cache.clear()  # force the disk/catalog path
+
+    assert plot_data.get_plot_data(123, "forecast")["flow_median"].tolist() == [3.0]
+    assert plot_data.get_plot_data(1234, "forecast")["flow_median"].tolist() == [2.0]
+    assert plot_data.get_plot_data(123, "forecast-stats")["flow_avg"].tolist() == [1.0]
+
+
+def test_retrospective_data_outlives_the_utc_date_rollover(tethys_app, monkeypatch):
+    """retro-daily is reused across days until its TTL runs out; forecasts are not."""
+    from tethysdash_plugin_geoglows.utils import data_cache, plot_data
+    from tethysdash_plugin_geoglows.utils.memory_cache import frame_cache
+
+    retro_spy = MagicMock(return_value=_retro_frame())
+    monkeypatch.setattr(plot_data.geoglows.data, "retro_daily", retro_spy)
+    start = datetime(2025, 3, 1, 12, tzinfo=timezone.utc)
+    for days in (0, 1, 29, 31):
+        monkeypatch.setattr(data_cache, "utc_now", lambda days=days: start + timedelta(days=days))
+        frame_cache.clear()
+        plot_data.get_plot_data(12345, "retro-daily")
+
+    assert retro_spy.call_count == 2
+
+
+def test_cache_stats_count_hits_misses_and_refetches(tethys_app, monkeypatch, tmp_path):
+    import json
+
+    from tethysdash_plugin_geoglows.utils import cache_stats, data_cache, plot_data
+    from tethysdash_plugin_geoglows.utils.memory_cache import frame_cache
+
+    counters = cache_stats.CacheCounters()
+    monkeypatch.setattr(cache_stats, "cache_counters", counters)
+    monkeypatch.setattr(data_cache, "cache_counters", counters)
+    monkeypatch.setattr(plot_data.geoglows.data, "retro_daily", MagicMock(return_value=_retro_frame()))
+    start = datetime(2025, 3, 1, 12, tzinfo=timezone.utc)
+
+    def read(days):
+        monkeypatch.setattr(data_cache, "utc_now", lambda: start + timedelta(days=days))
+        plot_data.get_plot_data(12345, "retro-daily")
+
+    read(0)  # miss
+    read(0)  # memory hit
+    frame_cache.clear()
+    read(1)  # disk hit
+    read(31)  # past the TTL: refetch
+
+    stats = cache_stats.cache_stats()
+    retro = stats["datasets"]["retro-daily"]
+    assert (retro["memory_hits"], retro["disk_hits"], retro["misses"], retro["refetches"]) == (1, 1, 2, 1)
+    assert retro["hit_rate"] == 0.5
+    assert sum(retro["fetch_seconds_histogram"].values()) == 2
+    assert retro["entries"] == 1 and retro["bytes"] > 0
+    assert stats["disk"]["oldest_entry"]["dataset"] == "retro-daily"
+    assert stats["disk"]["bytes"] == retro["bytes"]
+    assert stats["memory"]["evictions"] == frame_cache.evictions
+
+    path = cache_stats.dump_cache_stats()
+    assert path.startswith(str(tmp_path)) and path.endswith(f"cache_stats-{stats['pid']}.json")
+    with open(path) as file:
+        assert json.load(file)["datasets"]["retro-daily"]["misses"] == 2
+
+
+def test_forecast_is_refetched_only_when_a_newer_cycle_is_published(tethys_app, monkeypatch):
+    """A fetch after midnight keeps yesterday's cycle until today's is available."""
+    from tethysdash_plugin_geoglows.utils import data_cache, freshness, plot_data
+
+    published = ["2025030100"]
+    monkeypatch.setitem(freshness._latest_cycle, "checked_at", None)
+    monkeypatch.setitem(freshness._latest_cycle, "cycle", None)
+    monkeypatch.setenv("GEOGLOWS_PLOTS_FORECAST_RECHECK_MINUTES", "0")
+    monkeypatch.setattr(
+        freshness.geoglows.data, "dates", lambda: pd.DataFrame({"dates": list(published)}), raising=False
+    )
+
+    def forecast(river_id, date=published[-1]):
+        index = pd.date_range(pd.Timestamp(date[:8]), periods=3, freq="3h", tz="UTC", name="time")
+        return pd.DataFrame({"flow_median": [1.0, 2.0, 3.0]}, index=index)
+
+    forecast_spy = MagicMock(side_effect=forecast)
+    monkeypatch.setattr(plot_data.geoglows.data, "forecast", forecast_spy)
+
+    def read_at(hour):
+        monkeypatch.setattr(
+            data_cache, "utc_now", lambda: datetime(2025, 3, 2, hour, tzinfo=timezone.utc)
+        )
+        return plot_data.get_plot_data(12345, "forecast")
+
+    read_at(0)
+    read_at(6)
+    assert forecast_spy.call_count == 1
+
+    published.append("2025030200")
+    assert read_at(7).index[0] == pd.Timestamp("2025-03-02", tz="UTC")
+    assert forecast_spy.call_count == 2
+    assert forecast_spy.call_args.kwargs == {"date": "2025030200"}
+
+
+def test_uncached_forecast_does_not_request_a_stale_memoized_cycle(tethys_app, monkeypatch):
+    """A cycle learned days ago is rechecked before it is passed to geoglows as date=."""
+    import time
+
+    from tethysdash_plugin_geoglows.utils import freshness, plot_data
+
+    monkeypatch.setitem(freshness._latest_cycle, "cycle", "2026101500")
+    monkeypatch.setitem(freshness._latest_cycle, "checked_at", time.monotonic() - 2 * 24 * 60 * 60)
+    monkeypatch.setattr(
+        freshness.geoglows.data, "dates", lambda: pd.DataFrame({"dates": ["2026101600", "2026101700"]}),
+        raising=False,
+    )
+    index = pd.date_range("2026-10-17", periods=3, freq="3h", tz="UTC", name="time")
+    forecast_spy = MagicMock(return_value=pd.DataFrame({"flow_median": [1.0, 2.0, 3.0]}, index=index))
+    monkeypatch.setattr(plot_data.geoglows.data, "forecast", forecast_spy)
+
+    plot_data.get_plot_data(760400565, "forecast")
+
+    assert forecast_spy.call_args.kwargs == {"date": "2026101700"}
+
+
+def test_aggregates_are_derived_from_cached_retro_daily(tethys_app, monkeypatch):
+    """retro-monthly/yearly, raw and Global-corrected, reuse the cached retro-daily frame."""
+    from tethysdash_plugin_geoglows.utils import plot_data
+
+    daily = _retro_frame(periods=400)
+    daily_spy = MagicMock(return_value=daily)
+    monthly_spy, yearly_spy = MagicMock(), MagicMock()
+    monkeypatch.setattr(plot_data.geoglows.data, "retro_daily", daily_spy)
+    monkeypatch.setattr(plot_data.geoglows.data, "retro_monthly", monthly_spy)
+    monkeypatch.setattr(plot_data.geoglows.data, "retro_yearly", yearly_spy)
+    monkeypatch.setattr(plot_data.geoglows.bias, "discharge_transform", lambda df, river_id: df * 2)
+
+    plot_data.get_plot_data(12345, "retro-daily")
+    monthly = plot_data.get_plot_data(12345, "retro-monthly")
+    yearly = plot_data.get_plot_data(12345, "retro-yearly")
+    monthly_corrected = plot_data.get_bias_corrected_plot_data(12345, "retro-monthly")
+
+    daily_spy.assert_called_once()
+    monthly_spy.assert_not_called()
+    yearly_spy.assert_not_called()
+    pd.testing.assert_frame_equal(monthly, daily.resample("MS").mean())
+    assert len(yearly) == 2
+    pd.testing.assert_frame_equal(monthly_corrected, monthly * 2)
+
+
+def test_concurrent_misses_for_one_key_fetch_once(tethys_app, monkeypatch):
+    """Callers racing on a cold key share one upstream fetch."""
+    from tethysdash_plugin_geoglows.utils import plot_data
+
+    def slow_retro_daily(river_id):
+        time.sleep(0.2)
+        return _retro_frame()
+
+    daily_spy = MagicMock(side_effect=slow_retro_daily)
+    monkeypatch.setattr(plot_data.geoglows.data, "retro_daily", daily_spy)
+
+    results = []
+    threads = [
+        threading.Thread(target=lambda: results.append(plot_data.get_plot_data(12345, "retro-daily")))
+        for _ in range(6)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    daily_spy.assert_called_once()
+    assert len(results) == 6
+    for df in results:
+        pd.testing.assert_frame_equal(df, _retro_frame(), check_freq=False)
+
+
+def test_bias_corrected_data_is_cached_and_shared(tethys_app, monkeypatch):
+    """Global corrections are stored once per river and data version and reused by every product."""
+    from tethysdash_plugin_geoglows.utils import plot_data
+    from tethysdash_plugin_geoglows.utils.memory_cache import frame_cache
+
+    daily = _retro_frame(periods=800)
+    transform_spy = MagicMock(side_effect=lambda df, river_id: df * 2)
+    monkeypatch.setattr(plot_data.geoglows.data, "retro_daily", MagicMock(return_value=daily))
+    monkeypatch.setattr(plot_data.geoglows.bias, "discharge_transform", transform_spy)
+
+    corrected = plot_data.get_bias_corrected_plot_data(12345, "retro-daily")
+    frame_cache.clear()  # later calls are served from the workspace
+    monthly = plot_data.get_bias_corrected_plot_data(12345, "retro-monthly")
+    return_periods = plot_data.get_bias_corrected_plot_data(12345, "return-periods")
+
+    transform_spy.assert_called_once()
+    pd.testing.assert_frame_equal(corrected, daily * 2, check_freq=False)
+    pd.testing.assert_frame_equal(monthly, (daily * 2).resample("MS").mean(), check_freq=False)
+    assert list(return_periods.columns) == [12345]
+    assert return_periods.index.name == "return_period"
+
+
+def test_batch_fetches_uncached_rivers_in_one_request(tethys_app, monkeypatch):
+    """A batch downloads every uncached river at once and caches each river on its own."""
+    from tethysdash_plugin_geoglows.utils import plot_data
+    from tethysdash_plugin_geoglows.utils.memory_cache import frame_cache
+
+    monkeypatch.setattr(plot_data.geoglows.data, "retro_daily", MagicMock(return_value=_retro_frame(111)))
+    plot_data.get_plot_data(111, "retro-daily")
+
+    wide = pd.concat([_retro_frame(222), _retro_frame(333)], axis=1)
+    batch_spy = MagicMock(return_value=wide)
+    monkeypatch.setattr(plot_data.geoglows.data, "retro_daily", batch_spy)
+
+    frames = plot_data.get_plot_data_batch([111, 222, 333], "retro-daily")
+    frame_cache.clear()
+    single = plot_data.get_plot_data(333, "retro-daily")
+
+    batch_spy.assert_called_once_with([222, 333])
+    assert list(frames) == [111, 222, 333]
+    for river_id, df in frames.items():
+        pd.testing.assert_frame_equal(df, _retro_frame(river_id), check_freq=False)
+    pd.testing.assert_frame_equal(single, _retro_frame(333), check_freq=False)
+
+
+def test_overlapping_batches_download_each_river_once(tethys_app, monkeypatch):
+    """Batches and single reads racing for the same river wait on its single-flight lock."""
+    from tethysdash_plugin_geoglows.utils import plot_data
+
+    requested = []
+    started = threading.Barrier(3, timeout=5)
+
+    def retro_daily(river_ids):
+        river_ids = river_ids if isinstance(river_ids, list) else [river_ids]
+        requested.extend(river_ids)
+        time.sleep(0.2)  # long enough for the other callers to queue on the locks
+        return pd.concat([_retro_frame(river_id) for river_id in river_ids], axis=1)
+
+    monkeypatch.setattr(plot_data.geoglows.data, "retro_daily", retro_daily)
+    results = {}
+
+    def read(name, load):
+        started.wait()
+        results[name] = load()
+
+    threads = [
+        threading.Thread(target=read, args=(name, load)) for name, load in (
+            ("first", lambda: plot_data.get_plot_data_batch([111, 222], "retro-daily")),
+            ("second", lambda: plot_data.get_plot_data_batch([333, 222], "retro-daily")),
+            ("single", lambda: plot_data.get_plot_data(222, "retro-daily")),
+        )
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(requested) == [111, 222, 333]
+    assert list(results["second"]) == [333, 222]
+    pd.testing.assert_frame_equal(results["single"], _retro_frame(222), check_freq=False)
+
+
+def test_batch_splits_multi_river_forecasts(tethys_app, monkeypatch):
+    from tethysdash_plugin_geoglows.utils import plot_data
+
+    time = pd.date_range("2025-03-01", periods=3, freq="3h", tz="UTC")
+    index = pd.MultiIndex.from_product([time, [222, 333]], names=["time", "river_id"])
+    forecast = pd.DataFrame({"flow_median": [1.0, 10.0, 2.0, 20.0, 3.0, 30.0]}, index=index)
+    monkeypatch.setattr(plot_data.geoglows.data, "forecast", MagicMock(return_value=forecast))
+
+    frames = plot_data.get_plot_data_batch([222, 333], "forecast")
+
+    assert frames[222]["flow_median"].tolist() == [1.0, 2.0, 3.0]
+    assert frames[333]["flow_median"].tolist() == [10.0, 20.0, 30.0]
+    assert frames[333].index.name == "time"
+
+
+def test_compute_ssi_matches_per_month_reference_for_every_column():
+    import numpy as np
+    import scipy.stats as stats
+
+    from tethysdash_plugin_geoglows.utils.plot_data import compute_ssi
+
+    rng = np.random.default_rng(1)
+    index = pd.date_range("1990-01-01", "1999-12-31", freq="D", tz="UTC")
+    daily = pd.DataFrame({"raw": rng.gamma(2, 10, len(index)), "corrected": rng.gamma(3, 8, len(index))}, index=index)
+
+    ssi = compute_ssi(daily)
+
+    assert list(ssi.columns) == ["raw", "corrected"] and len(ssi) == 120
+    for column in daily:
+        monthly = daily[column].resample("ME").mean()
+        for month in (1, 7):
+            values = monthly[monthly.index.month == month]
+            exceedance = 1 - stats.norm.cdf(values, values.mean(), values.std())
+            p = np.where(exceedance > 0.5, 1 - exceedance, exceedance)
+            w = (-2 * np.log(p)) ** 0.5
+            expected = w - (2.515517 + 0.802853 * w + 0.010328 * w ** 2) / (
+                1 + 1.432788 * w + 0.001308 * w ** 2 + 0.001308 * w ** 3
+            )
+            expected = np.where(exceedance < 0.5, expected, -expected)
+            np.testing.assert_allclose(ssi.loc[values.index, column], expected)
@@ -1,18 +1,25 @@
 """Fast, network-free unit tests for Plots.read() bias-correction wiring.
 
-These stub the plugin's only tethysapp dependency (VisualizationError) so the
-module imports without a configured Tethys portal, then spy on the geoglows
-boundaries to assert which correction path each mode takes.
+These stub tethysapp (see the tethys_app fixture) so the module imports
+without a configured Tethys portal, then spy on the geoglows boundaries to
+assert which correction path each mode takes.
 """
 import importlib
 import json
+import os
+import subprocess
 import sys
-import types
 
+import geoglows
+import numpy as np
 import pandas as pd
+import plotly.graph_objs as go
 import pytest
 from unittest.mock import MagicMock
 
+from tethysdash_plugin_geoglows.utils import bias_plots, corrections, decimation, plot_data
+from tethysdash_plugin_geoglows.utils.memory_cache import frame_cache
+
 RIVER = 760400565
 OBS_JSON = json.dumps(
     {"Datetime": ["2015-01-01", "2015-01-02", "2015-01-03"],
@@ -21,28 +28,14 @@ OBS_JSON = json.dumps(
 
 
 def _fake_fig():
-    """A stand-in plotly figure: read() only calls .to_json() on it."""
-    fig = MagicMock()
-    fig.to_json.return_value = '{"data": [{"x": [1]}], "layout": {}}'
-    return fig
+    """A stand-in for the figure a plot builder returns."""
+    return go.Figure(go.Scatter(x=[1]))
 
 
 @pytest.fixture
-def plots(monkeypatch):
-    """Import the plots module with tethysapp.tethysdash.exceptions stubbed."""
-    exc_mod = types.ModuleType("tethysapp.tethysdash.exceptions")
-
-    class VisualizationError(Exception):
-        pass
-
-    exc_mod.VisualizationError = VisualizationError
-    pkg = types.ModuleType("tethysapp")
-    pkg.__path__ = []
-    sub = types.ModuleType("tethysapp.tethysdash")
-    sub.__path__ = []
-    monkeypatch.setitem(sys.modules, "tethysapp", pkg)
-    monkeypatch.setitem(sys.modules, "tethysapp.tethysdash", sub)
-    monkeypatch.setitem(sys.modules, "tethysapp.tethysdash.exceptions", exc_mod)
+def plots(monkeypatch, tethys_app):
+    """Import the plots module with tethysapp stubbed, caching corrections in a temp workspace."""
+    frame_cache.clear()
     monkeypatch.delitem(sys.modules, "tethysdash_plugin_geoglows.plots", raising=False)
     return importlib.import_module("tethysdash_plugin_geoglows.plots")
 
@@ -50,11 +43,11 @@ def plots(monkeypatch):
 def _stub_data_layer(monkeypatch, plots):
     """Canned data frames + return-period computation (no network)."""
     monkeypatch.setattr(
-        plots, "get_plot_data",
+        plot_data, "get_plot_data",
         lambda river_id, kind="forecast": pd.DataFrame({river_id: [1.0, 2.0, 3.0]}),
     )
     monkeypatch.setattr(
-        plots, "compute_return_periods",
+        corrections, "compute_return_periods",
         MagicMock(return_value=pd.DataFrame({"rp": [1.0]})),
     )
 
@@ -67,9 +60,9 @@ def test_none_forecast_calls_plain_forecast(monkeypatch, plots):
     _stub_data_layer(monkeypatch, plots)
     forecast_spy = MagicMock(return_value=_fake_fig())
     dt_spy, cf_spy = MagicMock(), MagicMock()
-    monkeypatch.setattr(plots.geoglows.plots, "forecast", forecast_spy)
-    monkeypatch.setattr(plots.geoglows.bias, "discharge_transform", dt_spy)
-    monkeypatch.setattr(plots.geoglows.bias, "correct_forecast", cf_spy)
+    monkeypatch.setattr(geoglows.plots, "forecast", forecast_spy)
+    monkeypatch.setattr(geoglows.bias, "discharge_transform", dt_spy)
+    monkeypatch.setattr(geoglows.bias, "correct_forecast", cf_spy)
 
     result = plots.Plots(RIVER, "forecast", bias_correction="None").read()
 
@@ -84,10 +77,10 @@ def test_global_forecast_uses_discharge_transform(monkeypatch, plots):
     dt_spy = MagicMock(side_effect=_corrected_frame)
     pfbc_spy = MagicMock(return_value=_fake_fig())
     forecast_spy, cf_spy = MagicMock(return_value=_fake_fig()), MagicMock()
-    monkeypatch.setattr(plots.geoglows.bias, "discharge_transform", dt_spy)
-    monkeypatch.setattr(plots.geoglows.bias, "correct_forecast", cf_spy)
-    monkeypatch.setattr(plots.geoglows.plots, "forecast", forecast_spy)
-    monkeypatch.setattr(plots, "plot_forecast_bias_correct", pfbc_spy)
+    monkeypatch.setattr(geoglows.bias, "discharge_transform", dt_spy)
+    monkeypatch.setattr(geoglows.bias, "correct_forecast", cf_spy)
+    monkeypatch.setattr(geoglows.plots, "forecast", forecast_spy)
+    monkeypatch.setattr(bias_plots, "plot_forecast_bias_correct", pfbc_spy)
 
     result = plots.Plots(
         RIVER, "forecast", bias_correction="Global", observed_historical_data="none"
@@ -106,10 +99,10 @@ def test_local_forecast_uses_correct_forecast_with_observed(monkeypatch, plots):
     cf_spy = MagicMock(side_effect=_corrected_frame)
     dt_spy = MagicMock()
     pfbc_spy = MagicMock(return_value=_fake_fig())
-    monkeypatch.setattr(plots.geoglows.bias, "correct_historical", ch_spy)
-    monkeypatch.setattr(plots.geoglows.bias, "correct_forecast", cf_spy)
-    monkeypatch.setattr(plots.geoglows.bias, "discharge_transform", dt_spy)
-    monkeypatch.setattr(plots, "plot_forecast_bias_correct", pfbc_spy)
+    monkeypatch.setattr(geoglows.bias, "correct_historical", ch_spy)
+    monkeypatch.setattr(geoglows.bias, "correct_forecast", cf_spy)
+    monkeypatch.setattr(geoglows.bias, "discharge_transform", dt_spy)
+    monkeypatch.setattr(bias_plots, "plot_forecast_bias_correct", pfbc_spy)
 
     result = plots.Plots(
         RIVER, "forecast", bias_correction="Local", observed_historical_data=OBS_JSON
@@ -131,7 +124,7 @@ def test_none_bias_performance_raises(monkeypatch, plots):
 def test_global_bias_performance_raises(monkeypatch, plots):
     _stub_data_layer(monkeypatch, plots)
     monkeypatch.setattr(
-        plots.geoglows.bias, "discharge_transform", MagicMock(side_effect=_corrected_frame)
+        geoglows.bias, "discharge_transform", MagicMock(side_effect=_corrected_frame)
     )
     with pytest.raises(plots.VisualizationError):
         plots.Plots(
@@ -153,11 +146,11 @@ def test_local_double_encoded_observed_is_unwrapped(monkeypatch, plots):
     """A double-encoded JSON string (JSON string of a JSON string) still works."""
     _stub_data_layer(monkeypatch, plots)
     monkeypatch.setattr(
-        plots.geoglows.bias, "correct_historical", MagicMock(side_effect=_corrected_frame)
+        geoglows.bias, "correct_historical", MagicMock(side_effect=_corrected_frame)
     )
     cf_spy = MagicMock(side_effect=_corrected_frame)
-    monkeypatch.setattr(plots.geoglows.bias, "correct_forecast", cf_spy)
-    monkeypatch.setattr(plots, "plot_forecast_bias_correct", MagicMock(return_value=_fake_fig()))
+    monkeypatch.setattr(geoglows.bias, "correct_forecast", cf_spy)
+    monkeypatch.setattr(bias_plots, "plot_forecast_bias_correct", MagicMock(return_value=_fake_fig()))
 
     result = plots.Plots(
         RIVER, "forecast", bias_correction="Local",
@@ -183,3 +176,236 @@ def test_local_missing_columns_raises_friendly(monkeypatch, plots):
         plots.Plots(
             RIVER, "forecast", bias_correction="Local", observed_historical_data=payload
         ).read()
+
+
+@pytest.mark.parametrize("plot_name", ["retro-simulation", "retro-monthly", "retro-status", "retro-yearly-volume"])
+def test_global_retro_aggregates_are_derived_from_retro_daily(monkeypatch, plots, plot_name):
+    """Monthly/yearly frames come from the retro-daily frame already loaded, not new fetches."""
+    index = pd.date_range("2000-01-01", periods=800, freq="D", tz="UTC", name="time")
+    daily = pd.DataFrame({RIVER: [float(i % 50) for i in range(800)]}, index=index)
+    requested = []
+
+    def get_plot_data(river_id, kind="forecast"):
+        requested.append(kind)
+        return daily.copy()
+
+    monkeypatch.setattr(plot_data, "get_plot_data", get_plot_data)
+    monkeypatch.setattr(corrections, "compute_return_periods", MagicMock(return_value=pd.DataFrame({"rp": [1.0]})))
+    monkeypatch.setattr(geoglows.bias, "discharge_transform", lambda df, river_id: df * 2)
+
+    result = plots.Plots(
+        RIVER, plot_name, bias_correction="Global", observed_historical_data="none"
+    ).read()
+
+    assert result["data"]
+    assert requested == ["retro-daily"]
+
+
+@pytest.mark.parametrize(
+    "plot_name,bias,datasets",
+    [
+        ("forecast", "None", ("forecast", "return-periods")),
+        ("forecast", "Global", ("forecast", "return-periods", "retro-daily")),
+        ("exceedance", "None", ("forecast-ensembles", "return-periods")),
+        ("retro-simulation", "None", ("retro-daily",)),
+        ("retro-simulation", "Local", ("return-periods", "retro-daily")),
+        ("retro-fdc", "Global", ("retro-daily",)),
+    ],
+)
+def test_fetch_plan_loads_only_what_the_plot_needs(plots, plot_name, bias, datasets):
+    plan = plots.Plots(RIVER, plot_name, bias_correction=bias).fetch_plan()
+    assert plan.datasets == datasets
+
+
+def test_fetch_plan_steps_are_inspectable(plots):
+    plan = plots.Plots(RIVER, "forecast-stats", bias_correction="Local").fetch_plan()
+    assert plan.describe() == [
+        "dataset forecast-stats",
+        "dataset return-periods",
+        "dataset retro-daily",
+        "transform observed",
+        "transform retro-daily-corrected <- retro-daily, observed",
+        "transform return-periods-corrected <- retro-daily-corrected",
+        "transform forecast-stats-corrected <- forecast-stats, retro-daily, observed",
+    ]
+
+
+def test_none_forecast_skips_retrospective_download(monkeypatch, plots):
+    requested = []
+    monkeypatch.setattr(
+        plot_data, "get_plot_data",
+        lambda river_id, kind="forecast": requested.append(kind) or pd.DataFrame({river_id: [1.0]}),
+    )
+    monkeypatch.setattr(geoglows.plots, "forecast", MagicMock(return_value=_fake_fig()))
+
+    plots.Plots(RIVER, "forecast", bias_correction="None").read()
+
+    assert requested == ["forecast", "return-periods"]
+
+
+def test_local_corrections_are_memoized_per_observed_record(monkeypatch, plots):
+    """Corrections are computed once per (river, mode, observed record, retro data)."""
+    _stub_data_layer(monkeypatch, plots)
+    ch_spy = MagicMock(side_effect=_corrected_frame)
+    rp_spy = MagicMock(return_value=pd.DataFrame({RIVER: [1.0]}))
+    monkeypatch.setattr(geoglows.bias, "correct_historical", ch_spy)
+    monkeypatch.setattr(geoglows.bias, "correct_forecast", MagicMock(side_effect=_corrected_frame))
+    monkeypatch.setattr(corrections, "compute_return_periods", rp_spy)
+    monkeypatch.setattr(bias_plots, "plot_forecast_bias_correct", MagicMock(return_value=_fake_fig()))
+
+    def read(observed):
+        plots.Plots(RIVER, "forecast", bias_correction="Local", observed_historical_data=observed).read()
+
+    read(OBS_JSON)
+    frame_cache.clear()  # a fresh worker still finds the corrections in the workspace
+    read(OBS_JSON)
+    assert ch_spy.call_count == 1 and rp_spy.call_count == 1
+
+    other = json.loads(OBS_JSON)
+    other["Streamflow (m3/s)"][0] = 99.0
+    read(json.dumps(other))
+    assert ch_spy.call_count == 2 and rp_spy.call_count == 2
+
+    # each record keeps its own entry, so going back to the first one recomputes nothing
+    frame_cache.clear()
+    read(OBS_JSON)
+    assert ch_spy.call_count == 2 and rp_spy.call_count == 2
+
+
+@pytest.mark.parametrize("river_id", ["760400565, 760400566", [760400565, 760400566]])
+def test_batch_loads_each_dataset_once_for_all_rivers(monkeypatch, plots, river_id):
+    requested = []
+
+    def get_plot_data_batch(river_ids, kind):
+        requested.append(kind)
+        return {rid: pd.DataFrame({rid: [1.0, 2.0]}) for rid in river_ids}
+
+    monkeypatch.setattr(plot_data, "get_plot_data_batch", get_plot_data_batch)
+    monkeypatch.setattr(plot_data, "get_plot_data", MagicMock(side_effect=AssertionError("fetched per river")))
+    monkeypatch.setattr(
+        geoglows.plots, "forecast",
+        lambda df, rp_df: go.Figure(go.Scatter(y=df.iloc[:, 0], name="Median")),
+    )
+
+    combined = plots.Plots(river_id, "forecast").read()
+    per_river = plots.Plots(river_id, "forecast", batch_output="per-river").read()
+
+    assert requested == ["forecast", "return-periods"] * 2
+    assert [trace["name"] for trace in combined["data"]] == ["760400565: Median", "760400566: Median"]
+    assert list(per_river) == ["760400565", "760400566"]
+
+
+def test_local_corrections_of_the_least_recent_record_are_evicted(monkeypatch, plots):
+    from tethysdash_plugin_geoglows.utils.cache_catalog import get_catalog
+    from tethysdash_plugin_geoglows.utils.data_cache import get_cache_root
+
+    _stub_data_layer(monkeypatch, plots)
+    ch_spy = MagicMock(side_effect=_corrected_frame)
+    monkeypatch.setattr(geoglows.bias, "correct_historical", ch_spy)
+    monkeypatch.setattr(geoglows.bias, "correct_forecast", MagicMock(side_effect=_corrected_frame))
+    monkeypatch.setattr(bias_plots, "plot_forecast_bias_correct", MagicMock(return_value=_fake_fig()))
+    monkeypatch.setattr(corrections, "LOCAL_RECORDS_KEPT", 2)
+    catalog = get_catalog(get_cache_root())
+
+    def read(first_flow):
+        observed = json.loads(OBS_JSON)
+        observed["Streamflow (m3/s)"][0] = first_flow
+        plots.Plots(RIVER, "forecast", bias_correction="Local", observed_historical_data=json.dumps(observed)).read()
+        return {entry.dataset: entry.path for entry in catalog.entries()}
+
+    first = read(1.0)
+    second = read(2.0)
+    third = read(3.0)
+
+    # retro-daily, forecast and return-period corrections for each record
+    assert len(first) == 3 and len(third) == 6
+    assert set(first).isdisjoint(third) and set(second) - set(first) <= set(third)
+    assert not any(os.path.exists(path) for path in first.values())
+    read(1.0)
+    assert ch_spy.call_count == 4
+
+
+def test_batch_rejects_local_correction(plots):
+    with pytest.raises(plots.VisualizationError):
+        plots.Plots(
+            "760400565,760400566", "forecast", bias_correction="Local", observed_historical_data=OBS_JSON
+        ).read()
+
+
+def test_ensemble_mode_selects_the_ensemble_plot(monkeypatch, plots):
+    _stub_data_layer(monkeypatch, plots)
+    members_spy = MagicMock(return_value=_fake_fig())
+    compact_spy = MagicMock(return_value=_fake_fig())
+    monkeypatch.setattr(geoglows.plots, "forecast_ensembles", members_spy)
+    monkeypatch.setattr(bias_plots, "plot_forecast_ensembles", compact_spy)
+
+    plots.Plots(RIVER, "forecast-ensembles").read()
+    plots.Plots(RIVER, "forecast-ensembles", ensemble_mode="compact").read()
+
+    members_spy.assert_called_once()
+    assert compact_spy.call_args.kwargs["ensemble_mode"] == "compact"
+    with pytest.raises(plots.VisualizationError):
+        plots.Plots(RIVER, "forecast-ensembles", ensemble_mode="spaghetti").read()
+
+
+def test_retro_simulation_is_decimated_unless_zoomed(monkeypatch, plots):
+    index = pd.date_range("1940-01-01", "2024-12-31", freq="D", tz="UTC", name="time")
+    daily = pd.DataFrame({RIVER: np.arange(len(index), dtype=float)}, index=index)
+    frames = {"retro-daily": daily, "retro-monthly": daily.resample("MS").mean()}
+    monkeypatch.setattr(plot_data, "get_plot_data", lambda river_id, kind: frames[kind])
+
+    overview = plots.Plots(RIVER, "retro-simulation", typed_arrays=False).read()
+    zoomed = plots.Plots(RIVER, "retro-simulation", typed_arrays=False, date_range="2010-01-01,2011-12-31").read()
+    full = plots.Plots(RIVER, "retro-simulation", typed_arrays=False, resolution="full").read()
+
+    assert len(overview["data"][0]["y"]) <= decimation.DEFAULT_MAX_POINTS
+    assert overview["data"][0]["y"][-1] == len(index) - 1
+    assert len(zoomed["data"][0]["y"]) == 730
+    assert len(full["data"][0]["y"]) == len(index)
+    with pytest.raises(plots.VisualizationError):
+        plots.Plots(RIVER, "retro-simulation", date_range="2011-01-01").read()
+
+
+def test_importing_the_driver_leaves_the_plot_stack_unloaded():
+    """TethysDash imports the driver only for its class metadata."""
+    script = "\n".join([
+        "import sys, types",
+        "exceptions = types.ModuleType('tethysapp.tethysdash.exceptions')",
+        "exceptions.VisualizationError = Exception",
+        "for name in ('tethysapp', 'tethysapp.tethysdash'):",
+        "    sys.modules[name] = types.ModuleType(name)",
+        "    sys.modules[name].__path__ = []",
+        "sys.modules['tethysapp.tethysdash.exceptions'] = exceptions",
+        "from tethysdash_plugin_geoglows.plots import Plots",
+        "assert Plots.visualization_args['plot_name']",
+        "print(' '.join(sorted({name.split('.')[0] for name in sys.modules})))",
+    ])
+    output = subprocess.run([sys.executable, "-c", script], capture_output=True, text=True, check=True).stdout
+
+    assert not {"geoglows", "pandas", "numpy", "plotly", "scipy"} & set(output.split())
+
+
+def test_read_reports_stage_spans_with_cache_hits(monkeypatch, plots):
+    from tethysdash_plugin_geoglows.utils import tracing
+
+    index = pd.date_range("2000-01-01", periods=800, freq="D", tz="UTC", name="time")
+    daily = pd.DataFrame({RIVER: [float(i % 50) for i in range(800)]}, index=index)
+    monkeypatch.setattr(plot_data, "_download", lambda river_id, kind: daily.copy())
+    monkeypatch.setattr(geoglows.bias, "discharge_transform", lambda df, river_id: df * 2)
+    spans = []
+    monkeypatch.setattr(tracing, "_sink", spans.append)
+
+    plots.Plots(RIVER, "retro-fdc", bias_correction="Global").read()
+    cold = list(spans)
+    spans.clear()
+    plots.Plots(RIVER, "retro-fdc", bias_correction="Global").read()
+
+    by_name = {span.name: span for span in cold}
+    assert {"plots.fetch", "get_plot_data", "geoglows.data", "plots.step", "correction", "plots.build",
+            "simu_plots.plot_retro_fdc", "plots.serialize"} < set(by_name)
+    assert [span.name for span in cold if span.parent is None] == ["plots.read"]
+    assert by_name["plots.read"].attributes == {"plot_name": "retro-fdc", "bias_correction": "Global", "rivers": 1}
+    assert by_name["simu_plots.plot_retro_fdc"].parent is by_name["plots.build"]
+    assert [span.attributes["cache"] for span in cold if span.name == "cache.read"] == ["miss", "miss"]
+    assert [span.attributes["cache"] for span in spans if span.name == "cache.read"] == ["memory", "memory"]
+    assert not {"geoglows.data", "correction"} & {span.name for span in spans}
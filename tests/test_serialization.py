@@ -0,0 +1,57 @@
+"""figure_to_dict must match the JSON round trip it replaces."""
+import json
+
+import numpy as np
+import pandas as pd
+import plotly.graph_objs as go
+
+from tethysdash_plugin_geoglows.utils import serialization
+from tethysdash_plugin_geoglows.utils.serialization import figure_to_dict
+
+
+def _figure(naive_times=True):
+    index = pd.date_range("2020-01-01", periods=48, freq="h", tz="UTC", name="time")
+    flows = np.linspace(1.0, 2.0, len(index))
+    flows[5] = np.nan
+    return go.Figure(
+        [
+            go.Scatter(x=index, y=flows, name="tz-aware"),
+            go.Scatter(x=index.tz_localize(None).to_numpy() if naive_times else index, y=np.arange(48)),
+            go.Bar(x=["a", "b"], y=[np.float64(1.5), None], text=[np.int64(3), "x"]),
+            go.Table(cells=dict(values=[["1", "2"], [0.5, np.nan]])),
+        ],
+        layout=go.Layout(
+            title="Streamflow",
+            xaxis={"range": [index[0], index[-1]]},
+            yaxis={"range": np.array([0.0, 2.5])},
+            shapes=[dict(type="rect", x0=index[0], x1=index[3], y0=0, y1=np.float64(1))],
+        ),
+    )
+
+
+def test_figure_to_dict_matches_json_round_trip():
+    # plotly writes datetime64 arrays with or without nanoseconds depending on its JSON engine
+    fig = _figure(naive_times=False)
+
+    assert figure_to_dict(fig) == json.loads(fig.to_json())
+
+
+def test_figure_to_dict_writes_plain_lists_without_typed_arrays():
+    fig = _figure()
+
+    result = figure_to_dict(fig, typed_arrays=False)
+
+    assert result["data"][0]["y"][4:6] == [fig.data[0].y[4], None]
+    assert result["data"][1]["y"] == list(range(48))
+    assert result["data"][1]["x"][0] == "2020-01-01T00:00:00"
+    assert result["layout"] == json.loads(fig.to_json())["layout"]
+    assert "bdata" not in json.dumps(result)
+
+
+def test_figure_to_dict_falls_back_to_json_round_trip_without_typed_array_helpers(monkeypatch):
+    # plotly < 6 has no _plotly_utils typed array helpers
+    monkeypatch.setattr(serialization, "to_typed_array_spec", None)
+    monkeypatch.setattr(serialization, "is_skipped_key", None)
+    fig = _figure(naive_times=False)
+
+    assert figure_to_dict(fig) == json.loads(fig.to_json())
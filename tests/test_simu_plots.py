@@ -0,0 +1,51 @@
+"""Shape and size tests for the retrospective plot builders."""
+import json
+
+import numpy as np
+import pandas as pd
+
+RIVER = 760400565
+
+
+def _retro_yearly(first_year=1940, last_year=2024):
+    index = pd.date_range(f"{first_year}-01-01", f"{last_year}-01-01", freq="YS", tz="UTC", name="time")
+    flows = 50 + 10 * np.sin(np.arange(len(index)))
+    return pd.DataFrame({RIVER: flows}, index=index)
+
+
+def test_yearly_volumes_draw_five_year_blocks_as_one_trace_per_series():
+    from tethysdash_plugin_geoglows.utils.simu_plots import plot_yearly_volumes
+
+    df = _retro_yearly()
+
+    fig = plot_yearly_volumes(df, RIVER, df_retro_yearly_corrected=df * 1.2)
+
+    assert [trace.name for trace in fig.data] == [
+        "Annual Volume Simulation", "5 Year Average Simulation",
+        "Annual Volume Corrected", "5 Year Average Corrected",
+    ]
+    blocks = fig.data[1]
+    assert list(blocks.x[:6]) == [1940, 1945, None, 1945, 1950, None]
+    assert list(blocks.text[:3]) == ["1940-1944", "1940-1944", None]
+    assert blocks.y[0] == blocks.y[1] and blocks.y[3] == blocks.y[4]
+    # 85 years took 36 traces and ~10 kB of trace JSON, one per 5-year block.
+    assert len(json.dumps(json.loads(fig.to_json())["data"])) < 7_500
+
+
+def test_exceedance_probabilities_of_raw_and_corrected_ensembles():
+    from tethysdash_plugin_geoglows.utils.simu_plots import exceedance_probabilities
+
+    index = pd.date_range("2025-01-01", periods=4, freq="12h", tz="UTC", name="time")
+    ensem = pd.DataFrame(
+        {"ensemble_01": [1.0, 9.0, 2.0, 3.0], "ensemble_02": [4.0, 1.0, 1.0, np.nan], "ensemble_52": [99.0] * 4},
+        index=index,
+    )
+    rperiods = pd.DataFrame({RIVER: [3.0, 5.0]}, index=pd.Index([2, 5], name="return_period"))
+
+    tables = exceedance_probabilities({"raw": ensem, "corrected": ensem * 2}, {"raw": rperiods, "corrected": rperiods})
+
+    # day 1 maxima (9, 4) and day 2 (2, 1); the last hour lacks a member and is skipped
+    assert tables["raw"].index.tolist() == ["2025-01-01", "2025-01-02"]
+    assert tables["raw"].to_numpy().tolist() == [[100.0, 50.0], [0.0, 0.0]]
+    assert tables["corrected"].to_numpy().tolist() == [[100.0, 100.0], [50.0, 0.0]]
+    assert tables["raw"].columns.tolist() == [2, 5]
@@ -0,0 +1,114 @@
+"""Tests for the stage timing spans and their sinks."""
+import logging
+
+import pytest
+
+from tethysdash_plugin_geoglows.utils import tracing
+from tethysdash_plugin_geoglows.utils.prefetch import prefetch
+
+
+@pytest.fixture
+def spans():
+    """Collect the finished spans of a test, restoring the previous sink afterwards."""
+    finished = []
+    previous = tracing.set_span_sink(finished.append)
+    yield finished
+    tracing.set_span_sink(previous)
+
+
+def test_spans_are_free_when_tracing_is_off():
+    previous = tracing.set_span_sink(None)
+    try:
+        @tracing.traced()
+        def double(value):
+            return value * 2
+
+        with tracing.span("stage", dataset="forecast") as trace:
+            trace.set_attribute("cache", "memory")
+        assert trace is tracing.NOOP_SPAN
+        assert tracing.current_span() is tracing.NOOP_SPAN
+        assert double(2) == 4
+        assert tracing.propagate(double) is double
+    finally:
+        tracing.set_span_sink(previous)
+
+
+def test_spans_nest_and_record_errors(spans):
+    @tracing.traced()
+    def build():
+        tracing.current_span().set_attribute("traces", 3)
+
+    with tracing.span("plots.read", plot_name="forecast"):
+        build()
+        with pytest.raises(KeyError):
+            with tracing.span("plots.fetch"):
+                raise KeyError("forecast")
+
+    build_span, fetch_span, read_span = spans
+    assert build_span.name == "test_tracing.build"
+    assert build_span.attributes == {"traces": 3}
+    assert build_span.parent is read_span and fetch_span.parent is read_span
+    assert fetch_span.attributes == {"error": "KeyError"}
+    assert read_span.parent is None and read_span.attributes == {"plot_name": "forecast"}
+    assert read_span.duration_ns >= build_span.duration_ns + fetch_span.duration_ns
+    assert tracing.current_span() is tracing.NOOP_SPAN
+
+
+def test_prefetch_threads_report_to_the_calling_span(spans):
+    def load(name):
+        with tracing.span("get_plot_data", dataset=name):
+            return name
+
+    with tracing.span("plots.fetch"):
+        prefetch({name: (lambda name=name: load(name)) for name in ("forecast", "return-periods")}, max_workers=2)
+
+    *loads, fetch_span = spans
+    assert sorted(span.attributes["dataset"] for span in loads) == ["forecast", "return-periods"]
+    assert all(span.parent is fetch_span for span in loads)
+
+
+def test_a_failing_sink_does_not_fail_the_plot(caplog):
+    def sink(span):
+        raise RuntimeError("exporter is down")
+
+    previous = tracing.set_span_sink(sink)
+    try:
+        with caplog.at_level(logging.ERROR, logger=tracing.__name__):
+            with tracing.span("plots.read"):
+                pass
+    finally:
+        tracing.set_span_sink(previous)
+    assert "plots.read" in caplog.text
+
+
+def test_log_and_opentelemetry_sinks(spans, caplog):
+    exported = []
+
+    class _Exported:
+        def __init__(self, name, start_time, attributes):
+            self.record = {"name": name, "start_time": start_time, "attributes": attributes}
+
+        def end(self, end_time):
+            self.record["end_time"] = end_time
+            exported.append(self.record)
+
+    class _Tracer:
+        def start_span(self, name, start_time, attributes):
+            return _Exported(name, start_time, attributes)
+
+    with tracing.span("plots.read"):
+        with tracing.span("cache.read", dataset="retro-daily", cache="disk"):
+            pass
+    cache_span = spans[0]
+
+    with caplog.at_level(logging.INFO, logger=tracing.__name__):
+        tracing.log_span(cache_span)
+    tracing.opentelemetry_sink(_Tracer())(cache_span)
+
+    assert "cache.read" in caplog.text and "parent=plots.read" in caplog.text and "cache=disk" in caplog.text
+    assert exported == [{
+        "name": "cache.read",
+        "start_time": cache_span.start_ns,
+        "end_time": cache_span.start_ns + cache_span.duration_ns,
+        "attributes": {"dataset": "retro-daily", "cache": "disk", "parent": "plots.read"},
+    }]
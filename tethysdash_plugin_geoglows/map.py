@@ -1,7 +1,7 @@
 from intake.source import base
-import os
-import json
-from .utils.map import load_country_list, load_country_extents, convert_4326_to_3857
+from .utils.map import (
+    DEFAULT_MAP_EXTENT, country_map_config, load_country_list, load_country_extents, load_map_extents
+)
 
 
 class Map(base.DataSource):
@@ -30,31 +30,8 @@ class Map(base.DataSource):
         super(Map, self).__init__(metadata=metadata)
 
     def read(self):
-        module_path = os.path.dirname(__file__)
-        file_path = f'{module_path}/data/map_configs.json'
-        map_config = {}
-        with open(file_path) as file:
-            map_config = json.load(file)
-        map_config = map_config['args_string']
-        # Link Geoglows Streamflow layer with self.country
-        layers = map_config['layers']
-        for layer in layers:
-            props = layer['configuration']['props']
-            if props['name'] == 'Geoglows Streamflow':
-                if self.country == 'All Countries':
-                    props['source']['props']['params']['LAYERDEFS'] = ''
-                else:
-                    props['source']['props']['params']['LAYERDEFS'] = f"0: rivercountry='{self.country}'"
-        # Update map extent
-        map_config['map_extent'] = {'extent': self.get_map_extent()}
-        return map_config
+        # the layer config template is parsed once; only the streamflow layer filter and extent vary
+        return country_map_config(self.country, self.get_map_extent())
 
     def get_map_extent(self):
-        extent = Map.country_extents.get(self.country)
-        if extent:
-            lon_center = (extent[0] + extent[2]) / 2
-            lat_center = (extent[1] + extent[3]) / 2
-            center = convert_4326_to_3857(lon_center, lat_center)
-            return f"{center[0]},{center[1]},6"
-        else:
-            return "0, 2273030.9269876895,2"
+        return load_map_extents().get(self.country, DEFAULT_MAP_EXTENT)
@@ -1,20 +1,26 @@
 from intake.source import base
-import geoglows
-import pandas as pd
-import numpy as np
-from .utils.plot_data import get_plot_data, get_bias_corrected_plot_data
-from .utils.simu_plots import (
-    plot_retro_simulation, plot_retro_annual_status, plot_yearly_volumes,
-    plot_retro_fdc, plot_flood_probabilities, plot_ssi_each_month_since_year, plot_ssi_all_months
-)
-from .utils.bias_plots import (
-    plot_forecast_bias_correct, compute_return_periods,
-    plot_forecast_ensembles_bias_corrected, plot_forecast_stats_bias_corrected,
-    plot_annual_averages_bias_corrected, plot_retro_simulation_corrected,
-    plot_bias_corrected
-)
 import json
 from tethysapp.tethysdash.exceptions import VisualizationError
+from .utils.derived_data import aggregate_retro_daily
+from .utils.fetch_plan import DATASET, build_fetch_plan
+from .utils.prefetch import PrefetchTimeoutError, prefetch
+from .utils.tracing import span
+
+# TethysDash imports every intake driver at startup only to read its class
+# metadata, so geoglows, pandas, plotly and the plot modules are imported in
+# the methods that use them.
+
+
+def _parse_river_ids(river_id):
+    """Return the river ids in river_id (an id, a list of ids or a comma separated string) without repeats."""
+    if isinstance(river_id, str):
+        river_id = [part for part in river_id.replace(",", " ").split() if part]
+    elif not isinstance(river_id, (list, tuple)):
+        river_id = [river_id]
+    river_ids = list(dict.fromkeys(int(value) for value in river_id))
+    if not river_ids:
+        raise ValueError("At least one river id is required")
+    return river_ids
 
 
 class Plots(base.DataSource):
@@ -52,6 +58,16 @@ class Plots(base.DataSource):
             {"value": "bias-performance", "label": "Bias Correction Performance"},
         ],
         "bias_correction": ["None", "Local", "Global"],
+        "ensemble_mode": [
+            {"value": "members", "label": "All Members"},
+            {"value": "compact", "label": "All Members (Single Trace)"},
+            {"value": "summary", "label": "Percentile Bands"},
+        ],
+        "resolution": [
+            {"value": "auto", "label": "Automatic"},
+            {"value": "full", "label": "Full Resolution"},
+        ],
+        "date_range": "text",
         "observed_historical_data": "csv-uploader"
     }
     visualization_group = "GEOGLOWS"
@@ -60,11 +76,40 @@ class Plots(base.DataSource):
     visualization_attribution = 'pygeoglows'
     _user_parameters = []
 
-    def __init__(self, river_id, plot_name, observed_historical_data=None, bias_correction="None", metadata=None):
-        self.river_id = int(river_id)
+    def __init__(
+        self, river_id, plot_name, observed_historical_data=None, bias_correction="None", metadata=None,
+        batch_output="combined", ensemble_mode="members", typed_arrays=True, resolution="auto", date_range=None
+    ):
+        """
+        Args:
+            river_id (int, str or list): a river id, or several as a list or a comma
+                separated string to plot a batch of rivers
+            batch_output (str): for a batch, 'combined' returns one comparison figure and
+                'per-river' returns a figure per river keyed by river id
+            ensemble_mode (str): how forecast-ensembles draws the members: a trace per
+                member ('members'), all members in one trace ('compact') or the
+                min/25%/median/75%/max bands of the members ('summary')
+            typed_arrays (bool): send numeric arrays as plotly.js typed arrays (base64
+                'bdata'), as fig.to_json() does; False sends plain lists
+            resolution (str or int): points per trace of the long retrospective series.
+                'auto' thins an overview render to DEFAULT_MAX_POINTS per trace, keeping
+                every peak, and sends a date_range window in full; 'full' never thins;
+                a number caps the points per trace
+            date_range (str or tuple): 'start,end' limiting the retrospective simulation
+                to the visible window, e.g. when the chart is zoomed
+        """
+        self.river_ids = _parse_river_ids(river_id)
+        self.river_id = self.river_ids[0]
         self.plot_name = plot_name
         self.observed_historical_data = observed_historical_data
         self.bias_correction = bias_correction
+        self.batch_output = batch_output
+        self.ensemble_mode = ensemble_mode
+        self.typed_arrays = typed_arrays
+        self.resolution = resolution
+        self.date_range = date_range
+        self._window = None
+        self._max_points = None
         super(Plots, self).__init__(metadata=metadata)
 
     def _parse_observed_historical_data(self):
@@ -75,6 +120,9 @@ class Plots(base.DataSource):
         needed. Any malformed or wrong-shape payload raises a friendly
         VisualizationError rather than a cryptic pandas constructor error.
         """
+        import numpy as np
+        import pandas as pd
+
         required_columns = ("Datetime", "Streamflow (m3/s)")
         try:
             parsed = json.loads(self.observed_historical_data)
@@ -99,105 +147,242 @@ class Plots(base.DataSource):
             )
         return df_observed
 
+    def _aggregate_corrected(self, df_retro_daily_corrected, plot_name):
+        """Derive a corrected retro-monthly/retro-yearly frame keyed by the river id column."""
+        df = df_retro_daily_corrected.rename(columns={"Corrected Simulated Streamflow": self.river_id})
+        return aggregate_retro_daily(df, plot_name)
+
+    def fetch_plan(self):
+        """Return the FetchPlan describing every frame this plot needs."""
+        return build_fetch_plan(self.plot_name, self.bias_correction)
+
+    def _run_step(self, step, frames):
+        """Produce the frame for one plan step from the frames loaded before it."""
+        from .utils.corrections import corrected_forecast, corrected_retro_daily, corrected_return_periods
+        from .utils.plot_data import get_plot_data
+
+        if step.kind == DATASET:
+            return get_plot_data(self.river_id, step.name)
+        match step.name:
+            case "observed":
+                return self._parse_observed_historical_data()
+            case "retro-daily-corrected":
+                return corrected_retro_daily(
+                    self.river_id, self.bias_correction, frames["retro-daily"], frames.get("observed")
+                )
+            case "return-periods-corrected":
+                return corrected_return_periods(
+                    self.river_id, self.bias_correction, frames["retro-daily-corrected"], frames.get("observed")
+                )
+            case "forecast-corrected" | "forecast-stats-corrected" | "forecast-ensembles-corrected":
+                product = step.inputs[0]
+                return corrected_forecast(
+                    self.river_id, self.bias_correction, product, frames[product],
+                    frames.get("retro-daily"), frames.get("observed"),
+                )
+            case "retro-monthly" | "retro-yearly":
+                return aggregate_retro_daily(frames["retro-daily"], step.name)
+            case "retro-monthly-corrected" | "retro-yearly-corrected":
+                return self._aggregate_corrected(frames["retro-daily-corrected"], step.name[:-len("-corrected")])
+        raise ValueError(f"Unknown fetch plan step: {step.name}")
+
+    def _prefetch(self, loaders):
+        try:
+            return prefetch(loaders)
+        except PrefetchTimeoutError as exc:
+            raise VisualizationError(f"GEOGLOWS data is unavailable right now: {exc}. Please try again later.")
+
+    def _run_plan(self, plan, frames=None):
+        """Run a fetch plan, loading its independent datasets concurrently first.
+
+        frames may hold datasets that are already loaded, e.g. by a batch fetch.
+        """
+        from .utils.plot_data import get_plot_data
+
+        if frames is None:
+            frames = self._prefetch({
+                name: (lambda name=name: get_plot_data(self.river_id, name))
+                for name in plan.datasets
+            })
+        for step in plan:
+            if step.name not in frames:
+                with span("plots.step", step=step.name):
+                    frames[step.name] = self._run_step(step, frames)
+        return frames
+
     def read(self):
-        df_rp = get_plot_data(self.river_id, "return-periods")
-        df_observed, df_rp_corrected = None, None
-        df_retro_daily, df_retro_daily_corrected = None, None
-        df_retro_daily = get_plot_data(self.river_id, "retro-daily")
-        if self.bias_correction != "None":
-            if self.bias_correction == "Local":
-                df_observed = self._parse_observed_historical_data()
-                df_retro_daily_corrected = geoglows.bias.correct_historical(df_retro_daily, df_observed)
-            elif self.bias_correction == "Global":
-                df_retro_daily_corrected = geoglows.bias.discharge_transform(df_retro_daily, self.river_id)
-                df_retro_daily_corrected.rename(
-                    columns={self.river_id: "Corrected Simulated Streamflow"}, inplace=True
+        """Return the figure as a JSON-ready dict, timing its stages in spans (see utils.tracing)."""
+        with span(
+            "plots.read", plot_name=self.plot_name, bias_correction=self.bias_correction, rivers=len(self.river_ids)
+        ):
+            return self._read()
+
+    def _read(self):
+        from .utils.bias_plots import ENSEMBLE_MODES
+        from .utils.decimation import parse_date_range
+        from .utils.serialization import figure_to_dict
+
+        if self.plot_name == "bias-performance" and self.bias_correction != "Local":
+            raise VisualizationError("Bias performance plot requires bias correction option to be Local.")
+        if self.ensemble_mode not in ENSEMBLE_MODES:
+            raise VisualizationError(
+                f"Unknown ensemble mode '{self.ensemble_mode}'. Use one of: {', '.join(ENSEMBLE_MODES)}."
+            )
+        try:
+            self._window = parse_date_range(self.date_range)
+            self._max_points = self._resolution_points()
+        except (TypeError, ValueError) as exc:
+            raise VisualizationError(f"Invalid date range or resolution: {exc}")
+        if len(self.river_ids) > 1:
+            return self._read_batch()
+        with span("plots.fetch"):
+            frames = self._run_plan(self.fetch_plan())
+        with span("plots.build"):
+            plot = self._build_plot(frames)
+        with span("plots.serialize"):
+            return figure_to_dict(plot, self.typed_arrays)
+
+    def _resolution_points(self):
+        """Return the most points per retrospective trace, None for full resolution."""
+        from .utils.decimation import DEFAULT_MAX_POINTS
+
+        if self.resolution == "full":
+            return None
+        if self.resolution == "auto":
+            return None if self._window else DEFAULT_MAX_POINTS
+        max_points = int(self.resolution)
+        if max_points < 2:
+            raise ValueError("resolution must be 'auto', 'full' or at least 2 points")
+        return max_points
+
+    def _read_batch(self):
+        """Plot every river of a batch, downloading each dataset once for all of them."""
+        from .utils.plot_data import get_plot_data_batch
+        from .utils.serialization import figure_to_dict
+
+        if self.bias_correction == "Local":
+            raise VisualizationError("Local bias correction uses one observed record, so it needs a single river id.")
+        if self.batch_output not in ("combined", "per-river"):
+            raise VisualizationError(f"Unknown batch output '{self.batch_output}'. Use 'combined' or 'per-river'.")
+        plan = self.fetch_plan()
+        with span("plots.fetch"):
+            batch = self._prefetch({
+                name: (lambda name=name: get_plot_data_batch(self.river_ids, name))
+                for name in plan.datasets
+            })
+        figures = {}
+        for river_id in self.river_ids:
+            river = Plots(
+                river_id, self.plot_name, observed_historical_data=self.observed_historical_data,
+                bias_correction=self.bias_correction, metadata=self.metadata, ensemble_mode=self.ensemble_mode
+            )
+            river._window, river._max_points = self._window, self._max_points
+            with span("plots.build", river_id=river_id):
+                frames = river._run_plan(plan, {name: frames[river_id] for name, frames in batch.items()})
+                figures[river_id] = river._build_plot(frames)
+
+        with span("plots.serialize"):
+            if self.batch_output == "per-river":
+                return {str(river_id): figure_to_dict(plot, self.typed_arrays) for river_id, plot in figures.items()}
+            return figure_to_dict(self._combine_figures(figures), self.typed_arrays)
+
+    def _combine_figures(self, figures):
+        """Overlay the traces of per-river figures into one comparison figure.
+
+        Traces are grouped in the legend by river. Shapes such as return-period
+        bands belong to a single river and are dropped.
+        """
+        import plotly.graph_objs as go
+
+        first = next(iter(figures.values()))
+        combined = go.Figure(layout=first.layout)
+        combined.layout.shapes = ()
+        for river_id, plot in figures.items():
+            for trace in plot.data:
+                if trace.type == "table":
+                    raise VisualizationError(
+                        f"The {self.plot_name} plot is a table and cannot be combined across rivers. "
+                        "Use batch_output='per-river'."
                     )
-                if self.plot_name == "bias-performance":
-                    raise VisualizationError("Bias performance plot requires bias correction option to be Local.")
-            df_rp_corrected = compute_return_periods(df_retro_daily_corrected, self.river_id)
-        elif self.bias_correction == "None":
-            df_retro_daily_corrected = df_retro_daily
-            if self.plot_name == "bias-performance":
-                raise VisualizationError("Bias performance plot requires bias correction option to be Local.")
+                name = f"{river_id}: {trace.name}" if trace.name else str(river_id)
+                combined.add_trace(trace.update(name=name, legendgroup=str(river_id)))
+        title = first.layout.title.text or self.plot_name
+        combined.update_layout(title_text=f"{title} ({len(figures)} rivers)")
+        return combined
+
+    def _build_plot(self, frames):
+        """Build the plotly figure for this plot from the frames its fetch plan loaded."""
+        import geoglows
+        import pandas as pd
+        from .utils.decimation import clip_to_range
+        from .utils.simu_plots import (
+            plot_retro_simulation, plot_retro_annual_status, plot_yearly_volumes,
+            plot_retro_fdc, plot_flood_probabilities, plot_ssi_each_month_since_year, plot_ssi_all_months
+        )
+        from .utils.bias_plots import (
+            plot_forecast_bias_correct, plot_forecast_ensembles,
+            plot_forecast_ensembles_bias_corrected, plot_forecast_stats_bias_corrected,
+            plot_annual_averages_bias_corrected, plot_retro_simulation_corrected,
+            plot_bias_corrected
+        )
+
+        df_rp = frames.get("return-periods")
+        df_rp_corrected = frames.get("return-periods-corrected")
+        df_observed = frames.get("observed")
+        df_retro_daily = frames.get("retro-daily")
+        df_retro_daily_corrected = frames.get("retro-daily-corrected")
 
         match self.plot_name:
             case "forecast":
-                df_forecast = get_plot_data(self.river_id, self.plot_name)
+                df_forecast = frames[self.plot_name]
                 if self.bias_correction == "None":
                     plot = geoglows.plots.forecast(df_forecast, rp_df=df_rp)
                 else:
-                    if self.bias_correction == "Local":
-                        df_forecast_corrected = geoglows.bias.correct_forecast(
-                            df_forecast, simulated_data=df_retro_daily, observed_data=df_observed
-                        )
-                    elif self.bias_correction == "Global":
-                        df_forecast_corrected = geoglows.bias.discharge_transform(
-                            df_forecast, self.river_id
-                        )
-                        df_forecast_corrected.rename(
-                            columns={self.river_id: "Corrected Simulated Streamflow"}, inplace=True
-                        )
                     plot = plot_forecast_bias_correct(
-                        df_forecast, df_forecast_corrected, rp_df_sim=df_rp, rp_df_corrected=df_rp_corrected
+                        df_forecast, frames["forecast-corrected"], rp_df_sim=df_rp, rp_df_corrected=df_rp_corrected
                     )
             case "forecast-stats":
-                df_forecast_stats = get_plot_data(self.river_id, self.plot_name)
+                df_forecast_stats = frames[self.plot_name]
                 if self.bias_correction == "None":
                     plot = geoglows.plots.forecast_stats(df_forecast_stats, rp_df=df_rp)
                 else:
-                    if self.bias_correction == "Local":
-                        df_forecast_stats_corrected = geoglows.bias.correct_forecast(
-                            df_forecast_stats, simulated_data=df_retro_daily, observed_data=df_observed
-                        )
-                    elif self.bias_correction == "Global":
-                        df_forecast_stats_corrected = geoglows.bias.discharge_transform(
-                            df_forecast_stats, self.river_id
-                        )
-                        df_forecast_stats_corrected.rename(
-                            columns={self.river_id: "Corrected Simulated Streamflow"}, inplace=True
-                        )
                     plot = plot_forecast_stats_bias_corrected(
                         df_forecast_stats,
-                        df_forecast_stats_corrected,
+                        frames["forecast-stats-corrected"],
                         rp_df=df_rp,
                         rp_df_bias_corrected=df_rp_corrected
                     )
             case "forecast-ensembles":
-                df_forecast_ensemble = get_plot_data(self.river_id, self.plot_name)
-                if self.bias_correction == "None":
+                df_forecast_ensemble = frames[self.plot_name]
+                if self.bias_correction == "None" and self.ensemble_mode == "members":
                     plot = geoglows.plots.forecast_ensembles(df_forecast_ensemble, rp_df=df_rp)
+                elif self.bias_correction == "None":
+                    plot = plot_forecast_ensembles(df_forecast_ensemble, rp_df=df_rp, ensemble_mode=self.ensemble_mode)
                 else:
-                    if self.bias_correction == "Local":
-                        df_forecast_ensembles_corrected = geoglows.bias.correct_forecast(
-                            df_forecast_ensemble, simulated_data=df_retro_daily, observed_data=df_observed
-                        )
-                    elif self.bias_correction == "Global":
-                        df_forecast_ensembles_corrected = geoglows.bias.discharge_transform(
-                            df_forecast_ensemble, self.river_id
-                        )
-                        df_forecast_ensembles_corrected.rename(
-                            columns={self.river_id: "Corrected Simulated Streamflow"}, inplace=True
-                        )
                     plot = plot_forecast_ensembles_bias_corrected(
                         df=df_forecast_ensemble,
-                        df_bias_corrected=df_forecast_ensembles_corrected,
+                        df_bias_corrected=frames["forecast-ensembles-corrected"],
                         rp_df=df_rp,
-                        rp_df_bias_corrected=df_rp_corrected
+                        rp_df_bias_corrected=df_rp_corrected,
+                        ensemble_mode=self.ensemble_mode
                     )
             case "retro-simulation":
-                df_retro_monthly = get_plot_data(self.river_id, "retro-monthly")
+                df_retro_daily = clip_to_range(df_retro_daily, self._window)
                 if self.bias_correction == "None":
-                    plot = plot_retro_simulation(df_retro_daily, df_retro_monthly, self.river_id)
+                    plot = plot_retro_simulation(
+                        df_retro_daily, clip_to_range(frames["retro-monthly"], self._window), self.river_id,
+                        max_points=self._max_points
+                    )
                 elif self.bias_correction == "Local":
                     plot = geoglows.plots.corrected_retrospective(
-                        df_retro_daily_corrected, df_retro_daily, df_observed, df_rp
+                        clip_to_range(df_retro_daily_corrected, self._window), df_retro_daily, df_observed, df_rp
                     )
                 elif self.bias_correction == "Global":
-                    df_retro_monthly_corrected = get_bias_corrected_plot_data(self.river_id, "retro-monthly")
                     plot = plot_retro_simulation_corrected(
-                        df_retro_daily, df_retro_daily_corrected, df_retro_monthly,
-                        df_retro_monthly_corrected, self.river_id)
+                        df_retro_daily, clip_to_range(df_retro_daily_corrected, self._window),
+                        clip_to_range(frames["retro-monthly"], self._window),
+                        clip_to_range(frames["retro-monthly-corrected"], self._window), self.river_id,
+                        max_points=self._max_points)
             case "bias-performance":
                 plot = geoglows.plots.corrected_scatterplots(df_retro_daily_corrected, df_retro_daily, df_observed)
             case "retro-daily":
@@ -227,18 +412,20 @@ class Plots(base.DataSource):
                         df_doy_mean, df_doy_corrected,
                         "Daily Simulated Streamflow",
                         "Corrected Daily Simulated Streamflow",
-                        self.river_id
+                        self.river_id,
+                        max_points=self._max_points
                         )
             case "retro-monthly":
-                df_retro_monthly = get_plot_data(self.river_id, self.plot_name)
-                df_retro_monthly['month'] = df_retro_monthly.index.strftime('%m')
-                df_retro_monthly = df_retro_monthly.groupby('month').mean()
-                if self.bias_correction == "None":
-                    plot = geoglows.plots.monthly_averages(df_retro_monthly)
                 if self.bias_correction == "Local":
                     plot = geoglows.plots.corrected_month_average(df_retro_daily_corrected, df_retro_daily, df_observed)
+                else:
+                    df_retro_monthly = frames["retro-monthly"]
+                    df_retro_monthly['month'] = df_retro_monthly.index.strftime('%m')
+                    df_retro_monthly = df_retro_monthly.groupby('month').mean()
+                if self.bias_correction == "None":
+                    plot = geoglows.plots.monthly_averages(df_retro_monthly)
                 elif self.bias_correction == "Global":
-                    df_retro_monthly_corrected = get_bias_corrected_plot_data(self.river_id, "retro-monthly")
+                    df_retro_monthly_corrected = frames["retro-monthly-corrected"]
                     df_retro_monthly_corrected['month'] = df_retro_monthly_corrected.index.strftime('%m')
                     df_retro_monthly_corrected = df_retro_monthly_corrected.groupby('month').mean()
                     df_retro_monthly_corrected = df_retro_monthly_corrected.rename(
@@ -249,12 +436,12 @@ class Plots(base.DataSource):
                         df_retro_monthly_corrected,
                         "Monthly Simulated Averages",
                         "Corrected Monthly Simulated Averages",
-                        self.river_id
+                        self.river_id,
+                        max_points=self._max_points
                         )
             case "retro-yearly":
                 if self.bias_correction == "None":
-                    df = get_plot_data(self.river_id, self.plot_name)
-                    plot = geoglows.plots.annual_averages(df)
+                    plot = geoglows.plots.annual_averages(frames["retro-yearly"])
                 if self.bias_correction == "Local":
                     plot = plot_annual_averages_bias_corrected(
                         df_simulated=df_retro_daily, df_bias_corrected=df_retro_daily_corrected, df_observed=df_observed
@@ -264,45 +451,21 @@ class Plots(base.DataSource):
                         df_simulated=df_retro_daily, df_bias_corrected=df_retro_daily_corrected, df_observed=None
                     )
             case "retro-yearly-volume":
-                df_retro_yearly = get_plot_data(self.river_id, "retro-yearly")
-                if self.bias_correction == "None":
-                    plot = plot_yearly_volumes(df_retro_yearly, self.river_id)
-                elif self.bias_correction == "Local" or self.bias_correction == "Global":
-                    bias_corrected_yearly = df_retro_daily_corrected.resample('Y').mean()
-                    bias_corrected_yearly = bias_corrected_yearly.rename(
-                        columns={"Corrected Simulated Streamflow": self.river_id}
-                        )
-                    plot = plot_yearly_volumes(
-                        df_retro_yearly=df_retro_yearly,
-                        river_id=self.river_id,
-                        df_retro_yearly_corrected=bias_corrected_yearly
-                    )
+                plot = plot_yearly_volumes(
+                    df_retro_yearly=frames["retro-yearly"],
+                    river_id=self.river_id,
+                    df_retro_yearly_corrected=frames.get("retro-yearly-corrected")
+                )
             case "retro-status":
-                df_retro_monthly = get_plot_data(self.river_id, "retro-monthly")
                 if self.bias_correction == "None":
-                    plot = plot_retro_annual_status(df_retro_daily, df_retro_monthly, self.river_id)
-                elif self.bias_correction == "Global":
-                    df_retro_daily_corrected = df_retro_daily_corrected.rename(
-                        columns={"Corrected Simulated Streamflow": self.river_id}
-                        )
-                    df_retro_monthly_corrected = get_bias_corrected_plot_data(self.river_id, "retro-monthly")
-                    plot = plot_retro_annual_status(
-                        df_retro_daily=df_retro_daily_corrected,
-                        df_retro_monthly=df_retro_monthly_corrected,
-                        river_id=self.river_id,
-                        bias_corrected=True
-                    )
-                elif self.bias_correction == "Local":
-                    df_retro_monthly_corrected = df_retro_daily_corrected.resample('M').mean()
-                    df_retro_monthly_corrected = df_retro_monthly_corrected.rename(
-                        columns={"Corrected Simulated Streamflow": self.river_id}
-                        )
+                    plot = plot_retro_annual_status(df_retro_daily, frames["retro-monthly"], self.river_id)
+                else:
                     df_retro_daily_corrected = df_retro_daily_corrected.rename(
                         columns={"Corrected Simulated Streamflow": self.river_id}
                         )
                     plot = plot_retro_annual_status(
                         df_retro_daily=df_retro_daily_corrected,
-                        df_retro_monthly=df_retro_monthly_corrected,
+                        df_retro_monthly=frames["retro-monthly-corrected"],
                         river_id=self.river_id,
                         bias_corrected=True
                     )
@@ -317,23 +480,13 @@ class Plots(base.DataSource):
                         df_simulated=df_retro_daily, river_id=self.river_id, df_corrected=df_retro_daily_corrected
                     )
             case "exceedance":
-                df_ensemble = get_plot_data(self.river_id, "forecast-ensembles")
-                df_rp = get_plot_data(self.river_id, "return-periods")
                 if self.bias_correction == "None":
-                    plot = plot_flood_probabilities(df_ensemble, df_rp)
+                    plot = plot_flood_probabilities(frames["forecast-ensembles"], df_rp)
                 else:
-                    if self.bias_correction == "Local":
-                        df_forecast_ensembles_corrected = geoglows.bias.correct_forecast(
-                            df_ensemble, simulated_data=df_retro_daily, observed_data=df_observed
-                        )
-                    elif self.bias_correction == "Global":
-                        df_forecast_ensembles_corrected = geoglows.bias.discharge_transform(
-                            df_ensemble, self.river_id
-                        )
                     plot = plot_flood_probabilities(
-                        df_ensemble,
+                        frames["forecast-ensembles"],
                         df_rp,
-                        df_forecast_ensembles_corrected,
+                        frames["forecast-ensembles-corrected"],
                         df_rp_corrected
                         )
             case "ssi-monthly":
@@ -352,4 +505,4 @@ class Plots(base.DataSource):
                     plot = plot_ssi_all_months(
                         df_retro_daily, df_retro_daily_corrected
                     )
-        return json.loads(plot.to_json())
+        return plot
@@ -3,7 +3,9 @@ import numpy as np
 import plotly.graph_objs as go
 from datetime import datetime
 import pytz
+from .decimation import decimate
 from .plot_data import gumbel1
+from .tracing import traced
 
 
 def compute_return_periods(df_corrected: pd.DataFrame, river_id: str, rps=None) -> pd.DataFrame:
@@ -112,6 +114,7 @@ def _rperiod_scatters(startdate, enddate, rperiods: pd.DataFrame, y_max: float,
     return traces
 
 
+@traced()
 def plot_forecast_bias_correct(
     df_sim: pd.DataFrame,
     df_corrected: pd.DataFrame,
@@ -236,12 +239,186 @@ def timezone_label(timezone: str = None):
     return f'Datetime ({timezone} {utc_offset})'
 
 
+ENSEMBLE_MODES = ("members", "compact", "summary")
+ENSEMBLE_MEMBERS = [f'ensemble_{i:02}' for i in range(1, 52)]
+ENSEMBLE_SUMMARY_QUANTILES = [0, 0.25, 0.5, 0.75, 1]
+
+
+def _packed_members_trace(df_members, color, legend_group):
+    """All ensemble members in one trace, each member a segment ended by a NaN gap.
+
+    NaN values inside a member are skipped, so members still draw as
+    unbroken lines as in the one-trace-per-member mode.
+    """
+    values = df_members.to_numpy(dtype=float)
+    n_times, n_members = values.shape
+    values = np.vstack([values, np.full((1, n_members), np.nan)])
+    keep = ~np.isnan(values)
+    keep[-1, :] = True
+    times = df_members.index.append(df_members.index[-1:])
+    positions = np.tile(np.arange(n_times + 1), n_members)[keep.ravel(order='F')]
+    return go.Scatter(
+        name=None,
+        x=times[positions],
+        y=values.ravel(order='F')[keep.ravel(order='F')],
+        line=dict(color=color, width=1),
+        opacity=0.4,
+        legendgroup=legend_group,
+        showlegend=False
+    )
+
+
+def _member_band_traces(df_members, color, legend_group, label_prefix):
+    """Min-max and 25-75% bands and the median of the ensemble members, from one quantile call."""
+    bands = df_members.quantile(ENSEMBLE_SUMMARY_QUANTILES, axis=1).T.dropna(how='all')
+    low, p25, median, p75, high = (bands[q] for q in ENSEMBLE_SUMMARY_QUANTILES)
+
+    def band_edge(values, name=None, fill=None, opacity=1.0, width=0):
+        return go.Scatter(
+            name=name,
+            x=bands.index,
+            y=values,
+            fill=fill,
+            fillcolor=color if fill else None,
+            line=dict(color=color, width=width),
+            opacity=opacity,
+            legendgroup=legend_group,
+            showlegend=name is not None
+        )
+
+    return [
+        band_edge(high),
+        band_edge(low, f"{label_prefix} Ensemble Min-Max", fill='tonexty', opacity=0.2),
+        band_edge(p75),
+        band_edge(p25, f"{label_prefix} Ensemble 25-75%", fill='tonexty', opacity=0.4),
+        band_edge(median, f"{label_prefix} Ensemble Median", width=2),
+    ]
+
+
+def _ensemble_traces(df_input, color, legend_group, label_prefix, ensemble_mode="members"):
+    """Return the traces drawing one forecast ensemble and the highest flow they show.
+
+    ensemble_mode is one of ENSEMBLE_MODES: 'members' draws a trace per member,
+    'compact' packs all members into a single trace, and 'summary' draws
+    percentile bands of the members. The high-resolution member is always
+    drawn on its own.
+    """
+    if ensemble_mode not in ENSEMBLE_MODES:
+        raise ValueError(f"ensemble_mode must be one of {ENSEMBLE_MODES}")
+    traces = []
+    max_flows = []
+    # High-resolution ensemble_52
+    if 'ensemble_52' in df_input.columns:
+        traces.append(go.Scatter(
+            name=f"{label_prefix} Ensemble",
+            x=df_input.index,
+            y=df_input['ensemble_52'],
+            line=dict(color=color, width=2),
+            legendgroup=legend_group,
+            showlegend=True
+        ))
+        max_flows.append(df_input['ensemble_52'].max())
+
+    members = [col for col in ENSEMBLE_MEMBERS if col in df_input.columns]
+    if ensemble_mode == "members":
+        # Ensembles 01-51 (may have NaNs)
+        for col in members:
+            y_vals = df_input[col].dropna()
+            traces.append(go.Scatter(
+                name=None,
+                x=y_vals.index,
+                y=y_vals,
+                line=dict(color=color, width=1),
+                opacity=0.4,
+                legendgroup=legend_group,
+                showlegend=False
+            ))
+            if not y_vals.empty:
+                max_flows.append(y_vals.max())
+        return traces, max_flows
+
+    if members:
+        if ensemble_mode == "compact":
+            traces.append(_packed_members_trace(df_input[members], color, legend_group))
+        else:
+            # bands go below the high-resolution member
+            traces = _member_band_traces(df_input[members], color, legend_group, label_prefix) + traces
+        member_max = np.nanmax(df_input[members].to_numpy(dtype=float), initial=-np.inf)
+        if np.isfinite(member_max):
+            max_flows.append(member_max)
+    return traces, max_flows
+
+
+def _ensemble_layout(title, df, plot_titles=None):
+    startdate = df.index[0]
+    enddate = df.index[-1]
+    return go.Layout(
+        title=build_title(title, plot_titles),
+        yaxis={'title': 'Streamflow (m<sup>3</sup>/s)', 'range': [0, 'auto']},
+        xaxis={
+            'title': timezone_label(df.index.tz),
+            'range': [startdate, enddate],
+            'hoverformat': '%d %b %Y %X',
+            'tickformat': '%b %d %Y'
+        },
+        legend=dict(
+            orientation='v',
+            yanchor='top',
+            y=1.0,
+            xanchor='left',
+            x=1.02,
+            title='Legend',
+            bgcolor='rgba(255,255,255,0.8)',
+        ),
+    )
+
+
+def _return_period_toggles(df, rp_df, y_max, label_prefix):
+    """Return-period traces for an ensemble plot, initially hidden but toggleable."""
+    traces = _rperiod_scatters(df.index[0], df.index[-1], rp_df, y_max, label_prefix=label_prefix, show=True)
+    for t in traces:
+        t.update(showlegend=True, visible='legendonly', legendgroup=f"{label_prefix} Return Periods")
+    return traces
+
+
+@traced()
+def plot_forecast_ensembles(
+    df: pd.DataFrame,  # geoglows.data.forecast_ensemble
+    rp_df: pd.DataFrame = None,
+    ensemble_mode: str = "compact",
+    plot_titles: list = None,
+) -> go.Figure:
+    """
+    Plots a forecast ensemble in one of the lighter ENSEMBLE_MODES.
+
+    geoglows.plots.forecast_ensembles draws one trace per member; this draws the
+    members packed into one trace ('compact') or as percentile bands ('summary').
+
+    Parameters
+    ----------
+    df : pd.DataFrame - the forecast ensemble data
+    rp_df : pd.DataFrame, optional - return periods, toggleable in the legend
+    ensemble_mode : str - one of ENSEMBLE_MODES
+    plot_titles : list, optional - additional titles to add to the plot title
+
+    Returns
+    -------
+    go.Figure - the plotly figure object
+    """
+    scatter_plots, max_flows = _ensemble_traces(df, 'royalblue', 'Simulated Ensemble', 'Simulated', ensemble_mode)
+    if rp_df is not None:
+        scatter_plots += _return_period_toggles(df, rp_df, max(max_flows) if max_flows else 0, 'Simulated')
+    return go.Figure(scatter_plots, layout=_ensemble_layout('Ensemble Forecasts', df, plot_titles))
+
+
+@traced()
 def plot_forecast_ensembles_bias_corrected(
     df: pd.DataFrame,  # geoglows.data.forecast_ensemble
     df_bias_corrected: pd.DataFrame,  # bias corrected version of above dataframe
     rp_df: pd.DataFrame = None,
     rp_df_bias_corrected: pd.DataFrame = None,
     plot_titles: list = None,
+    ensemble_mode: str = "members",
 ) -> go.Figure:
     """
     Plots simulated and bias-corrected streamflow ensembles with optional return periods.
@@ -259,95 +436,39 @@ def plot_forecast_ensembles_bias_corrected(
     rp_df : pd.DataFrame, optional - return periods for simulated data, the original return periods
     rp_df_bias_corrected : pd.DataFrame, optional - the new calculated return periods for bias corrected data
     plot_titles : list, optional - additional titles to add to the plot title
+    ensemble_mode : str, optional - one of ENSEMBLE_MODES: a trace per member ('members', default),
+        all members in one trace ('compact') or percentile bands ('summary')
 
     Returns
     -------
     go.Figure - the plotly figure object with a plot of both the bias corrected and the simulated forecast ensemble
     """
-
-    scatter_plots = []
-    max_flows = []
-
-    startdate = df.index[0]
-    enddate = df.index[-1]
-
-    def process_ensemble(df_input, color, legend_group, label_prefix):
-        traces = []
-        # High-resolution ensemble_52
-        if 'ensemble_52' in df_input.columns:
-            traces.append(go.Scatter(
-                name=f"{label_prefix} Ensemble",
-                x=df_input.index,
-                y=df_input['ensemble_52'],
-                line=dict(color=color, width=2),
-                legendgroup=legend_group,
-                showlegend=True
-            ))
-            max_flows.append(df_input['ensemble_52'].max())
-
-        # Ensembles 01-51 (may have NaNs)
-        for i in range(1, 52):
-            col = f'ensemble_{i:02}'
-            if col in df_input.columns:
-                x_vals = df_input[col].dropna().index
-                y_vals = df_input[col].dropna()
-                traces.append(go.Scatter(
-                    name=None,
-                    x=x_vals,
-                    y=y_vals,
-                    line=dict(color=color, width=1),
-                    opacity=0.4,
-                    legendgroup=legend_group,
-                    showlegend=False
-                ))
-                if not y_vals.empty:
-                    max_flows.append(y_vals.max())
-        return traces
-
     # --- Process ensembles ---
-    scatter_plots += process_ensemble(df, 'royalblue', 'Simulated Ensemble', 'Simulated')
-    scatter_plots += process_ensemble(df_bias_corrected, 'darkorange', 'Bias-Corrected Ensemble', 'Bias-Corrected')
+    scatter_plots, max_flows = _ensemble_traces(
+        df, 'royalblue', 'Simulated Ensemble', 'Simulated', ensemble_mode
+    )
+    corrected_traces, corrected_max_flows = _ensemble_traces(
+        df_bias_corrected, 'darkorange', 'Bias-Corrected Ensemble', 'Bias-Corrected', ensemble_mode
+    )
+    scatter_plots += corrected_traces
+    max_flows += corrected_max_flows
 
     y_max = max(max_flows) if max_flows else 0
 
     # --- Return periods (toggleable) ---
-    def add_rp_traces(rp_df, label_prefix):
-        traces = _rperiod_scatters(startdate, enddate, rp_df, y_max, label_prefix=label_prefix, show=True)
-        # Make all RP traces initially hidden but toggleable
-        for t in traces:
-            t.update(showlegend=True, visible='legendonly', legendgroup=f"{label_prefix} Return Periods")
-        return traces
-
     if rp_df is not None:
-        scatter_plots += add_rp_traces(rp_df, 'Simulated')
+        scatter_plots += _return_period_toggles(df, rp_df, y_max, 'Simulated')
 
     if rp_df_bias_corrected is not None:
-        scatter_plots += add_rp_traces(rp_df_bias_corrected, 'Bias-Corrected')
+        scatter_plots += _return_period_toggles(df, rp_df_bias_corrected, y_max, 'Bias-Corrected')
 
     # --- Layout ---
-    layout = go.Layout(
-        title=build_title('Simulated vs Bias-Corrected Ensemble Forecasts', plot_titles),
-        yaxis={'title': 'Streamflow (m<sup>3</sup>/s)', 'range': [0, 'auto']},
-        xaxis={
-            'title': timezone_label(df.index.tz),
-            'range': [startdate, enddate],
-            'hoverformat': '%d %b %Y %X',
-            'tickformat': '%b %d %Y'
-        },
-        legend=dict(
-            orientation='v',
-            yanchor='top',
-            y=1.0,
-            xanchor='left',
-            x=1.02,
-            title='Legend',
-            bgcolor='rgba(255,255,255,0.8)',
-        ),
-    )
+    layout = _ensemble_layout('Simulated vs Bias-Corrected Ensemble Forecasts', df, plot_titles)
 
     return go.Figure(scatter_plots, layout=layout)
 
 
+@traced()
 def plot_forecast_stats_bias_corrected(
     df: pd.DataFrame,  # geoglows.data.forecast_stats(river_id)
     df_bias_corrected: pd.DataFrame,  # bias corrected version of above
@@ -509,6 +630,7 @@ def plot_forecast_stats_bias_corrected(
     return go.Figure(scatter_plots, layout=layout)
 
 
+@traced()
 def plot_annual_averages_bias_corrected(
     df_simulated: pd.DataFrame,  # daily geoglows data
     df_bias_corrected: pd.DataFrame,  # bias corrected data
@@ -612,30 +734,36 @@ def plot_annual_averages_bias_corrected(
     return go.Figure(scatter_plots, layout=layout)
 
 
+@traced()
 def plot_retro_simulation_corrected(
     df_retro_daily_og, df_retro_daily_corrected,
     df_retro_monthly_og, df_retro_monthly_corrected,
-    river_id,
+    river_id, max_points=None,
 ):
+    """max_points, when given, thins each trace with decimation.decimate, keeping its peaks."""
+    daily_og = decimate(df_retro_daily_og[river_id], max_points)
+    daily_corrected = decimate(df_retro_daily_corrected["Corrected Simulated Streamflow"], max_points)
+    monthly_og = decimate(df_retro_monthly_og[river_id], max_points)
+    monthly_corrected = decimate(df_retro_monthly_corrected[river_id], max_points)
 
     fig = go.Figure()
     fig.add_trace(go.Scatter(
-        x=df_retro_daily_og.index,
-        y=df_retro_daily_og[river_id],
+        x=daily_og.index,
+        y=daily_og,
         mode='lines',
         name='Daily Average Simulation'
     ))
 
     fig.add_trace(go.Scatter(
-        x=df_retro_daily_corrected.index,
-        y=df_retro_daily_corrected["Corrected Simulated Streamflow"],
+        x=daily_corrected.index,
+        y=daily_corrected,
         mode='lines',
         name='Daily Average Bias Corrected'
     ))
 
     fig.add_trace(go.Scatter(
-        x=df_retro_monthly_og.index,
-        y=df_retro_monthly_og[river_id],
+        x=monthly_og.index,
+        y=monthly_og,
         mode='lines',
         name='Monthly Average Simulation',
         line=dict(color='rgb(0, 166, 255)'),
@@ -643,8 +771,8 @@ def plot_retro_simulation_corrected(
     ))
 
     fig.add_trace(go.Scatter(
-        x=df_retro_monthly_corrected.index,
-        y=df_retro_monthly_corrected[river_id],
+        x=monthly_corrected.index,
+        y=monthly_corrected,
         mode='lines',
         name='Monthly Average Corrected',
         line=dict(color='rgb(0, 166, 255)'),
@@ -679,18 +807,22 @@ def plot_retro_simulation_corrected(
     return fig
 
 
-def plot_bias_corrected(df_og, df_corrected, sim_name, bias_name, river_id):
+@traced()
+def plot_bias_corrected(df_og, df_corrected, sim_name, bias_name, river_id, max_points=None):
+    """max_points, when given, thins each trace with decimation.decimate, keeping its peaks."""
+    og = decimate(df_og[river_id], max_points)
+    corrected = decimate(df_corrected["Corrected Simulated Streamflow"], max_points)
     fig = go.Figure()
     fig.add_trace(go.Scatter(
-        x=df_og.index,
-        y=df_og[river_id],
+        x=og.index,
+        y=og,
         mode='lines',
         name=sim_name
     ))
 
     fig.add_trace(go.Scatter(
-        x=df_corrected.index,
-        y=df_corrected["Corrected Simulated Streamflow"],
+        x=corrected.index,
+        y=corrected,
         mode='lines',
         name=bias_name
     ))
@@ -0,0 +1,141 @@
+"""Indexed catalog of the files in the geoglows plots cache.
+
+Files live in a sharded layout, ``<root>/<shard>/<river_id>/<dataset>-<version><ext>``,
+with the shard taken from the last digits of the river id so no directory grows
+with the total number of rivers. A SQLite table maps the exact
+``(dataset, river_id)`` pair to its current file. Lookups cost the same whatever
+the cache size, and one dataset name can never match another's prefix.
+"""
+import os
+import sqlite3
+import threading
+import time
+from collections import namedtuple
+
+CATALOG_FILENAME = "catalog.sqlite3"
+LOCKS_DIRNAME = "locks"
+SHARD_COUNT = 1000
+
+CatalogEntry = namedtuple("CatalogEntry", ["dataset", "river_id", "path", "version", "fetched_at", "nbytes"])
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    dataset TEXT NOT NULL,
+    river_id INTEGER NOT NULL,
+    path TEXT NOT NULL,
+    version TEXT NOT NULL,
+    fetched_at REAL NOT NULL,
+    nbytes INTEGER NOT NULL,
+    PRIMARY KEY (dataset, river_id)
+)
+"""
+
+
+class CacheCatalog:
+    """Exact (dataset, river_id) index over one cache directory.
+
+    A connection is opened per thread. SQLite's own locking makes the catalog
+    safe to share between worker processes using the same workspace.
+    """
+
+    def __init__(self, root):
+        self.root = root
+        self.db_path = os.path.join(root, CATALOG_FILENAME)
+        self._local = threading.local()
+
+    @property
+    def _connection(self):
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(_SCHEMA)
+            self._local.connection = connection
+        return connection
+
+    def shard_dir(self, river_id):
+        river_id = int(river_id)
+        return os.path.join(self.root, f"{river_id % SHARD_COUNT:03d}", str(river_id))
+
+    def lock_path(self, dataset, river_id):
+        """Return the single-flight lock file for (dataset, river_id), kept apart from the data files."""
+        river_id = int(river_id)
+        return os.path.join(self.root, LOCKS_DIRNAME, f"{river_id % SHARD_COUNT:03d}", f"{dataset}-{river_id}.lock")
+
+    def entry_path(self, dataset, river_id, version, extension):
+        return os.path.join(self.shard_dir(river_id), f"{dataset}-{version}{extension}")
+
+    def lookup(self, dataset, river_id):
+        row = self._connection.execute(
+            "SELECT dataset, river_id, path, version, fetched_at, nbytes FROM entries "
+            "WHERE dataset = ? AND river_id = ?",
+            (dataset, int(river_id)),
+        ).fetchone()
+        if row is None:
+            return None
+        entry = CatalogEntry(*row)
+        return entry._replace(path=os.path.join(self.root, entry.path))
+
+    def record(self, dataset, river_id, path, version, fetched_at=None):
+        """Point (dataset, river_id) at path, replacing any previous entry."""
+        self._connection.execute(
+            "INSERT OR REPLACE INTO entries (dataset, river_id, path, version, fetched_at, nbytes) "
+            "VALUES (?, ?, ?, ?, ?, ?)",
+            (
+                dataset,
+                int(river_id),
+                os.path.relpath(path, self.root),
+                version,
+                time.time() if fetched_at is None else fetched_at,
+                os.path.getsize(path),
+            ),
+        )
+
+    def remove(self, dataset, river_id):
+        self._connection.execute(
+            "DELETE FROM entries WHERE dataset = ? AND river_id = ?", (dataset, int(river_id))
+        )
+
+    def entries_with_prefix(self, dataset_prefix, river_id):
+        """Return the entries of river_id whose dataset starts with dataset_prefix, most recently fetched first."""
+        rows = self._connection.execute(
+            "SELECT dataset, river_id, path, version, fetched_at, nbytes FROM entries "
+            "WHERE river_id = ? AND substr(dataset, 1, ?) = ? ORDER BY fetched_at DESC, rowid DESC",
+            (int(river_id), len(dataset_prefix), dataset_prefix),
+        ).fetchall()
+        return [CatalogEntry(*row)._replace(path=os.path.join(self.root, row[2])) for row in rows]
+
+    def entries(self):
+        rows = self._connection.execute(
+            "SELECT dataset, river_id, path, version, fetched_at, nbytes FROM entries"
+        ).fetchall()
+        return [CatalogEntry(*row)._replace(path=os.path.join(self.root, row[2])) for row in rows]
+
+    def summary(self):
+        """Return {dataset: (entries, bytes, oldest fetched_at)}, aggregated by SQLite."""
+        rows = self._connection.execute(
+            "SELECT dataset, COUNT(*), SUM(nbytes), MIN(fetched_at) FROM entries GROUP BY dataset ORDER BY dataset"
+        ).fetchall()
+        return {dataset: (count, nbytes, oldest) for dataset, count, nbytes, oldest in rows}
+
+    def oldest(self):
+        """Return the entry fetched longest ago, or None when the catalog is empty."""
+        row = self._connection.execute(
+            "SELECT dataset, river_id, path, version, fetched_at, nbytes FROM entries ORDER BY fetched_at LIMIT 1"
+        ).fetchone()
+        if row is None:
+            return None
+        return CatalogEntry(*row)._replace(path=os.path.join(self.root, row[2]))
+
+
+_catalogs = {}
+_catalogs_lock = threading.Lock()
+
+
+def get_catalog(root):
+    """Return the shared catalog for a cache directory."""
+    with _catalogs_lock:
+        catalog = _catalogs.get(root)
+        if catalog is None:
+            catalog = _catalogs[root] = CacheCatalog(root)
+        return catalog
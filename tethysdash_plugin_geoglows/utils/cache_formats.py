@@ -0,0 +1,163 @@
+"""On-disk formats for the geoglows plots cache.
+
+Frames are stored in a columnar binary format by default so a cache hit does
+not have to re-parse text. The format is chosen with the
+``GEOGLOWS_PLOTS_CACHE_FORMAT`` environment variable (``parquet``, ``feather``
+or ``csv``). Files written in any known format stay readable, which lets
+callers migrate older CSV caches lazily.
+"""
+import importlib.util
+import os
+import re
+import threading
+
+import pandas as pd
+
+CACHE_FORMAT_ENV = "GEOGLOWS_PLOTS_CACHE_FORMAT"
+DEFAULT_CACHE_FORMAT = "parquet"
+# header of the index column of a CSV whose index holds datetimes
+DATETIME_INDEX_PREFIX = "datetime64:"
+_UTC_OFFSET = re.compile(r"(Z|[+-]\d\d:?\d\d)$")
+
+
+def _has_module(name):
+    return importlib.util.find_spec(name) is not None
+
+
+def _to_storable(df):
+    """Return a shallow copy whose column labels are strings.
+
+    Parquet and Arrow require string column names, while geoglows uses the
+    integer river id as the column label.
+    """
+    df = df.copy(deep=False)
+    df.columns = df.columns.astype(str)
+    return df
+
+
+def _restore_columns(df):
+    """Turn all-digit column labels back into the integer river ids."""
+    labels = df.columns
+    if len(labels) and all(isinstance(c, str) and c.isdigit() for c in labels):
+        df.columns = labels.astype("int64")
+    return df
+
+
+class CacheFormat:
+    name = None
+    extension = None
+
+    def is_available(self):
+        return True
+
+    def write(self, df, path):
+        raise NotImplementedError
+
+    def read(self, path):
+        raise NotImplementedError
+
+
+class CsvFormat(CacheFormat):
+    """Legacy text format, kept so existing caches remain readable.
+
+    A datetime index is written under a header marking it as such, followed
+    by its name, so it is parsed back whatever it is called (bias corrections
+    from geoglows have an unnamed one). Files from older releases only mark
+    it by the name 'time' or 'datetime'.
+    """
+    name = "csv"
+    extension = ".csv"
+
+    def write(self, df, path):
+        index_label = None
+        if isinstance(df.index, pd.DatetimeIndex):
+            index_label = DATETIME_INDEX_PREFIX + ("" if df.index.name is None else str(df.index.name))
+        df.to_csv(path, index_label=index_label)
+
+    def read(self, path):
+        df = pd.read_csv(path, index_col=[0])
+        label = df.index.name
+        if isinstance(label, str) and label.startswith(DATETIME_INDEX_PREFIX):
+            aware = len(df.index) > 0 and _UTC_OFFSET.search(str(df.index[0])) is not None
+            df.index = pd.to_datetime(df.index, format="ISO8601", utc=aware)
+            df.index.name = label[len(DATETIME_INDEX_PREFIX):] or None
+        elif label in ("time", "datetime"):
+            df.index = pd.to_datetime(df.index, utc=True)
+        df = _restore_columns(df)
+        if df.columns.dtype == "int64":
+            df.columns.name = "river_id"
+        return df
+
+
+class ParquetFormat(CacheFormat):
+    name = "parquet"
+    extension = ".parquet"
+
+    def is_available(self):
+        return _has_module("pyarrow") or _has_module("fastparquet")
+
+    def write(self, df, path):
+        _to_storable(df).to_parquet(path)
+
+    def read(self, path):
+        return _restore_columns(pd.read_parquet(path))
+
+
+class FeatherFormat(CacheFormat):
+    """Arrow IPC files, memory-mapped on read so hits are close to zero-copy."""
+    name = "feather"
+    extension = ".feather"
+
+    def is_available(self):
+        return _has_module("pyarrow")
+
+    def write(self, df, path):
+        _to_storable(df).to_feather(path)
+
+    def read(self, path):
+        from pyarrow import feather
+
+        table = feather.read_table(path, memory_map=True)
+        return _restore_columns(table.to_pandas())
+
+
+CACHE_FORMATS = {fmt.name: fmt for fmt in (ParquetFormat(), FeatherFormat(), CsvFormat())}
+
+
+def get_cache_format():
+    """Return the configured cache format, falling back to CSV.
+
+    An unknown name or a format whose engine is not installed degrades to CSV
+    instead of breaking every plot.
+    """
+    name = os.environ.get(CACHE_FORMAT_ENV, DEFAULT_CACHE_FORMAT).strip().lower()
+    cache_format = CACHE_FORMATS.get(name)
+    if cache_format is None or not cache_format.is_available():
+        return CACHE_FORMATS["csv"]
+    return cache_format
+
+
+def format_for_path(path):
+    """Return the format a cached file was written in, based on its extension."""
+    extension = os.path.splitext(path)[1]
+    for cache_format in CACHE_FORMATS.values():
+        if cache_format.extension == extension:
+            return cache_format
+    raise ValueError(f"Unknown cache file format: {path}")
+
+
+def write_frame(df, path, cache_format=None):
+    """Write df to path atomically so concurrent readers never see partial files."""
+    cache_format = cache_format or format_for_path(path)
+    tmp_path = f"{path}.{os.getpid()}-{threading.get_ident()}.tmp"
+    try:
+        cache_format.write(df, tmp_path)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+
+
+def read_frame(path):
+    """Read a cached frame in whichever format it was written."""
+    return format_for_path(path).read(path)
@@ -0,0 +1,211 @@
+"""Hit, miss and fetch statistics of the geoglows plots cache.
+
+read_through_cache and read_cached count, per dataset, the reads served from
+the memory tier and from disk, the misses that had to fetch (and among them
+the refetches of a stale entry), and a histogram of fetch latency. The
+counters are kept per worker process. cache_stats() joins them with what the
+cache holds, i.e. the entries, bytes and oldest entry per dataset from the
+catalog and the size and evictions of the memory tier.
+
+dump_cache_stats() writes that snapshot as JSON into the cache directory, one
+file per worker process. Set ``GEOGLOWS_PLOTS_CACHE_STATS_SECONDS`` to have
+each worker dump it at most that often while it serves reads (0, the default,
+never dumps).
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timezone
+
+from .cache_catalog import get_catalog
+from .memory_cache import frame_cache
+
+CACHE_STATS_ENV = "GEOGLOWS_PLOTS_CACHE_STATS_SECONDS"
+STATS_FILENAME = "cache_stats-{pid}.json"
+# upper bounds of the fetch latency histogram buckets, in seconds; a last bucket holds slower fetches
+FETCH_SECONDS_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _new_counts():
+    return {
+        "memory_hits": 0,
+        "disk_hits": 0,
+        "misses": 0,
+        "refetches": 0,
+        "fetch_seconds_total": 0.0,
+        "fetch_seconds_histogram": [0] * (len(FETCH_SECONDS_BUCKETS) + 1),
+    }
+
+
+def _summarize(counts):
+    """Return a copy of counts with the hit rate added and the histogram keyed by bucket bound."""
+    counts = dict(counts)
+    hits = counts["memory_hits"] + counts["disk_hits"]
+    reads = hits + counts["misses"]
+    counts["hit_rate"] = round(hits / reads, 4) if reads else None
+    counts["fetch_seconds_total"] = round(counts["fetch_seconds_total"], 3)
+    bounds = [str(bound) for bound in FETCH_SECONDS_BUCKETS] + ["inf"]
+    counts["fetch_seconds_histogram"] = dict(zip(bounds, counts["fetch_seconds_histogram"]))
+    return counts
+
+
+def _bucket(seconds):
+    for position, bound in enumerate(FETCH_SECONDS_BUCKETS):
+        if seconds <= bound:
+            return position
+    return len(FETCH_SECONDS_BUCKETS)
+
+
+class CacheCounters:
+    """Thread-safe per-dataset counters of cache reads in this process."""
+
+    def __init__(self):
+        self._datasets = {}
+        self._lock = threading.Lock()
+
+    def _counts(self, dataset):
+        counts = self._datasets.get(dataset)
+        if counts is None:
+            counts = self._datasets[dataset] = _new_counts()
+        return counts
+
+    def record_hit(self, dataset, tier):
+        """Count a read served from the 'memory' or 'disk' tier."""
+        with self._lock:
+            self._counts(dataset)[f"{tier}_hits"] += 1
+
+    def record_fetch(self, dataset, seconds, refetch=False):
+        """Count a miss that fetched the frame in seconds; refetch when it replaced a stale entry."""
+        with self._lock:
+            counts = self._counts(dataset)
+            counts["misses"] += 1
+            counts["refetches"] += int(refetch)
+            counts["fetch_seconds_total"] += seconds
+            counts["fetch_seconds_histogram"][_bucket(seconds)] += 1
+
+    def snapshot(self):
+        """Return {dataset: counts}, with each dataset's hit_rate (None before any read)."""
+        with self._lock:
+            datasets = {
+                dataset: {**counts, "fetch_seconds_histogram": list(counts["fetch_seconds_histogram"])}
+                for dataset, counts in self._datasets.items()
+            }
+        return {dataset: _summarize(counts) for dataset, counts in datasets.items()}
+
+    def discard(self, dataset):
+        """Forget the counts of a dataset that is no longer cached, e.g. an evicted correction."""
+        with self._lock:
+            self._datasets.pop(dataset, None)
+
+    def reset(self):
+        with self._lock:
+            self._datasets.clear()
+
+
+cache_counters = CacheCounters()
+
+
+def _isoformat(timestamp):
+    return None if timestamp is None else datetime.fromtimestamp(timestamp, timezone.utc).isoformat()
+
+
+def cache_stats(cache_root=None):
+    """Return a JSON-ready snapshot of the cache's use by this process and of what it holds.
+
+    Args:
+        cache_root (str, optional): cache directory, defaults to the one in the app workspace
+
+    Returns:
+        dict: 'datasets' maps each dataset to its read counters (memory_hits,
+            disk_hits, misses, refetches, hit_rate, fetch_seconds_total and
+            fetch_seconds_histogram, counted by this process) and its stored
+            entries, bytes and oldest_fetched_at (shared by all processes).
+            'disk' and 'memory' hold the totals of each tier, including the
+            oldest entry on disk and the memory tier's evictions.
+    """
+    if cache_root is None:
+        from .data_cache import get_cache_root
+
+        cache_root = get_cache_root()
+    catalog = get_catalog(cache_root)
+    stored = catalog.summary()
+    counters = cache_counters.snapshot()
+
+    datasets = {}
+    for dataset in sorted(set(stored) | set(counters)):
+        entries, nbytes, oldest = stored.get(dataset, (0, 0, None))
+        datasets[dataset] = {
+            **(counters.get(dataset) or _summarize(_new_counts())),
+            "entries": entries,
+            "bytes": nbytes,
+            "oldest_fetched_at": _isoformat(oldest),
+        }
+    oldest = catalog.oldest()
+    return {
+        "generated_at": _isoformat(time.time()),
+        "pid": os.getpid(),
+        "cache_root": cache_root,
+        "datasets": datasets,
+        "disk": {
+            "entries": sum(entries for entries, _nbytes, _oldest in stored.values()),
+            "bytes": sum(nbytes for _entries, nbytes, _oldest in stored.values()),
+            "oldest_entry": None if oldest is None else {
+                "dataset": oldest.dataset,
+                "river_id": oldest.river_id,
+                "fetched_at": _isoformat(oldest.fetched_at),
+            },
+        },
+        "memory": {
+            "entries": len(frame_cache),
+            "bytes": frame_cache.nbytes,
+            "max_bytes": frame_cache.max_bytes,
+            "evictions": frame_cache.evictions,
+        },
+    }
+
+
+def dump_cache_stats(cache_root=None, path=None):
+    """Write cache_stats() as JSON and return the file path.
+
+    Args:
+        cache_root (str, optional): cache directory, defaults to the one in the app workspace
+        path (str, optional): output file, defaults to cache_stats-<pid>.json in cache_root
+    """
+    stats = cache_stats(cache_root)
+    path = path or os.path.join(stats["cache_root"], STATS_FILENAME.format(pid=stats["pid"]))
+    partial_path = f"{path}.{threading.get_ident()}.tmp"
+    with open(partial_path, "w") as file:
+        json.dump(stats, file, indent=2)
+    os.replace(partial_path, path)
+    return path
+
+
+def _dump_interval_from_env():
+    try:
+        return max(float(os.environ.get(CACHE_STATS_ENV, 0)), 0)
+    except ValueError:
+        return 0
+
+
+_dump_interval = _dump_interval_from_env()
+_last_dump = {"at": 0.0}
+_dump_lock = threading.Lock()
+
+
+def dump_cache_stats_if_due(cache_root):
+    """Dump the stats when GEOGLOWS_PLOTS_CACHE_STATS_SECONDS have passed since the last dump.
+
+    The stats are best effort, so a dump that fails to write is skipped.
+    """
+    if not _dump_interval:
+        return
+    now = time.monotonic()
+    with _dump_lock:
+        if _last_dump["at"] and now - _last_dump["at"] < _dump_interval:
+            return
+        _last_dump["at"] = now
+    try:
+        dump_cache_stats(cache_root)
+    except OSError:
+        pass
@@ -0,0 +1,158 @@
+"""Memoized bias corrections of the retrospective simulation.
+
+Correcting a retro-daily series (Local against an uploaded observed record,
+Global with geoglows' discharge transform) and fitting return periods to the
+result are the slowest steps of a corrected plot. Both depend only on their
+input frames, so the results are stored in the plot data cache per river and
+correction mode, and Local ones also per observed record, so dashboards with
+different gauges on one river keep their own entries. Only the corrections of
+the LOCAL_RECORDS_KEPT most recently corrected records of a river and product
+are kept, so re-uploaded or edited records do not pile up. Entries are versioned
+by a fingerprint of the simulated data and the geoglows release. A correction
+is computed once per data version and shared by every panel and refresh that
+asks for it.
+"""
+import hashlib
+
+import geoglows
+import pandas as pd
+
+from .bias_plots import compute_return_periods
+from .data_cache import evict_entries, read_through_cache
+from .freshness import ContentVersionPolicy
+from .tracing import span
+
+CORRECTED_COLUMN = "Corrected Simulated Streamflow"
+LOCAL_DATASET_MARKER = "-corrected-local-"
+# observed records whose Local corrections are kept per river and product
+LOCAL_RECORDS_KEPT = 4
+
+
+def frame_fingerprint(df):
+    """Return a short hash of a frame's labels and values."""
+    index = df.index
+    if isinstance(index, pd.DatetimeIndex):
+        index = index.as_unit("ns")
+    digest = hashlib.sha1(",".join(str(column) for column in df.columns).encode())
+    digest.update(pd.util.hash_pandas_object(index).values.tobytes())
+    digest.update(pd.util.hash_pandas_object(df, index=False).values.tobytes())
+    return digest.hexdigest()[:16]
+
+
+def correction_fingerprint(*frames):
+    """Return the cache version of a correction computed from frames."""
+    parts = [geoglows.__version__] + [frame_fingerprint(df) for df in frames]
+    return hashlib.sha1("|".join(parts).encode()).hexdigest()[:16]
+
+
+def correction_dataset(product, bias_correction, df_observed=None):
+    """Return the cache dataset name of a correction of product.
+
+    Local corrections are named after the observed record they were fitted
+    to, so every record of a river is cached under its own key.
+    """
+    if bias_correction == "Local":
+        return f"{product}{LOCAL_DATASET_MARKER}{frame_fingerprint(df_observed)}"
+    return f"{product}-corrected-{bias_correction.lower()}"
+
+
+def _cached_correction(river_id, dataset, inputs, correct):
+    policy = ContentVersionPolicy(correction_fingerprint(*inputs))
+    computed = False
+
+    def compute():
+        nonlocal computed
+        computed = True
+        with span("correction", dataset=dataset):
+            return correct()
+
+    df = read_through_cache(river_id, dataset, compute, policy)
+    if computed and LOCAL_DATASET_MARKER in dataset:
+        # a new observed record was corrected: drop the corrections of the least recent ones
+        product = dataset[:dataset.index(LOCAL_DATASET_MARKER)]
+        evict_entries(river_id, product + LOCAL_DATASET_MARKER, LOCAL_RECORDS_KEPT)
+    return df
+
+
+def transformed_frame(river_id, dataset, df):
+    """Return geoglows' Global discharge transform of df, computed once per data version.
+
+    Column labels are kept, so the result is shaped like the dataset it came from.
+
+    Args:
+        river_id (int): river id
+        dataset (str): name of the product df holds, e.g. 'retro-simulation'
+        df (pd.DataFrame): the simulated data to correct
+    """
+    river_id = int(river_id)
+    return _cached_correction(
+        river_id, f"{dataset}-corrected-global", (df,), lambda: geoglows.bias.discharge_transform(df, river_id)
+    )
+
+
+def corrected_retro_daily(river_id, bias_correction, df_retro_daily, df_observed=None):
+    """Return the bias corrected retro-daily series, computing it once per data version.
+
+    Args:
+        river_id (int): river id
+        bias_correction (str): 'Local' or 'Global'
+        df_retro_daily (pd.DataFrame): retro-daily simulation for river_id
+        df_observed (pd.DataFrame, optional): observed record, required for Local
+
+    Returns:
+        df: the corrected series in a 'Corrected Simulated Streamflow' column
+    """
+    river_id = int(river_id)
+    if bias_correction == "Local":
+        def correct():
+            return geoglows.bias.correct_historical(df_retro_daily, df_observed)
+    else:
+        def correct():
+            df = geoglows.bias.discharge_transform(df_retro_daily, river_id)
+            return df.rename(columns={river_id: CORRECTED_COLUMN})
+
+    dataset = correction_dataset("retro-daily", bias_correction, df_observed)
+    return _cached_correction(river_id, dataset, (df_retro_daily,), correct)
+
+
+def corrected_forecast(river_id, bias_correction, product, df_forecast, df_retro_daily=None, df_observed=None):
+    """Return a bias corrected forecast product, computing it once per data version.
+
+    Args:
+        river_id (int): river id
+        bias_correction (str): 'Local' or 'Global'
+        product (str): 'forecast', 'forecast-stats' or 'forecast-ensembles'
+        df_forecast (pd.DataFrame): the forecast to correct
+        df_retro_daily (pd.DataFrame, optional): retro-daily simulation, required for Local
+        df_observed (pd.DataFrame, optional): observed record, required for Local
+    """
+    river_id = int(river_id)
+    if bias_correction == "Local":
+        inputs = (df_forecast, df_retro_daily)
+
+        def correct():
+            return geoglows.bias.correct_forecast(
+                df_forecast, simulated_data=df_retro_daily, observed_data=df_observed
+            )
+    else:
+        inputs = (df_forecast,)
+
+        def correct():
+            df = geoglows.bias.discharge_transform(df_forecast, river_id)
+            return df.rename(columns={river_id: CORRECTED_COLUMN})
+
+    return _cached_correction(river_id, correction_dataset(product, bias_correction, df_observed), inputs, correct)
+
+
+def corrected_return_periods(river_id, bias_correction, df_retro_daily_corrected, df_observed=None):
+    """Return the return periods of a corrected retro-daily series, computed once per version.
+
+    df_observed is the observed record a Local correction was fitted to, and required for Local.
+    """
+    river_id = int(river_id)
+    return _cached_correction(
+        river_id,
+        correction_dataset("return-periods", bias_correction, df_observed),
+        (df_retro_daily_corrected,),
+        lambda: compute_return_periods(df_retro_daily_corrected, river_id),
+    )
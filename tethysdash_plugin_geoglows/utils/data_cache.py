@@ -0,0 +1,263 @@
+"""Read-through cache shared by the plot data loaders.
+
+A dataset is looked up in the cache catalog, served from the in-process
+memory tier or from disk while its freshness policy says it is current, and
+only fetched from upstream once it goes stale. Files are written in the
+configured cache format; files left by older releases are migrated, or
+removed when out of date, the first time their key is read. Misses are
+single-flight per (dataset, river_id), across threads and worker processes.
+Hits, misses and fetch times are counted per dataset (see cache_stats).
+"""
+import getpass
+import glob
+import os
+import pwd
+import time
+from contextlib import ExitStack
+
+from .cache_catalog import get_catalog
+from .cache_formats import CACHE_FORMATS, get_cache_format, read_frame, write_frame
+from .cache_stats import cache_counters, dump_cache_stats_if_due
+from .freshness import get_freshness_policy, utc_now
+from .memory_cache import frame_cache
+from .single_flight import single_flight
+from .tracing import current_span, span
+
+CACHE_DIRNAME = "geoglows_plots_cache"
+
+
+def _owner_ids():
+    username = os.environ.get("NGINX_USER", getpass.getuser())
+    user = pwd.getpwnam(username)
+    return user.pw_uid, user.pw_gid
+
+
+def _ensure_dir(path):
+    if not os.path.exists(path):
+        os.makedirs(path, exist_ok=True)
+        uid, gid = _owner_ids()
+        os.chown(path, uid, gid)
+
+
+def get_cache_root():
+    """Return the geoglows plots cache directory inside the app workspace."""
+    from tethysapp.tethysdash.app import App
+
+    workspace_path = App.get_app_workspace()
+    cache_root = os.path.join(workspace_path.path, CACHE_DIRNAME)
+    _ensure_dir(cache_root)
+    return cache_root
+
+
+def _remove_quietly(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def _served_from(tier, dataset):
+    """Note the tier a read was served from on the current span and in the cache counters."""
+    current_span().set_attribute("cache", tier)
+    cache_counters.record_hit(dataset, tier)
+
+
+def _legacy_cache_files(cache_root, dataset, river_id):
+    """Return the files left for this key in the flat pre-catalog layout, newest first.
+
+    Those are named '{dataset}-{river_id}-{YYYYMMDD}' plus a format's
+    extension. Listing them scans the cache directory, so it is only done for
+    keys the catalog has never seen; the files are removed once the key is
+    cataloged.
+
+    Returns:
+        list: (date stamp, path) pairs
+    """
+    prefix = f"{dataset}-{river_id}-"
+    found = []
+    for cache_format in CACHE_FORMATS.values():
+        pattern = glob.escape(prefix) + "[0-9]" * 8 + cache_format.extension
+        for path in glob.glob(os.path.join(glob.escape(cache_root), pattern)):
+            found.append((os.path.basename(path)[len(prefix):len(prefix) + 8], path))
+    return sorted(found, reverse=True)
+
+
+def read_through_cache(river_id, dataset, fetch, policy=None):
+    """Return the cached frame for (river_id, dataset), fetching it when stale.
+
+    Fresh entries are served without locking. Callers that miss the cache
+    for the same key are coalesced (see single_flight): one of them fetches
+    and writes the entry while the others wait and then read it.
+
+    Args:
+        river_id (int): river id
+        dataset (str): name the frame is cataloged under
+        fetch (callable): zero-argument function that downloads the frame
+        policy (FreshnessPolicy, optional): decides whether a cached entry is
+            still valid. Defaults to the policy registered for dataset.
+
+    Returns:
+        df: the cached or freshly fetched dataframe
+    """
+    river_id = int(river_id)
+    with span("cache.read", dataset=dataset, river_id=river_id):
+        policy = policy or get_freshness_policy(dataset)
+        cache_root = get_cache_root()
+        catalog = get_catalog(cache_root)
+        dump_cache_stats_if_due(cache_root)
+
+        entry = catalog.lookup(dataset, river_id)
+        if entry is not None and policy.is_fresh(entry, utc_now()):
+            memory_key = (river_id, dataset, entry.version)
+            df = frame_cache.get(memory_key)
+            if df is not None:
+                _served_from("memory", dataset)
+                return df
+            if entry.path.endswith(get_cache_format().extension):
+                try:
+                    df = read_frame(entry.path)
+                except FileNotFoundError:
+                    pass
+                else:
+                    frame_cache.put(memory_key, df)
+                    _served_from("disk", dataset)
+                    return df
+
+        lock_path = catalog.lock_path(dataset, river_id)
+        _ensure_dir(os.path.dirname(lock_path))
+        with single_flight(lock_path):
+            return _refresh_entry(catalog, cache_root, river_id, dataset, fetch, policy)
+
+
+def read_through_cache_many(river_ids, dataset, fetch_many, policy=None):
+    """Return the cached frames of several rivers, fetching the stale ones in one call.
+
+    The single-flight locks of all the rivers are held, taken in river id
+    order so that overlapping batches cannot deadlock, while the cache is
+    checked again and the rivers still missing are fetched. Another batch or
+    read_through_cache of the same rivers waits for them and then finds them
+    cached.
+
+    Args:
+        river_ids (list): river ids
+        dataset (str): name the frames are cataloged under
+        fetch_many (callable): takes a list of river ids and returns
+            {river_id: dataframe} downloaded for all of them
+        policy (FreshnessPolicy, optional): defaults to the policy registered for dataset
+
+    Returns:
+        dict: river id -> dataframe, in the order of river_ids
+    """
+    river_ids = [int(river_id) for river_id in river_ids]
+    policy = policy or get_freshness_policy(dataset)
+    cache_root = get_cache_root()
+    catalog = get_catalog(cache_root)
+    with ExitStack() as locks:
+        for river_id in sorted(set(river_ids)):
+            lock_path = catalog.lock_path(dataset, river_id)
+            _ensure_dir(os.path.dirname(lock_path))
+            locks.enter_context(single_flight(lock_path))
+        frames = {river_id: read_cached(river_id, dataset, policy) for river_id in river_ids}
+        missing = [river_id for river_id, df in frames.items() if df is None]
+        fetched = fetch_many(missing) if missing else {}
+        for river_id in missing:
+            frames[river_id] = _refresh_entry(
+                catalog, cache_root, river_id, dataset, lambda river_id=river_id: fetched[river_id], policy
+            )
+    return frames
+
+
+def _refresh_entry(catalog, cache_root, river_id, dataset, fetch, policy):
+    """Load, migrate or fetch one entry; the caller holds its single-flight lock.
+
+    The catalog is read again here because another caller may have filled
+    the entry while this one was waiting for the lock.
+    """
+    now = utc_now()
+    source_path, version, fetched_at = None, None, None
+    legacy_paths = []
+    entry = catalog.lookup(dataset, river_id)
+    if entry is not None and policy.is_fresh(entry, now):
+        df = frame_cache.get((river_id, dataset, entry.version))
+        if df is not None:
+            _served_from("memory", dataset)
+            return df
+        if os.path.exists(entry.path):
+            source_path, version, fetched_at = entry.path, entry.version, entry.fetched_at
+    if entry is None:
+        # a legacy file was only valid on the day it was written; older ones are just removed
+        legacy_files = _legacy_cache_files(cache_root, dataset, river_id)
+        legacy_paths = [path for _stamp, path in legacy_files]
+        if legacy_files and legacy_files[0][0] == now.strftime("%Y%m%d"):
+            source_path = legacy_files[0][1]
+
+    if source_path is None:
+        current_span().set_attribute("cache", "miss")
+        started = time.perf_counter()
+        df = fetch()
+        cache_counters.record_fetch(dataset, time.perf_counter() - started, refetch=entry is not None)
+    else:
+        _served_from("disk", dataset)
+        df = read_frame(source_path)
+    if version is None:
+        version, fetched_at = policy.new_version(now, df), now.timestamp()
+
+    cache_format = get_cache_format()
+    new_data_path = catalog.entry_path(dataset, river_id, version, cache_format.extension)
+
+    if source_path != new_data_path:
+        _ensure_dir(os.path.dirname(new_data_path))
+        write_frame(df, new_data_path, cache_format)
+        catalog.record(dataset, river_id, new_data_path, version, fetched_at)
+        for old_path in (source_path, entry.path if entry is not None else None, *legacy_paths):
+            if old_path and old_path != new_data_path:
+                _remove_quietly(old_path)
+
+    frame_cache.put((river_id, dataset, version), df)
+    return df
+
+
+def evict_entries(river_id, dataset_prefix, keep):
+    """Remove all but the keep most recently fetched entries of river_id whose dataset starts with dataset_prefix.
+
+    The files, memory tier copies and read counters of the removed entries go too.
+
+    Returns:
+        list: the datasets removed
+    """
+    river_id = int(river_id)
+    catalog = get_catalog(get_cache_root())
+    removed = []
+    for entry in catalog.entries_with_prefix(dataset_prefix, river_id)[keep:]:
+        catalog.remove(entry.dataset, river_id)
+        _remove_quietly(entry.path)
+        frame_cache.discard((river_id, entry.dataset, entry.version))
+        cache_counters.discard(entry.dataset)
+        removed.append(entry.dataset)
+    return removed
+
+
+def read_cached(river_id, dataset, policy=None):
+    """Return the cached frame for (river_id, dataset) if a fresh copy exists, else None.
+
+    Unlike read_through_cache this never fetches, so callers can cheaply
+    reuse a dataset that happens to be cached already.
+    """
+    river_id = int(river_id)
+    with span("cache.lookup", dataset=dataset, river_id=river_id, cache="miss"):
+        policy = policy or get_freshness_policy(dataset)
+        entry = get_catalog(get_cache_root()).lookup(dataset, river_id)
+        if entry is None or not policy.is_fresh(entry, utc_now()):
+            return None
+        memory_key = (river_id, dataset, entry.version)
+        df = frame_cache.get(memory_key)
+        if df is None:
+            try:
+                df = read_frame(entry.path)
+            except FileNotFoundError:
+                return None
+            frame_cache.put(memory_key, df)
+            _served_from("disk", dataset)
+        else:
+            _served_from("memory", dataset)
+        return df
@@ -0,0 +1,113 @@
+"""Server-side thinning of long time series before they are plotted.
+
+A daily retrospective series has about 31,000 points since 1940, many more
+than the few thousand pixels a chart is wide. decimate() keeps the lowest
+and highest value of each of max_points / 2 equal buckets, so every peak and
+trough survives, which matters for flood review. A chart zoomed into a
+shorter date range can be re-requested at full resolution for that window
+(see clip_to_range).
+"""
+import numpy as np
+import pandas as pd
+
+# points per trace of an overview render, about two per pixel of a wide chart
+DEFAULT_MAX_POINTS = 4000
+
+
+def minmax_indices(values, max_points):
+    """Return the sorted positions of the min and max of each bucket of values.
+
+    The first and last positions are always kept, and a bucket holding only
+    NaN keeps one NaN so the gap still shows.
+
+    Args:
+        values (array-like): the series values
+        max_points (int or None): most positions to return; None keeps them all
+
+    Returns:
+        np.ndarray: increasing integer positions into values
+    """
+    values = np.asarray(values, dtype=float)
+    n = len(values)
+    if max_points is None or n <= max_points:
+        return np.arange(n)
+    size = -(-n // max((max_points - 2) // 2, 1))
+    buckets = -(-n // size)
+    padded = np.full(buckets * size, np.nan)
+    padded[:n] = values
+    padded = padded.reshape(buckets, size)
+    nan = np.isnan(padded)
+    low = np.where(nan, np.inf, padded).argmin(axis=1)
+    high = np.where(nan, -np.inf, padded).argmax(axis=1)
+    offsets = np.arange(buckets) * size
+    positions = np.concatenate(([0, n - 1], offsets + low, offsets + high))
+    return np.unique(np.minimum(positions, n - 1))
+
+
+def decimate(series, max_points=DEFAULT_MAX_POINTS):
+    """Thin a series to at most max_points with min/max bucketing (see minmax_indices).
+
+    Args:
+        series (pd.Series): values with a datetime index
+        max_points (int or None): None returns the series unchanged
+
+    Returns:
+        pd.Series: the kept points, with their original index
+    """
+    if max_points is None or len(series) <= max_points:
+        return series
+    return series.iloc[minmax_indices(series.to_numpy(), max_points)]
+
+
+def _timestamp(value):
+    if isinstance(value, str):
+        value = value.strip() or None
+    return None if value is None else pd.Timestamp(value)
+
+
+def parse_date_range(date_range):
+    """Return the (start, end) Timestamps of a date range.
+
+    Args:
+        date_range (str, tuple or None): 'start,end' (either side may be blank)
+            or a (start, end) pair of anything pd.Timestamp accepts
+
+    Returns:
+        tuple or None: None when date_range is empty, else (start, end) where
+            an open side is None
+
+    Raises:
+        ValueError: if the range is malformed or ends before it starts
+    """
+    if date_range is None:
+        return None
+    if isinstance(date_range, str):
+        if not date_range.strip():
+            return None
+        date_range = date_range.split(",")
+    if len(date_range) != 2:
+        raise ValueError("date_range needs a start and an end, e.g. '2010-01-01,2012-12-31'")
+    start, end = (_timestamp(value) for value in date_range)
+    if start is not None and end is not None and end < start:
+        raise ValueError("date_range ends before it starts")
+    return start, end
+
+
+def _align(timestamp, tz):
+    if timestamp is None:
+        return None
+    if timestamp.tz is None:
+        return timestamp if tz is None else timestamp.tz_localize(tz)
+    return timestamp.tz_convert(tz) if tz is not None else timestamp.tz_convert(None)
+
+
+def clip_to_range(df, date_range):
+    """Return the rows of a time-indexed frame inside a parsed date range (inclusive).
+
+    Naive bounds are taken in the frame's time zone.
+    """
+    if date_range is None:
+        return df
+    tz = df.index.tz
+    start, end = (_align(timestamp, tz) for timestamp in date_range)
+    return df.loc[start:end]
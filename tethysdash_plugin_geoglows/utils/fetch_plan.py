@@ -0,0 +1,109 @@
+"""Declarative fetch plans for Plots.read.
+
+A plan lists, in execution order, every frame one (plot_name, bias_correction)
+combination needs:
+
+- ``dataset`` steps load a product through get_plot_data,
+- ``transform`` steps parse the observed record or apply a bias correction,
+- ``derived`` steps aggregate frames that are already loaded.
+
+Each step names its inputs, so a plan can be printed or asserted on without
+running it.
+"""
+from collections import namedtuple
+
+DATASET = "dataset"
+TRANSFORM = "transform"
+DERIVED = "derived"
+
+PlanStep = namedtuple("PlanStep", ["name", "kind", "inputs"])
+
+# Forecast-based plots and the forecast product each one draws.
+FORECAST_PRODUCTS = {
+    "forecast": "forecast",
+    "forecast-stats": "forecast-stats",
+    "forecast-ensembles": "forecast-ensembles",
+    "exceedance": "forecast-ensembles",
+}
+
+# Derived frames per plot, for uncorrected and corrected renders.
+DERIVED_FRAMES = {
+    "retro-simulation": {"None": ["retro-monthly"], "Global": ["retro-monthly", "retro-monthly-corrected"]},
+    "retro-monthly": {"None": ["retro-monthly"], "Global": ["retro-monthly", "retro-monthly-corrected"]},
+    "retro-yearly": {"None": ["retro-yearly"]},
+    "retro-yearly-volume": {
+        "None": ["retro-yearly"],
+        "Local": ["retro-yearly", "retro-yearly-corrected"],
+        "Global": ["retro-yearly", "retro-yearly-corrected"],
+    },
+    "retro-status": {
+        "None": ["retro-monthly"],
+        "Local": ["retro-monthly-corrected"],
+        "Global": ["retro-monthly-corrected"],
+    },
+}
+
+
+class FetchPlan:
+    """The ordered steps that load and prepare the frames for one plot."""
+
+    def __init__(self, plot_name, bias_correction, steps):
+        self.plot_name = plot_name
+        self.bias_correction = bias_correction
+        self.steps = tuple(steps)
+
+    def __iter__(self):
+        return iter(self.steps)
+
+    def __contains__(self, name):
+        return any(step.name == name for step in self.steps)
+
+    def __repr__(self):
+        return f"FetchPlan({self.plot_name!r}, {self.bias_correction!r}, {list(self.step_names)})"
+
+    @property
+    def step_names(self):
+        return tuple(step.name for step in self.steps)
+
+    @property
+    def datasets(self):
+        """Names of the products the plan loads through get_plot_data."""
+        return tuple(step.name for step in self.steps if step.kind == DATASET)
+
+    def describe(self):
+        """Return one human readable line per step, for logging and debugging."""
+        return [
+            f"{step.kind} {step.name}" + (f" <- {', '.join(step.inputs)}" if step.inputs else "")
+            for step in self.steps
+        ]
+
+
+def build_fetch_plan(plot_name, bias_correction):
+    """Return the FetchPlan for a plot_name and bias_correction ('None', 'Local' or 'Global')."""
+    steps = []
+    corrected = bias_correction != "None"
+    product = FORECAST_PRODUCTS.get(plot_name)
+
+    if product is not None:
+        steps.append(PlanStep(product, DATASET, ()))
+    if product is not None or (plot_name == "retro-simulation" and bias_correction == "Local"):
+        steps.append(PlanStep("return-periods", DATASET, ()))
+    if product is None or corrected:
+        steps.append(PlanStep("retro-daily", DATASET, ()))
+
+    if bias_correction == "Local":
+        steps.append(PlanStep("observed", TRANSFORM, ()))
+        steps.append(PlanStep("retro-daily-corrected", TRANSFORM, ("retro-daily", "observed")))
+    elif bias_correction == "Global":
+        steps.append(PlanStep("retro-daily-corrected", TRANSFORM, ("retro-daily",)))
+
+    if product is not None and corrected:
+        steps.append(PlanStep("return-periods-corrected", TRANSFORM, ("retro-daily-corrected",)))
+        forecast_inputs = (product, "retro-daily", "observed") if bias_correction == "Local" else (product,)
+        steps.append(PlanStep(f"{product}-corrected", TRANSFORM, forecast_inputs))
+
+    for name in DERIVED_FRAMES.get(plot_name, {}).get(bias_correction, []):
+        source = "retro-daily-corrected" if name.endswith("-corrected") else "retro-daily"
+        steps.append(PlanStep(name, DERIVED, (source,)))
+
+    return FetchPlan(plot_name, bias_correction, steps)
@@ -0,0 +1,119 @@
+"""Array-based monthly flow statistics shared by the retrospective plots.
+
+Daily values are partitioned by integer month code and each month is sorted
+once with NumPy. Ranked values, such as status thresholds, are then read
+from all twelve months with a single fancy index. This replaces one filter
+and sort per month.
+"""
+from collections import namedtuple
+
+import numpy as np
+import pandas as pd
+
+MONTHS = pd.RangeIndex(1, 13, name="month")
+
+MonthPartition = namedtuple("MonthPartition", ["values", "starts", "counts"])
+
+
+def partition_by_month(series, descending=False):
+    """Sort the values of a daily series within each calendar month.
+
+    NaN values sort to the end of their month, as with pandas' sort_values.
+
+    Args:
+        series (pd.Series): daily values with a datetime index
+        descending (bool): sort each month from its highest value down
+
+    Returns:
+        MonthPartition: the sorted values, grouped January to December, with
+            the start offset and size of every month (arrays of length 12)
+    """
+    values = np.asarray(series, dtype=float)
+    months = series.index.month.to_numpy()
+    order = np.lexsort((-values if descending else values, months))
+    counts = np.bincount(months, minlength=13)[1:]
+    starts = np.concatenate(([0], np.cumsum(counts)[:-1]))
+    return MonthPartition(values[order], starts, counts)
+
+
+def pick_ranks(partition, positions):
+    """Read the values at the given in-month positions of a MonthPartition.
+
+    Args:
+        partition (MonthPartition): from partition_by_month
+        positions (np.ndarray): integer positions, shape (12, k), within each month
+
+    Returns:
+        np.ndarray: shape (12, k); months without data are NaN
+    """
+    if not len(partition.values):
+        return np.full(positions.shape, np.nan)
+    index = np.clip(partition.starts[:, None] + positions, 0, len(partition.values) - 1)
+    return np.where(partition.counts[:, None] > 0, partition.values[index], np.nan)
+
+
+def monthly_status_thresholds(series, percentiles):
+    """Return the flows bounding each status percentile for every month.
+
+    Percentiles count from the wettest day: for a month of n days sorted from
+    the highest flow down, percentile p picks position int(n * p / 100).
+
+    Returns:
+        pd.DataFrame: index month 1-12, one column per percentile
+    """
+    partition = partition_by_month(series, descending=True)
+    positions = (partition.counts[:, None] * np.asarray(percentiles)[None, :] / 100).astype(int)
+    return pd.DataFrame(pick_ranks(partition, positions), index=MONTHS, columns=list(percentiles))
+
+
+def yearly_monthly_means(series):
+    """Pivot a monthly series into a year x month (1-12) table."""
+    table = series.groupby([series.index.year, series.index.month]).mean().unstack()
+    return table.reindex(columns=MONTHS)
+
+
+def flow_duration_curve(series, exceedance):
+    """Return the flow duration curve of a daily series, overall and for each month.
+
+    For a record of n values sorted ascending, exceedance p picks position
+    n * (100 - p) // 100 (the last value for p = 0). The result is a plain
+    frame, so it can be cached or served on its own.
+
+    Args:
+        series (pd.Series): daily values with a datetime index
+        exceedance (array-like): integer exceedance percentages, 0-100
+
+    Returns:
+        pd.DataFrame: one column per exceedance percentage. Row 0 is the curve of
+            the whole record and rows 1-12 are the curves of each calendar month.
+    """
+    exceedance = np.asarray(exceedance, dtype=int)
+    rank = 100 - exceedance
+    partition = partition_by_month(series)
+    monthly = pick_ranks(partition, partition.counts[:, None] * rank[None, :] // 100 - (rank == 100))
+
+    overall = np.sort(partition.values)
+    if len(overall):
+        overall = overall[len(overall) * rank // 100 - (rank == 100)]
+    else:
+        overall = np.full(len(rank), np.nan)
+
+    return pd.DataFrame(
+        np.vstack([overall, monthly]),
+        index=pd.RangeIndex(0, 13, name="month"),
+        columns=exceedance.tolist(),
+    )
+
+
+def flow_duration_curves(series, exceedance):
+    """Return flow_duration_curve for several series, e.g. simulated and corrected flows.
+
+    Args:
+        series (pd.DataFrame or dict): columns of a frame, or a mapping of
+            name -> pd.Series when the series cover different periods
+        exceedance (array-like): integer exceedance percentages, 0-100
+
+    Returns:
+        dict: column label or name -> flow duration curve frame
+    """
+    return {name: flow_duration_curve(values, exceedance) for name, values in series.items()}
@@ -0,0 +1,206 @@
+"""Freshness policies deciding when a cached dataset must be fetched again.
+
+Forecast products are versioned by the forecast cycle found in the data and
+stay valid until a newer cycle has actually been published. Retrospective
+products and return periods change rarely, so they are kept for a number of
+days (``GEOGLOWS_PLOTS_TTL_DAYS_<DATASET>``, e.g.
+``GEOGLOWS_PLOTS_TTL_DAYS_RETRO_DAILY``) and are also invalidated whenever the
+upstream store they come from changes.
+"""
+import hashlib
+import os
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import geoglows
+import pandas as pd
+
+DEFAULT_RETRO_TTL_DAYS = 30
+TTL_ENV_PREFIX = "GEOGLOWS_PLOTS_TTL_DAYS_"
+FORECAST_CYCLE_HOURS = 24
+FORECAST_RECHECK_ENV = "GEOGLOWS_PLOTS_FORECAST_RECHECK_MINUTES"
+DEFAULT_FORECAST_RECHECK_MINUTES = 30
+CYCLE_FORMAT = "%Y%m%d%H"
+
+
+def utc_now():
+    return datetime.now(timezone.utc)
+
+
+class FreshnessPolicy:
+    def new_version(self, now, df):
+        """Return the version token to record for df, fetched at now."""
+        raise NotImplementedError
+
+    def is_fresh(self, entry, now):
+        """Return True if the catalog entry can still be served at now."""
+        raise NotImplementedError
+
+
+class DailyRolloverPolicy(FreshnessPolicy):
+    """Data is valid for the UTC calendar day it was fetched on."""
+
+    def new_version(self, now, df):
+        return now.strftime("%Y%m%d")
+
+    def is_fresh(self, entry, now):
+        return entry.version == now.strftime("%Y%m%d")
+
+
+class TTLPolicy(FreshnessPolicy):
+    """Data is valid for ttl_seconds, as long as its upstream source is unchanged.
+
+    Args:
+        ttl_seconds (float): maximum age of a cached entry
+        source (str, optional): geoglows product name whose configured store
+            location (and the geoglows release) is folded into the version, so
+            pointing at a new store invalidates every cached entry.
+    """
+
+    def __init__(self, ttl_seconds, source=None):
+        self.ttl_seconds = ttl_seconds
+        self.source = source
+
+    def source_tag(self):
+        if self.source is None:
+            return None
+        try:
+            from geoglows._constants import get_uri
+
+            uri = get_uri(self.source)
+        except (ImportError, KeyError):
+            uri = self.source
+        return hashlib.sha1(f"{uri}|{geoglows.__version__}".encode()).hexdigest()[:8]
+
+    def new_version(self, now, df):
+        version = now.strftime("%Y%m%d%H%M%S")
+        tag = self.source_tag()
+        return f"{version}_{tag}" if tag else version
+
+    def is_fresh(self, entry, now):
+        if now.timestamp() - entry.fetched_at >= self.ttl_seconds:
+            return False
+        tag = self.source_tag()
+        return tag is None or entry.version.endswith(f"_{tag}")
+
+
+class ContentVersionPolicy(FreshnessPolicy):
+    """Data is valid while it was computed from inputs with the given fingerprint.
+
+    Used for frames derived from other frames, such as bias corrections,
+    whose version is a hash of their inputs rather than a fetch time.
+    """
+
+    def __init__(self, fingerprint):
+        self.fingerprint = fingerprint
+
+    def new_version(self, now, df):
+        return self.fingerprint
+
+    def is_fresh(self, entry, now):
+        return entry.version == self.fingerprint
+
+
+_latest_cycle_lock = threading.Lock()
+_latest_cycle = {"checked_at": None, "cycle": None}
+
+
+def _recheck_seconds():
+    try:
+        minutes = float(os.environ.get(FORECAST_RECHECK_ENV, DEFAULT_FORECAST_RECHECK_MINUTES))
+    except ValueError:
+        minutes = DEFAULT_FORECAST_RECHECK_MINUTES
+    return minutes * 60
+
+
+def _fetch_latest_cycle():
+    available = geoglows.data.dates()
+    if isinstance(available, dict):
+        available = available.get("available_dates", [])
+    else:
+        available = available["dates"].tolist()
+    cycles = [str(d)[:10].ljust(10, "0") for d in available]
+    return max(cycles) if cycles else None
+
+
+def latest_forecast_cycle():
+    """Return the newest published forecast cycle as a YYYYMMDDHH string.
+
+    The answer is shared by every river in the process and only asked of
+    geoglows again after GEOGLOWS_PLOTS_FORECAST_RECHECK_MINUTES. Lookup
+    failures return the last known cycle.
+    """
+    with _latest_cycle_lock:
+        checked_at = _latest_cycle["checked_at"]
+        if checked_at is not None and time.monotonic() - checked_at < _recheck_seconds():
+            return _latest_cycle["cycle"]
+        try:
+            _latest_cycle["cycle"] = _fetch_latest_cycle()
+        except Exception:
+            pass
+        _latest_cycle["checked_at"] = time.monotonic()
+        return _latest_cycle["cycle"]
+
+
+def forecast_cycle_of(df):
+    """Return the YYYYMMDDHH initialization cycle of a forecast frame, or None."""
+    index = df.index
+    if not isinstance(index, pd.DatetimeIndex) or index.empty:
+        return None
+    start = index.min()
+    if start.tzinfo is not None:
+        start = start.tz_convert("UTC")
+    return start.floor("D").strftime(CYCLE_FORMAT)
+
+
+class ForecastCyclePolicy(FreshnessPolicy):
+    """Forecast data is valid until a newer forecast cycle is published.
+
+    Entries are versioned by the initialization cycle in the data, never by
+    the wall clock, so a fetch just after midnight cannot pin yesterday's
+    cycle as today's. Until the next cycle is due nothing is checked; after
+    that the published cycles are looked up (see latest_forecast_cycle).
+    """
+
+    def new_version(self, now, df):
+        return forecast_cycle_of(df) or now.strftime(CYCLE_FORMAT)
+
+    def is_fresh(self, entry, now):
+        try:
+            cycle = datetime.strptime(entry.version, CYCLE_FORMAT).replace(tzinfo=timezone.utc)
+        except ValueError:
+            return False
+        if now < cycle + timedelta(hours=FORECAST_CYCLE_HOURS):
+            return True
+        latest = latest_forecast_cycle()
+        return latest is not None and latest <= entry.version
+
+
+def _ttl_days(dataset, default):
+    value = os.environ.get(TTL_ENV_PREFIX + dataset.upper().replace("-", "_"))
+    try:
+        return float(value) if value is not None else default
+    except ValueError:
+        return default
+
+
+FORECAST_DATASETS = ("forecast", "forecast-stats", "forecast-ensembles")
+
+RETRO_SOURCES = {
+    "retro-simulation": "retro_hourly",
+    "retro-daily": "retro_daily",
+    "retro-monthly": "retro_monthly",
+    "retro-yearly": "retro_yearly",
+    "return-periods": "return_periods",
+}
+
+
+def get_freshness_policy(dataset):
+    """Return the freshness policy for a cached dataset name."""
+    if dataset in RETRO_SOURCES:
+        days = _ttl_days(dataset, DEFAULT_RETRO_TTL_DAYS)
+        return TTLPolicy(days * 24 * 60 * 60, source=RETRO_SOURCES[dataset])
+    if dataset in FORECAST_DATASETS:
+        return ForecastCyclePolicy()
+    return DailyRolloverPolicy()
@@ -1,27 +1,34 @@
 import os
 import json
-from pyproj import Transformer
+from functools import lru_cache
+from types import MappingProxyType
 
 
 module_path = os.path.dirname(__file__)
 
+STREAMFLOW_LAYER = "Geoglows Streamflow"
+# Web Mercator center and zoom of the map when a country has no extent
+DEFAULT_MAP_EXTENT = "0, 2273030.9269876895,2"
+COUNTRY_ZOOM = 6
+
+
+@lru_cache(maxsize=None)
+def _read_json(name):
+    with open(os.path.join(module_path, "../data", name), "r") as file:
+        return json.load(file)
+
 
 def load_country_list():
-    filename = os.path.join(module_path, "../data/countries_extents.json")
     country_list = []
-    with open(filename, "r") as file:
-        data = json.load(file)
-    for country_name, _extent in data.items():
+    for country_name, _extent in _read_json("countries_extents.json").items():
         country_list.append({"value": country_name, "label": country_name})
     return country_list
 
 
 def load_country_extents():
-    filename = os.path.join(module_path, "../data/countries_extents.json")
     country_extent = {}
-    with open(filename, "r") as file:
-        data = json.load(file)
-    for country_name, extent in data.items():
+    for country_name, extent in _read_json("countries_extents.json").items():
+        extent = list(extent)
         if extent:
             extent[0] -= 0.1
             extent[1] -= 0.1
@@ -31,17 +38,83 @@ def load_country_extents():
     return country_extent
 
 
+@lru_cache(maxsize=None)
+def _transformer_4326_to_3857():
+    # imported here so that loading the Map driver does not load pyproj
+    from pyproj import Transformer
+
+    return Transformer.from_crs(4326, 3857, always_xy=True)
+
+
 def convert_4326_to_3857(lon, lat):
     """
     Convert WGS84 (EPSG:4326) to Web Mercator (EPSG:3857).
 
+    The transformer is built once per process. lon and lat may also be
+    arrays, to convert many points in one call.
+
     Parameters:
-        lat (float): Latitude in degrees.
-        lon (float): Longitude in degrees.
+        lat (float or array-like): Latitude in degrees.
+        lon (float or array-like): Longitude in degrees.
 
     Returns:
-        (x, y): Tuple of coordinates in meters.
+        (x, y): Tuple of coordinates in meters, arrays for array input.
     """
-    transformer = Transformer.from_crs(4326, 3857, always_xy=True)
-    x, y = transformer.transform(lon, lat)
+    x, y = _transformer_4326_to_3857().transform(lon, lat)
     return x, y
+
+
+@lru_cache(maxsize=None)
+def load_map_extents():
+    """Return the Web Mercator 'x,y,zoom' map extent of every country with an extent.
+
+    The centers of all countries are converted in one batch, on the first call.
+
+    Returns:
+        MappingProxyType: read-only country name -> extent string
+    """
+    import numpy as np
+
+    extents = {name: extent for name, extent in load_country_extents().items() if extent}
+    bounds = np.array(list(extents.values()), dtype=float).reshape(-1, 4)
+    xs, ys = convert_4326_to_3857((bounds[:, 0] + bounds[:, 2]) / 2, (bounds[:, 1] + bounds[:, 3]) / 2)
+    return MappingProxyType({
+        name: f"{x},{y},{COUNTRY_ZOOM}" for name, x, y in zip(extents, xs.tolist(), ys.tolist())
+    })
+
+
+def load_map_config():
+    """Return the parsed map configuration template (args_string of data/map_configs.json).
+
+    The file is read once per process and the result is shared, so treat it as read-only.
+    """
+    return _read_json("map_configs.json")["args_string"]
+
+
+def _copy_json(value):
+    """Copy the dicts and lists of parsed JSON, sharing the immutable leaves."""
+    if isinstance(value, dict):
+        return {key: _copy_json(item) for key, item in value.items()}
+    if isinstance(value, list):
+        return [_copy_json(item) for item in value]
+    return value
+
+
+def country_map_config(country, map_extent):
+    """Return the map configuration showing the GEOGLOWS streams of one country.
+
+    Only the streamflow layer and the extent differ from load_map_config(). The
+    result is a copy of the shared template, so callers may change it.
+
+    Args:
+        country (str): country name, or 'All Countries' for no filter
+        map_extent (str): 'x,y,zoom' map extent in Web Mercator
+    """
+    config = _copy_json(load_map_config())
+    layerdefs = "" if country == "All Countries" else f"0: rivercountry='{country}'"
+    for layer in config["layers"]:
+        props = layer["configuration"]["props"]
+        if props["name"] == STREAMFLOW_LAYER:
+            props["source"]["props"]["params"]["LAYERDEFS"] = layerdefs
+    config["map_extent"] = {"extent": map_extent}
+    return config
@@ -0,0 +1,85 @@
+"""In-process LRU tier in front of the geoglows plots cache directory.
+
+Frames are kept per worker process under a byte budget set with the
+``GEOGLOWS_PLOTS_MEMORY_CACHE_MB`` environment variable (0 disables the tier).
+Callers always receive their own copy, so code that adds columns or renames
+in place cannot corrupt what later requests are served.
+"""
+import os
+import threading
+from collections import OrderedDict
+
+MEMORY_CACHE_ENV = "GEOGLOWS_PLOTS_MEMORY_CACHE_MB"
+DEFAULT_MEMORY_CACHE_MB = 256
+
+
+def frame_nbytes(df):
+    """Return the in-memory size of df, including its index."""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class FrameCache:
+    """A thread-safe LRU mapping of keys to DataFrames, bounded by total bytes."""
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self):
+        return len(self._entries)
+
+    def __contains__(self, key):
+        return key in self._entries
+
+    def get(self, key):
+        """Return a copy of the frame stored under key, or None on a miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            self._entries.move_to_end(key)
+            df = entry[0]
+        return df.copy()
+
+    def put(self, key, df):
+        """Store a copy of df under key, evicting least recently used frames to fit."""
+        size = frame_nbytes(df)
+        if size > self.max_bytes:
+            return
+        df = df.copy()
+        with self._lock:
+            self._discard(key)
+            self._entries[key] = (df, size)
+            self.nbytes += size
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self.nbytes -= evicted_size
+                self.evictions += 1
+
+    def discard(self, key):
+        with self._lock:
+            self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is not None:
+            self.nbytes -= entry[1]
+
+
+def _max_bytes_from_env():
+    try:
+        megabytes = float(os.environ.get(MEMORY_CACHE_ENV, DEFAULT_MEMORY_CACHE_MB))
+    except ValueError:
+        megabytes = DEFAULT_MEMORY_CACHE_MB
+    return max(int(megabytes * 1024 * 1024), 0)
+
+
+frame_cache = FrameCache(_max_bytes_from_env())
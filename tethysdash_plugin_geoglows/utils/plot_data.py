@@ -1,12 +1,12 @@
-import os
-from datetime import datetime, timezone
 import pandas as pd
 import numpy as np
 import scipy.stats as stats
 import geoglows
-import getpass
-import pwd
 import math
+from .data_cache import read_cached, read_through_cache, read_through_cache_many
+from .derived_data import RETRO_AGGREGATE_RULES, aggregate_retro_daily
+from .freshness import FORECAST_DATASETS, latest_forecast_cycle
+from .tracing import span
 
 
 def gumbel1(rp: int, xbar: float, std: float) -> float:
@@ -25,214 +25,218 @@ def gumbel1(rp: int, xbar: float, std: float) -> float:
     )
 
 
-def get_plot_data(river_id, plot_name="forecast"):
-    """Get newest data for the selected plot.
+PLOT_DATA_TYPES = (
+    "forecast",
+    "forecast-stats",
+    "forecast-ensembles",
+    "retro-simulation",
+    "return-periods",
+    "retro-daily",
+    "retro-monthly",
+    "retro-yearly",
+)
 
-    Args:
-        river_id (int or str): river id
-        plot_type (str, optional): The plot type. Options are forecast,
-            historical, and return. Defaults to 'forecast'.  # TODO update doc
 
-    Returns:
-        df: the dataframe of the newest plot data
+def _fetch_plot_data(river_id, plot_name):
+    """Download the dataset behind plot_name from the geoglows data service, in a 'geoglows.data' span."""
+    with span("geoglows.data", dataset=plot_name):
+        return _download(river_id, plot_name)
+
+
+def _download(river_id, plot_name):
+    """Call the geoglows.data function for plot_name.
+
+    Forecasts request the newest published cycle, which spares geoglows from
+    searching the forecast bucket for it. The cycle is looked up at most once
+    per GEOGLOWS_PLOTS_FORECAST_RECHECK_MINUTES for the whole process, so an
+    uncached river is never fetched with a cycle learned days ago.
     """
-    from tethysapp.tethysdash.app import App
-
-    username = os.environ.get("NGINX_USER", getpass.getuser())
-    uid = pwd.getpwnam(username).pw_uid
-    gid = pwd.getpwnam(username).pw_gid
-
-    workspace_path = App.get_app_workspace()
-    PLOTS_CACHE_PATH = os.path.join(workspace_path.path, "geoglows_plots_cache")
-    if not os.path.exists(PLOTS_CACHE_PATH):
-        os.makedirs(PLOTS_CACHE_PATH)
-        os.chown(PLOTS_CACHE_PATH, uid, gid)
-
-    files = os.listdir(PLOTS_CACHE_PATH)
-    cache_file = None
-    for file in files:
-        if file.startswith(f"{plot_name}-{river_id}"):
-            cache_file = file
-
-    # Check if we can use the cached data, if not, delete it
-    current_date = datetime.now(timezone.utc).strftime("%Y%m%d")
-    need_new_data, cached_data_path = True, None
-    if cache_file:
-        cached_date = cache_file.split("-")[-1].split(".")[0]
-        need_new_data = current_date != cached_date
-        cached_data_path = os.path.join(PLOTS_CACHE_PATH, cache_file)
-    new_data_path = os.path.join(
-        PLOTS_CACHE_PATH, f"{plot_name}-{river_id}-{current_date}.csv"
-    )
+    forecast_kwargs = {}
+    if plot_name in FORECAST_DATASETS:
+        cycle = latest_forecast_cycle()
+        if cycle is not None:
+            forecast_kwargs["date"] = cycle
 
     match plot_name:
         case "forecast":
-            if need_new_data:
-                df = geoglows.data.forecast(river_id)
-            else:
-                df = pd.read_csv(cached_data_path, parse_dates=["time"], index_col=[0])
+            return geoglows.data.forecast(river_id, **forecast_kwargs)
         case "forecast-stats":
-            if need_new_data:
-                df = geoglows.data.forecast_stats(river_id)
-            else:
-                df = pd.read_csv(cached_data_path, parse_dates=["time"], index_col=[0])
+            return geoglows.data.forecast_stats(river_id, **forecast_kwargs)
         case "forecast-ensembles":
-            if need_new_data:
-                df = geoglows.data.forecast_ensembles(river_id)
-            else:
-                df = pd.read_csv(cached_data_path, parse_dates=["time"], index_col=[0])
+            return geoglows.data.forecast_ensembles(river_id, **forecast_kwargs)
         case "retro-simulation":
-            if need_new_data:
-                df = geoglows.data.retrospective(river_id)
-            else:
-                df = pd.read_csv(cached_data_path, parse_dates=["time"], index_col=[0])
-                df.columns.name = "rivid"
-                df.columns = df.columns.astype("int")
+            return geoglows.data.retrospective(river_id)
         case "return-periods":
-            if need_new_data:
-                # geoglows 2.x defaults distribution='logpearson3', which is absent
-                # from the current return-period dataset; request 'gumbel' to match
-                # the data and the bias-corrected path (see compute_return_periods).
-                df = geoglows.data.return_periods(river_id, distribution="gumbel")
-            else:
-                df = pd.read_csv(cached_data_path, index_col=[0])
-                df.columns = df.columns.astype("int")
+            # geoglows 2.x defaults distribution='logpearson3', which is absent
+            # from the current return-period dataset; request 'gumbel' to match
+            # the data and the bias-corrected path (see compute_return_periods).
+            return geoglows.data.return_periods(river_id, distribution="gumbel")
         case "retro-daily":
-            if need_new_data:
-                df = geoglows.data.retro_daily(river_id)
-            else:
-                df = pd.read_csv(cached_data_path, parse_dates=["time"], index_col=[0])
-                df.columns = df.columns.astype("int")
+            return geoglows.data.retro_daily(river_id)
         case "retro-monthly":
-            if need_new_data:
-                df = geoglows.data.retro_monthly(river_id)
-            else:
-                df = pd.read_csv(cached_data_path, parse_dates=["time"], index_col=[0])
-                df.columns = df.columns.astype("int")
+            return geoglows.data.retro_monthly(river_id)
         case "retro-yearly":
-            if need_new_data:
-                df = geoglows.data.retro_yearly(river_id)
-            else:
-                df = pd.read_csv(cached_data_path, parse_dates=["time"], index_col=[0])
-                df.columns = df.columns.astype("int")
+            return geoglows.data.retro_yearly(river_id)
         case _:
             raise ValueError("plot_name is unacceptable")
 
-    if need_new_data:
-        df.to_csv(new_data_path)
-        if cached_data_path:
-            os.remove(cached_data_path)
 
-    return df
+def get_plot_data(river_id, plot_name="forecast"):
+    """Get newest data for the selected plot.
+
+    Frames are served from the in-process memory tier when possible, then
+    from the cataloged cache directory, and downloaded only once the
+    dataset's freshness policy marks the cached copy stale (see
+    data_cache.read_through_cache and freshness.get_freshness_policy).
+    retro-monthly and retro-yearly are derived from retro-daily instead when
+    a fresh retro-daily frame is already cached.
+
+    Args:
+        river_id (int or str): river id
+        plot_name (str, optional): The dataset to load, one of PLOT_DATA_TYPES.
+            Defaults to 'forecast'.
+
+    Returns:
+        df: the dataframe of the newest plot data
+    """
+    if plot_name not in PLOT_DATA_TYPES:
+        raise ValueError("plot_name is unacceptable")
+
+    with span("get_plot_data", dataset=plot_name) as trace:
+        if plot_name in RETRO_AGGREGATE_RULES:
+            df_retro_daily = read_cached(river_id, "retro-daily")
+            if df_retro_daily is not None:
+                trace.set_attribute("derived_from", "retro-daily")
+                return aggregate_retro_daily(df_retro_daily, plot_name)
+
+        return read_through_cache(river_id, plot_name, lambda: _fetch_plot_data(river_id, plot_name))
+
+
+def _split_by_river(df, river_ids):
+    """Split a multi-river geoglows frame into one frame per river.
+
+    Retrospective products come back with a column per river, forecasts with
+    a (time, river_id) row index.
+    """
+    if isinstance(df.index, pd.MultiIndex):
+        return {river_id: df.xs(river_id, level="river_id") for river_id in river_ids}
+    return {river_id: df[[river_id]] for river_id in river_ids}
+
+
+def get_plot_data_batch(river_ids, plot_name="forecast"):
+    """Get newest data for the selected plot for several rivers at once.
+
+    Rivers with a fresh cached copy are served from the cache, and the rest
+    are downloaded with a single multi-river request and cached per river, so
+    later get_plot_data calls for any of them are cache hits. The download
+    holds the rivers' single-flight locks (see read_through_cache_many), so
+    concurrent batches and get_plot_data calls fetch each river once.
+    retro-monthly and retro-yearly are derived from the retro-daily batch.
+
+    Args:
+        river_ids (list): river ids
+        plot_name (str, optional): The dataset to load, one of PLOT_DATA_TYPES.
+            Defaults to 'forecast'.
+
+    Returns:
+        dict: river id -> dataframe of the newest plot data, in the order of river_ids
+    """
+    if plot_name not in PLOT_DATA_TYPES:
+        raise ValueError("plot_name is unacceptable")
+    river_ids = [int(river_id) for river_id in river_ids]
+
+    if plot_name in RETRO_AGGREGATE_RULES:
+        daily = get_plot_data_batch(river_ids, "retro-daily")
+        return {river_id: aggregate_retro_daily(df, plot_name) for river_id, df in daily.items()}
+
+    with span("get_plot_data_batch", dataset=plot_name, rivers=len(river_ids)) as trace:
+        frames = {river_id: read_cached(river_id, plot_name) for river_id in river_ids}
+        missing = [river_id for river_id, df in frames.items() if df is None]
+        trace.set_attribute("missing", len(missing))
+        if len(missing) == 1:
+            frames[missing[0]] = get_plot_data(missing[0], plot_name)
+        elif missing:
+            frames.update(read_through_cache_many(
+                missing, plot_name, lambda river_ids: _split_by_river(_fetch_plot_data(river_ids, plot_name), river_ids)
+            ))
+        return frames
+
+
+# Coefficients of the rational approximation of the inverse normal CDF used for SSI.
+SSI_C0, SSI_C1, SSI_C2 = 2.515517, 0.802853, 0.010328
+SSI_D1, SSI_D2, SSI_D3 = 1.432788, 0.001308, 0.001308
+
+
+def _ssi_of_monthly_means(monthly):
+    by_month = monthly.groupby(monthly.index.month)
+    exceedance = 1 - stats.norm.cdf(monthly, by_month.transform("mean"), by_month.transform("std"))
+    p = np.where(exceedance > 0.5, 1 - exceedance, exceedance)
+    w = (-2 * np.log(p)) ** 0.5
+    ssi = w - (SSI_C0 + SSI_C1 * w + SSI_C2 * w ** 2) / (1 + SSI_D1 * w + SSI_D2 * w ** 2 + SSI_D3 * w ** 3)
+    ssi = np.where(exceedance < 0.5, ssi, -ssi)
+    return pd.DataFrame(ssi, index=monthly.index, columns=monthly.columns)
+
+
+def compute_ssi(df):
+    """Compute the Standardized Streamflow Index of every column of a daily frame.
+
+    The series are resampled to monthly means once, and each value is
+    standardized against the mean and standard deviation of its calendar month
+    across all years. The whole frame is evaluated with array operations, so
+    raw and bias corrected series can be passed together as two columns.
+
+    Args:
+        df (pd.DataFrame): daily streamflow with a datetime index, one column per series
+
+    Returns:
+        df: monthly SSI values labelled by month end, with the columns of df
+    """
+    return _ssi_of_monthly_means(df.resample("ME").mean())
 
 
 def get_SSI_data(df_retro):
-    df_result = pd.DataFrame()
-    for month in range(1, 13):
-        monthly_average = df_retro.resample("M").mean()
-        filtered_df = monthly_average[monthly_average.index.month == month].copy()
-        df_mean = filtered_df.iloc[:, 0].mean()
-        df_std_dev = filtered_df.iloc[:, 0].std()
-        filtered_df["cumulative_probability"] = filtered_df.iloc[:, 0].apply(
-            lambda x, df_mean=df_mean, df_std_dev=df_std_dev: 1
-            - stats.norm.cdf(x, df_mean, df_std_dev)
-        )
-        filtered_df["probability_less_than_0.5"] = (
-            filtered_df["cumulative_probability"] < 0.5
-        )
-        filtered_df["p"] = filtered_df["cumulative_probability"]
-        filtered_df.loc[filtered_df["cumulative_probability"] > 0.5, "p"] = (
-            1 - filtered_df["cumulative_probability"]
-        )
-        filtered_df["W"] = (-2 * np.log(filtered_df["p"])) ** 0.5
-        C0 = 2.515517
-        C1 = 0.802853
-        C2 = 0.010328
-        d1 = 1.432788
-        d2 = 0.001308
-        d3 = 0.001308
-        filtered_df["SSI"] = filtered_df["W"] - (
-            C0 + C1 * filtered_df["W"] + C2 * filtered_df["W"] ** 2
-        ) / (
-            1
-            + d1 * filtered_df["W"]
-            + d2 * filtered_df["W"] ** 2
-            + d3 * filtered_df["W"] ** 3
-        )
-        filtered_df.loc[~filtered_df["probability_less_than_0.5"], "SSI"] *= -1
-        df_result = pd.concat([df_result, filtered_df])
+    """Return the monthly means of the first column of df_retro with their SSI.
+
+    Kept for callers of the single-series API; see compute_ssi.
+    """
+    df_result = df_retro.iloc[:, [0]].resample("ME").mean()
+    df_result["SSI"] = _ssi_of_monthly_means(df_result).iloc[:, 0]
     return df_result
 
 
 def get_bias_corrected_plot_data(river_id, plot_name="forecast"):
-    """Get newest data for the selected plot.
+    """Get the newest Global bias corrected data for the selected plot.
+
+    The source series come from get_plot_data, and their corrections are
+    stored in the same cache (see utils.corrections), so each one is computed
+    once per river and data version. The retro-daily based products share a
+    single corrected retro-daily series.
 
     Args:
         river_id (int or str): river id
-        plot_type (str, optional): The plot type. Options are forecast,
-            historical, and return. Defaults to 'forecast'.  # TODO update doc
+        plot_name (str, optional): one of PLOT_DATA_TYPES. Defaults to 'forecast'.
 
     Returns:
-        df: the dataframe of the newest plot data
+        df: the bias corrected dataframe
     """
+    from .corrections import (
+        CORRECTED_COLUMN, corrected_forecast, corrected_retro_daily, corrected_return_periods, transformed_frame
+    )
+
+    if plot_name not in PLOT_DATA_TYPES:
+        raise ValueError("plot_name is unacceptable")
+    river_id = int(river_id)
 
     match plot_name:
-        case "forecast":
-            sim = geoglows.data.forecast(river_id)
-            df = geoglows.bias.discharge_transform(sim, river_id)
-        case "forecast-stats":
-            sim = geoglows.data.forecast_stats(river_id)
-            df = geoglows.bias.discharge_transform(sim, river_id)
-        case "forecast-ensembles":
-            sim = geoglows.data.forecast_ensembles(river_id)
-            df = geoglows.bias.discharge_transform(sim, river_id)
+        case "forecast" | "forecast-stats" | "forecast-ensembles":
+            return corrected_forecast(river_id, "Global", plot_name, get_plot_data(river_id, plot_name))
         case "retro-simulation":
-            sim = geoglows.data.retrospective(river_id)
-            df = geoglows.bias.discharge_transform(sim, river_id)
-        case "return-periods":
-            sim_data = geoglows.data.retro_daily(river_id)
-            df = geoglows.bias.discharge_transform(sim_data=sim_data, river_id=river_id)
-            rps = [2, 5, 10, 25, 50, 100]
-            results = []
-            df = df.rename(columns={str(river_id): "return_periods"})
-            for column in ["return_periods"]:
-                annual_max_flow_list = (
-                    df.groupby(df.index.strftime("%Y"))[column].max().values.flatten()
-                )
-                xbar = np.mean(annual_max_flow_list)
-                std = np.std(annual_max_flow_list)
-
-                # Compute return periods
-                ret_pers = {
-                    "Data Type": column,
-                    "max_simulated": round(np.max(annual_max_flow_list), 2),
-                }
-                ret_pers.update(
-                    {f"{rp}": round(gumbel1(rp, xbar, std), 2) for rp in rps}
-                )
-
-                results.append(ret_pers)
-            df = (pd.DataFrame(results).set_index("Data Type")).transpose()
-            df.columns = df.columns.astype(str)
-            df = df.astype(float).round(2)
-        case "retro-daily":
-            sim = geoglows.data.retro_daily(river_id)
-            df = geoglows.bias.discharge_transform(sim, river_id)
-        case "retro-monthly":
-            sim_data = geoglows.data.retro_daily(river_id, skip_log=True)
-            df = (
-                geoglows.bias.discharge_transform(sim_data, river_id)
-                .resample("MS")
-                .mean()
-            )
-        case "retro-yearly":
-            sim_data = geoglows.data.retro_daily(river_id, skip_log=True)
-            df = (
-                geoglows.bias.discharge_transform(sim_data, river_id)
-                .resample("YS")
-                .mean()
-            )
-        case _:
-            raise ValueError("plot_name is unacceptable")
-
-    return df
+            return transformed_frame(river_id, plot_name, get_plot_data(river_id, plot_name))
+
+    df_corrected = corrected_retro_daily(river_id, "Global", get_plot_data(river_id, "retro-daily"))
+    if plot_name == "return-periods":
+        return corrected_return_periods(river_id, "Global", df_corrected)
+    df = df_corrected.rename(columns={CORRECTED_COLUMN: river_id})
+    if plot_name == "retro-daily":
+        return df
+    return aggregate_retro_daily(df, plot_name)
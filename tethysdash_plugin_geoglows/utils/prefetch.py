@@ -0,0 +1,108 @@
+"""Concurrent loading of independent upstream datasets.
+
+When a plot needs several datasets, their loaders run on a small thread pool,
+so a cold cache costs roughly the slowest single fetch instead of the sum of
+all of them. The pool is created on first use and shared by every request of
+the process, so its threads (and their catalog connections) are reused, and a
+loader stuck past its timeout holds one of a fixed number of threads. The pool
+size is set with ``GEOGLOWS_PLOTS_PREFETCH_WORKERS`` (1 loads sequentially).
+``GEOGLOWS_PLOTS_FETCH_TIMEOUT`` caps the seconds each load may take.
+"""
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, TimeoutError
+
+from .tracing import propagate
+
+PREFETCH_WORKERS_ENV = "GEOGLOWS_PLOTS_PREFETCH_WORKERS"
+FETCH_TIMEOUT_ENV = "GEOGLOWS_PLOTS_FETCH_TIMEOUT"
+DEFAULT_PREFETCH_WORKERS = 4
+DEFAULT_FETCH_TIMEOUT = 300
+
+
+class PrefetchTimeoutError(TimeoutError):
+    """Raised when a dataset did not load within the fetch timeout."""
+
+    def __init__(self, name, timeout):
+        super().__init__(f"Loading {name} took longer than {timeout:g} seconds")
+        self.name = name
+        self.timeout = timeout
+
+
+def _env_number(name, default, cast):
+    try:
+        return cast(os.environ.get(name, default))
+    except ValueError:
+        return default
+
+
+def prefetch_workers():
+    return max(_env_number(PREFETCH_WORKERS_ENV, DEFAULT_PREFETCH_WORKERS, int), 1)
+
+
+def fetch_timeout():
+    timeout = _env_number(FETCH_TIMEOUT_ENV, DEFAULT_FETCH_TIMEOUT, float)
+    return timeout if timeout > 0 else None
+
+
+_executors = {}
+_executors_lock = threading.Lock()
+# a forked worker inherits the pools but not their threads
+os.register_at_fork(after_in_child=_executors.clear)
+
+
+def _executor(max_workers):
+    """Return the process's shared pool of max_workers threads, creating it on first use."""
+    with _executors_lock:
+        executor = _executors.get(max_workers)
+        if executor is None:
+            executor = _executors[max_workers] = ThreadPoolExecutor(
+                max_workers=max_workers, thread_name_prefix="geoglows-prefetch"
+            )
+        return executor
+
+
+def prefetch(loaders, max_workers=None, timeout=None):
+    """Run independent loaders concurrently and collect their results.
+
+    A single loader, or max_workers=1, runs inline in the calling thread,
+    where no timeout is applied.
+
+    Args:
+        loaders (dict): maps a name to a zero-argument callable
+        max_workers (int, optional): size of the shared pool to run on, defaults
+            to prefetch_workers()
+        timeout (float, optional): seconds each loader may take, measured from
+            when they are all submitted, including any wait for a free thread.
+            Defaults to fetch_timeout().
+
+    Returns:
+        dict: name -> loader result, in the order of loaders
+
+    Raises:
+        PrefetchTimeoutError: if a loader did not finish in time. Loaders that
+            have not started are cancelled; running ones are left to finish in
+            the background.
+        Exception: the first error raised by any loader.
+    """
+    max_workers = max_workers or prefetch_workers()
+    timeout = fetch_timeout() if timeout is None else timeout
+    if len(loaders) <= 1 or max_workers == 1:
+        return {name: loader() for name, loader in loaders.items()}
+
+    executor = _executor(max_workers)
+    futures = {name: executor.submit(propagate(loader)) for name, loader in loaders.items()}
+    try:
+        deadline = time.monotonic() + timeout if timeout else None
+        results = {}
+        for name, future in futures.items():
+            remaining = None if deadline is None else max(deadline - time.monotonic(), 0)
+            try:
+                results[name] = future.result(timeout=remaining)
+            except TimeoutError:
+                raise PrefetchTimeoutError(name, timeout)
+        return results
+    finally:
+        for future in futures.values():
+            future.cancel()
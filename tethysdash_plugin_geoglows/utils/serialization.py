@@ -0,0 +1,120 @@
+"""JSON-ready dicts of plotly figures without a JSON round trip.
+
+``json.loads(fig.to_json())`` deep-copies the figure, encodes it to a string
+and parses the string back, only for TethysDash to encode the result again.
+figure_to_dict walks the figure's properties once and builds the same
+JSON-compatible dict directly. Numeric arrays become plotly.js typed arrays
+(base64 ``bdata``) as in ``fig.to_json()``, or plain lists when
+typed_arrays=False.
+
+The walk relies on plotly's typed array helpers, added in plotly 6. With an
+older plotly, whose fig.to_json() writes plain lists anyway, figure_to_dict
+falls back to the JSON round trip.
+"""
+import datetime
+import decimal
+import json
+import math
+
+import numpy as np
+import pandas as pd
+
+try:
+    from _plotly_utils.utils import is_skipped_key, to_typed_array_spec
+except ImportError:  # plotly < 6
+    is_skipped_key = to_typed_array_spec = None
+
+# numpy dtype kinds plotly.js can read as typed arrays
+TYPED_ARRAY_KINDS = "biuf"
+
+
+def _isoformat(values):
+    """ISO strings of datetimes, formatted as one array when they share a UTC offset."""
+    try:
+        times = pd.DatetimeIndex(values)
+    except (TypeError, ValueError):
+        times = None
+    if times is not None and not times.hasnans and not (times.asi8 % 10 ** 9).any():
+        wall = times.tz_localize(None) if times.tz is not None else times
+        offsets = wall.asi8 - times.asi8
+        if (offsets == offsets[0]).all():
+            # whole seconds, so isoformat() ends with the seconds and then the offset
+            suffix = values[0].isoformat()[19:]
+            return [text + suffix for text in np.datetime_as_string(wall.to_numpy(), unit="s").tolist()]
+    return [None if value is pd.NaT else value.isoformat() for value in values]
+
+
+def _float(value):
+    return value if math.isfinite(value) else None
+
+
+def _array(values, typed_arrays):
+    if values.dtype.kind in TYPED_ARRAY_KINDS and typed_arrays and values.size and values.ndim:
+        spec = to_typed_array_spec(values)
+        if isinstance(spec, dict):
+            return spec
+    if values.dtype.kind == "M":
+        # whole-second ISO strings as plotly's default (orjson) engine writes them
+        return [None if value is None else value.isoformat() for value in values.astype("datetime64[us]").tolist()]
+    if values.dtype.kind == "f":
+        return [_float(value) for value in values.tolist()]
+    if values.dtype.kind in "biu":
+        return values.tolist()
+    values = values.tolist()
+    if values and all(isinstance(value, datetime.datetime) for value in values):
+        # timestamps of a tz-aware index, the usual time axis
+        return _isoformat(values)
+    return [_value(value, typed_arrays=False) for value in values]
+
+
+def _value(value, typed_arrays):
+    if value is None or isinstance(value, (str, bool, int)):
+        return value
+    if isinstance(value, float):
+        return _float(value)
+    if isinstance(value, dict):
+        # plotly leaves arrays under keys such as 'range' and 'geojson' as lists
+        return {k: _value(v, typed_arrays and not is_skipped_key(k)) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_value(item, typed_arrays) for item in value]
+    if isinstance(value, np.ndarray):
+        return _array(value, typed_arrays)
+    if isinstance(value, (pd.Series, pd.Index)):
+        return _array(value.to_numpy(), typed_arrays)
+    if isinstance(value, np.generic):
+        return _value(value.item(), typed_arrays)
+    if value is pd.NaT or value is pd.NA:
+        return None
+    if isinstance(value, (datetime.date, datetime.time)):
+        return value.isoformat()
+    if isinstance(value, decimal.Decimal):
+        return _float(float(value))
+    if hasattr(value, "to_plotly_json"):
+        return _value(value.to_plotly_json(), typed_arrays)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def figure_to_dict(fig, typed_arrays=True):
+    """Return the JSON-compatible dict of a plotly figure.
+
+    Equal to ``json.loads(fig.to_json())`` without encoding and parsing a JSON
+    string, and without deep-copying the figure first.
+
+    Args:
+        fig (go.Figure): the figure to serialize
+        typed_arrays (bool): encode numeric arrays as plotly.js typed arrays
+            ({'dtype', 'bdata'}) like fig.to_json(); False writes plain lists
+
+    Returns:
+        dict: 'data' and 'layout' (and 'frames' when the figure has any)
+    """
+    if to_typed_array_spec is None:
+        return json.loads(fig.to_json())
+    result = {
+        "data": [_value(trace, typed_arrays) for trace in fig._data],
+        "layout": _value(fig._layout, typed_arrays),
+    }
+    frames = [frame._props for frame in fig._frame_objs]
+    if frames:
+        result["frames"] = _value(frames, typed_arrays)
+    return result
@@ -1,22 +1,30 @@
 from datetime import datetime
+import numpy as np
 import pandas as pd
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from .plot_data import get_SSI_data
+from .decimation import decimate
+from .flow_statistics import flow_duration_curves, monthly_status_thresholds, yearly_monthly_means
+from .plot_data import compute_ssi
+from .tracing import traced
 
 
-def plot_retro_simulation(df_retro_daily, df_retro_monthly, river_id):
+@traced()
+def plot_retro_simulation(df_retro_daily, df_retro_monthly, river_id, max_points=None):
+    """max_points, when given, thins each trace with decimation.decimate, keeping its peaks."""
+    daily = decimate(df_retro_daily[river_id], max_points)
+    monthly = decimate(df_retro_monthly[river_id], max_points)
     fig = go.Figure()
     fig.add_trace(go.Scatter(
-        x=df_retro_daily.index,
-        y=df_retro_daily[river_id],
+        x=daily.index,
+        y=daily,
         mode='lines',
         name='Daily Average'
     ))
 
     fig.add_trace(go.Scatter(
-        x=df_retro_monthly.index,
-        y=df_retro_monthly[river_id],
+        x=monthly.index,
+        y=monthly,
         mode='lines',
         name='Monthly Average',
         line=dict(color='rgb(0, 166, 255)'),
@@ -51,6 +59,28 @@ def plot_retro_simulation(df_retro_daily, df_retro_monthly, river_id):
     return fig
 
 
+def _five_year_blocks_trace(df_5yr, name):
+    """One trace drawing every 5-year average as a flat segment, segments separated by gaps.
+
+    Each point's hover label names its block, e.g. '1940-1944'.
+    """
+    starts = df_5yr['5year_start'].to_numpy()
+    volumes = df_5yr['volume'].to_numpy()
+    gaps = [None] * len(starts)
+    labels = [f'{start:.0f}-{start + 4:.0f}' for start in starts]
+    return go.Scatter(
+        x=[value for block in zip(starts, starts + 5, gaps) for value in block],
+        y=[value for block in zip(volumes, volumes, gaps) for value in block],
+        text=[value for block in zip(labels, labels, gaps) for value in block],
+        hovertemplate='%{y} (%{text})',
+        mode='lines',
+        legendgroup='5 Year Average',
+        name=name,
+        marker=dict(color='red')
+    )
+
+
+@traced()
 def plot_yearly_volumes(df_retro_yearly, river_id, df_retro_yearly_corrected=None):
     """
     Plots yearly cumulative discharge volumes for a river.
@@ -99,18 +129,7 @@ def plot_yearly_volumes(df_retro_yearly, river_id, df_retro_yearly_corrected=Non
     ))
 
     # 5-year averages - original
-    for idx, row in df_5yr.iterrows():
-        year = row['5year_start']
-        val = row['volume']
-        fig.add_trace(go.Scatter(
-            x=[year, year + 5],
-            y=[val, val],
-            mode='lines',
-            legendgroup='5 Year Average',
-            showlegend=idx == 0,
-            name='5 Year Average Simulation',
-            marker=dict(color='red')
-        ))
+    fig.add_trace(_five_year_blocks_trace(df_5yr, '5 Year Average Simulation'))
 
     # Annual volumes - corrected
     if df_yearly_corr is not None:
@@ -123,18 +142,7 @@ def plot_yearly_volumes(df_retro_yearly, river_id, df_retro_yearly_corrected=Non
         ))
 
         # 5-year averages - corrected
-        for idx, row in df_5yr_corr.iterrows():
-            year = row['5year_start']
-            val = row['volume']
-            fig.add_trace(go.Scatter(
-                x=[year, year + 5],
-                y=[val, val],
-                mode='lines',
-                legendgroup='5 Year Average',
-                showlegend=idx == 0,
-                name='5 Year Average Corrected',
-                marker=dict(color='red')
-            ))
+        fig.add_trace(_five_year_blocks_trace(df_5yr_corr, '5 Year Average Corrected'))
 
     fig.update_layout(
         title=f'Yearly Cumulative Discharge Volume for River: {river_id}',
@@ -150,6 +158,7 @@ def plot_yearly_volumes(df_retro_yearly, river_id, df_retro_yearly_corrected=Non
     return fig
 
 
+@traced()
 def plot_retro_annual_status(df_retro_daily, df_retro_monthly, river_id, bias_corrected=False):
     """
     Corrected: Very Wet = highest flows, Very Dry = lowest flows.
@@ -166,22 +175,13 @@ def plot_retro_annual_status(df_retro_daily, df_retro_monthly, river_id, bias_co
         "rgb(205, 35, 63)"     # Very Dry
     ]
 
-    months = [f"{i:02d}" for i in range(1, 13)]
     month_names = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
 
-    # --- Compute monthly status values (descending sort) ---
-    df_daily = df_retro_daily.copy()
-    df_daily["month"] = df_daily.index.strftime("%m")
-
-    monthly_status_values = {label: [] for label in status_labels}
-
-    for month in months:
-        tmp = df_daily[df_daily["month"] == month].sort_values(by=river_id, ascending=False)
-        values = tmp[river_id].to_list()
-        n = len(values)
-        for idx, perc in enumerate(status_percentiles):
-            index = int(n * perc / 100)
-            monthly_status_values[status_labels[idx]].append(values[index])
+    # --- Compute monthly status values, all months and percentiles at once ---
+    thresholds = monthly_status_thresholds(df_retro_daily[river_id], status_percentiles)
+    monthly_status_values = {
+        label: thresholds[perc].tolist() for label, perc in zip(status_labels, status_percentiles)
+    }
 
     # --- Build stacked polygons (from bottom to top) ---
     traces = []
@@ -206,10 +206,8 @@ def plot_retro_annual_status(df_retro_daily, df_retro_monthly, river_id, bias_co
         prev_values = curr_values
 
     # --- Long-term monthly average line ---
-    df_monthly = df_retro_monthly.copy()
-    df_monthly["year"] = df_monthly.index.year
-    df_monthly["month"] = df_monthly.index.month
-    monthly_avg = df_monthly.groupby("month")[river_id].mean().reindex(range(1, 13)).values
+    yearly = yearly_monthly_means(df_retro_monthly[river_id])
+    monthly_avg = yearly.mean().values
 
     traces.append(
         go.Scatter(
@@ -222,14 +220,12 @@ def plot_retro_annual_status(df_retro_daily, df_retro_monthly, river_id, bias_co
         )
     )
 
-    # --- Each year's monthly averages ---
-    years = sorted(df_monthly["year"].unique())
-    for idx, year in enumerate(reversed(years)):
-        yearly = df_monthly[df_monthly["year"] == year].set_index("month").reindex(range(1, 13))[river_id].values
+    # --- Each year's monthly averages, newest first ---
+    for idx, (year, values) in enumerate(zip(yearly.index[::-1], yearly.to_numpy()[::-1])):
         traces.append(
             go.Scatter(
                 x=month_names,
-                y=yearly,
+                y=values,
                 name=f"Year {year}",
                 mode="lines",
                 line=dict(width=2, color="black"),
@@ -258,6 +254,7 @@ def plot_retro_annual_status(df_retro_daily, df_retro_monthly, river_id, bias_co
     return fig
 
 
+@traced()
 def plot_retro_fdc(df_simulated, river_id, df_corrected=None):
     """
     Returns a plotly figure object showing Flow Duration Curves (FDCs).
@@ -274,69 +271,52 @@ def plot_retro_fdc(df_simulated, river_id, df_corrected=None):
         go.Figure: plotly figure object with FDCs
     """
     percentiles = [i * 2 for i in range(51)]
-    percentiles_reversed = percentiles[::-1]
-    visible = 'legendonly' if (df_corrected is not None and not df_corrected.empty) else True
+    corrected = df_corrected is not None and not df_corrected.empty
+    visible = 'legendonly' if corrected else True
 
-    def sorted_array_to_percentiles(array):
-        return [array[len(array) * p // 100 - (1 if p == 100 else 0)] for p in percentiles_reversed]
-
-    months = [f'{i}'.rjust(2, '0') for i in range(1, 13)]
     month_names = ["Jan", "Feb", "Mar", "Apr", "May", "Jun", "Jul", "Aug", "Sep", "Oct", "Nov", "Dec"]
 
-    def compute_fdc(df):
-        df = df.copy()
-        df['month'] = df.index.strftime('%m')
-        fdc = sorted_array_to_percentiles(df.sort_values(by=river_id)[river_id].to_list())
-        monthly_fdc = {}
-        for month in months:
-            tmp = df[df['month'] == month].sort_values(by=river_id, ascending=True)
-            values = tmp[river_id].to_list()
-            monthly_fdc[month] = sorted_array_to_percentiles(values)
-        return fdc, monthly_fdc
-
-    # Compute FDCs for simulated data
-    fdc_sim, monthly_fdc_sim = compute_fdc(df_simulated)
-
-    # Compute FDCs for corrected data if provided
-    if df_corrected is not None and not df_corrected.empty:
-        fdc_corr, monthly_fdc_corr = compute_fdc(df_corrected)
+    # Compute the simulated and corrected FDCs together
+    series = {"simulated": df_simulated[river_id]}
+    if corrected:
+        series["corrected"] = df_corrected[river_id]
+    curves = flow_duration_curves(series, percentiles)  # row 0: whole record, rows 1-12: months
 
     fig = go.Figure()
 
     # Overall FDCs
     fig.add_trace(go.Scatter(
         x=percentiles,
-        y=fdc_sim,
+        y=curves["simulated"].loc[0].tolist(),
         mode='lines',
         name='Simulated - FDC',
         line=dict(color='blue'),
         visible=visible
     ))
 
-    if df_corrected is not None and not df_corrected.empty:
+    if corrected:
         fig.add_trace(go.Scatter(
             x=percentiles,
-            y=fdc_corr,
+            y=curves["corrected"].loc[0].tolist(),
             mode='lines',
             name='Bias-Corrected - FDC',
             line=dict(color='red')
         ))
 
     # Monthly FDCs
-    for i, month in enumerate(months):
-        month_name = month_names[i]
+    for month, month_name in enumerate(month_names, start=1):
         fig.add_trace(go.Scatter(
             x=percentiles,
-            y=monthly_fdc_sim[month],
+            y=curves["simulated"].loc[month].tolist(),
             mode='lines',
             name=f'Simulated - {month_name}',
             line=dict(color='blue', dash='dot'),
             visible=visible
         ))
-        if df_corrected is not None and not df_corrected.empty:
+        if corrected:
             fig.add_trace(go.Scatter(
                 x=percentiles,
-                y=monthly_fdc_corr[month],
+                y=curves["corrected"].loc[month].tolist(),
                 mode='lines',
                 name=f'Bias-Corrected - {month_name}',
                 line=dict(color='red', dash='dot')
@@ -353,6 +333,82 @@ def plot_retro_fdc(df_simulated, river_id, df_corrected=None):
     return fig
 
 
+# Table cell color of each return period; the alpha grows with the exceedance probability.
+RETURN_PERIOD_RGB = {
+    2: '254, 240, 1',
+    5: '253, 154, 1',
+    10: '255, 56, 5',
+    20: '128, 0, 246',
+    25: '255, 0, 0',
+    50: '128, 0, 106',
+    100: '128, 0, 246',
+}
+
+
+def exceedance_probabilities(ensembles, rperiods):
+    """Percent of ensemble members above each return-period flow on each forecast day.
+
+    All ensembles, e.g. the raw and the bias corrected forecast, are compared
+    against all of their return periods in one broadcast comparison. Each
+    member's daily maximum is used, over the hours where every member has data.
+
+    Args:
+        ensembles (dict): name -> forecast ensemble frame (ensemble_52 is ignored);
+            the ensembles must have the same number of members
+        rperiods (dict): name -> return periods frame indexed by return period
+
+    Returns:
+        dict: name -> frame of percentages rounded to 0.1, indexed by 'YYYY-MM-DD'
+            day, one column per return period of that name
+    """
+    thresholds = pd.DataFrame({name: rperiods[name].iloc[:, 0] for name in ensembles}).T
+    days, daily_max = [], []
+    for name, ensem_df in ensembles.items():
+        members = ensem_df.drop(columns=['ensemble_52'], errors='ignore')
+        values = members.to_numpy(dtype=float)
+        complete = ~np.isnan(values).any(axis=1)
+        day = members.index[complete].floor('D')
+        order = np.argsort(day.asi8, kind='stable')
+        day, values = day[order], values[complete][order]
+        starts = np.flatnonzero(np.r_[True, day.asi8[1:] != day.asi8[:-1]]) if len(day) else np.array([], dtype=int)
+        days.append(day[starts])
+        daily_max.append(np.maximum.reduceat(values, starts, axis=0) if len(starts) else values)
+
+    row_thresholds = np.repeat(thresholds.to_numpy(), [len(day) for day in days], axis=0)
+    exceeds = np.concatenate(daily_max)[:, :, None] > row_thresholds[:, None, :]
+    percent = np.round(exceeds.mean(axis=1) * 100, 1)
+
+    tables = {}
+    offsets = np.cumsum([0] + [len(day) for day in days])
+    for i, (name, day) in enumerate(zip(ensembles, days)):
+        has_period = thresholds.loc[name].notna().to_numpy()
+        tables[name] = pd.DataFrame(
+            percent[offsets[i]:offsets[i + 1], has_period],
+            index=pd.Index(day.strftime('%Y-%m-%d'), name='Date'),
+            columns=thresholds.columns[has_period],
+        )
+    return tables
+
+
+def _probability_table(percent):
+    """A plotly Table of exceedance percentages, each cell shaded by its probability."""
+    alphas = np.round(percent.to_numpy() * 0.005, 2)
+    levels, inverse = np.unique(alphas.ravel(), return_inverse=True)
+    alpha_text = np.array([str(level) for level in levels.tolist()], dtype=object)[inverse.reshape(alphas.shape)]
+    prefixes = np.array([f'rgba({RETURN_PERIOD_RGB[rp]}, ' for rp in percent.columns], dtype=object)
+    cell_colors = prefixes + alpha_text + ')'
+
+    return go.Table(
+        header=dict(values=['Date'] + [f'{rp} Year' for rp in percent.columns], fill_color='rgba(0, 0, 0, 0)'),
+        cells=dict(
+            values=[percent.index.to_numpy()] + [percent[rp].to_numpy() for rp in percent.columns],
+            fill_color=[['rgba(0, 0, 0, 0)'] * len(percent)] + cell_colors.T.tolist(),
+        ),
+        domain=dict(x=[0, 1], y=[0, 1])
+    )
+
+
+@traced()
 def plot_flood_probabilities(
     ensem: pd.DataFrame,
     rperiods: pd.DataFrame,
@@ -373,67 +429,16 @@ def plot_flood_probabilities(
     Returns:
         go.Figure: Plotly figure containing one or two tables.
     """
-    def compute_probability_table(ensem_df, rperiods_df):
-        """Inner function to compute exceedance probability table."""
-        ens = ensem_df.drop(columns=['ensemble_52'], errors='ignore').dropna()
-        ens = ens.groupby(ens.index.date).max()
-        ens.index = pd.to_datetime(ens.index).strftime('%Y-%m-%d')
-
-        rperiods_df = rperiods_df.T
-        percent_series = {
-            rp: (ens > rperiods_df[rp].values[0]).mean(axis=1).values.tolist()
-            for rp in rperiods_df
-        }
-        percent_series = pd.DataFrame(percent_series, index=ens.index)
-        percent_series.index.name = 'Date'
-        percent_series.columns = [f'{c} Year' for c in percent_series.columns]
-        percent_series = percent_series * 100
-        percent_series = percent_series.round(1).reset_index()
-        return percent_series
-
-    colors = {
-        'Date': 'rgba(0, 0, 0, 0)',
-        '2 Year': 'rgba(254, 240, 1, {0})',
-        '5 Year': 'rgba(253, 154, 1, {0})',
-        '10 Year': 'rgba(255, 56, 5, {0})',
-        '20 Year': 'rgba(128, 0, 246, {0})',
-        '25 Year': 'rgba(255, 0, 0, {0})',
-        '50 Year': 'rgba(128, 0, 106, {0})',
-        '100 Year': 'rgba(128, 0, 246, {0})',
-    }
-
-    def make_table(percent_series, title):
-        """Create a Plotly Table figure for one dataset."""
-        df = percent_series.copy()
-
-        fill_color = []
-        for col in df.columns:
-            col_colors = []
-            for val in df[col]:
-                color = colors[col] if col == 'Date' else colors[col].format(round(val * 0.005, 2))
-                col_colors.append(color)
-            fill_color.append(col_colors)
-
-        return go.Table(
-            header=dict(values=list(df.columns), fill_color='rgba(0, 0, 0, 0)'),
-            cells=dict(values=[df[col] for col in df.columns], fill_color=fill_color),
-            domain=dict(x=[0, 1], y=[0, 1])
-        )
-
-    # --- Main execution ---
-    tables = []
-
-    # Original
-    df_main = compute_probability_table(ensem, rperiods)
-    tables.append(("Forecast Exceedance Probabilities", make_table(df_main, "Forecast Exceedance Probabilities")))
-
-    # Optional corrected
+    titles = {"Forecast Exceedance Probabilities": (ensem, rperiods)}
     if ensem_corrected is not None and rperiods_corrected is not None:
-        df_corrected = compute_probability_table(ensem_corrected, rperiods_corrected)
-        tables.append(
-            ("Bias-Corrected Exceedance Probabilities",
-             make_table(df_corrected, "Bias-Corrected Exceedance Probabilities"))
-            )
+        titles["Bias-Corrected Exceedance Probabilities"] = (ensem_corrected, rperiods_corrected)
+
+    # both tables come from one pass over the ensembles
+    percents = exceedance_probabilities(
+        {title: frames[0] for title, frames in titles.items()},
+        {title: frames[1] for title, frames in titles.items()},
+    )
+    tables = [(title, _probability_table(percent)) for title, percent in percents.items()]
 
     # --- Combine into one figure ---
     if len(tables) == 1:
@@ -456,6 +461,24 @@ def plot_flood_probabilities(
     return fig
 
 
+# Marker symbol and color of the original and bias corrected SSI traces.
+SSI_SERIES_STYLES = {"Original": ('circle', 'blue'), "Bias-Corrected": ('square', 'red')}
+
+
+def _ssi_by_series(df_retro, df_corrected=None):
+    """SSI of the first column of df_retro ('Original') and of df_corrected ('Bias-Corrected')."""
+    series = {"Original": df_retro.iloc[:, 0]}
+    if df_corrected is not None:
+        series["Bias-Corrected"] = df_corrected.iloc[:, 0]
+    return compute_ssi(pd.DataFrame(series))
+
+
+def _valid_span(series):
+    """Trim the months outside a series' own record, left when series of different spans are aligned."""
+    return series.loc[series.first_valid_index():series.last_valid_index()]
+
+
+@traced()
 def plot_ssi_each_month_since_year(since_year=None, df_retro=None, df_corrected=None):
     """
     Plots SSI monthly values over time since a given year.
@@ -479,33 +502,21 @@ def plot_ssi_each_month_since_year(since_year=None, df_retro=None, df_corrected=
     current_year = datetime.now().year
     assert 1941 <= since_year <= current_year, f'The year should be in range [1941, {current_year}]'
 
-    # Process SSI for retro data
-    df_ssi = get_SSI_data(df_retro)
-    df_ssi_sorted = df_ssi.sort_index()[str(since_year):]
+    # Process SSI for the retro and corrected data in one pass
+    df_ssi = _ssi_by_series(df_retro, df_corrected)[str(since_year):]
 
     fig = go.Figure()
-
-    # Add retro trace
-    fig.add_trace(go.Scatter(
-        x=df_ssi_sorted.index,
-        y=df_ssi_sorted['SSI'],
-        mode='lines+markers',
-        name='Original SSI',
-        marker=dict(symbol='circle', color='blue', size=5),
-        line=dict(color='blue')
-    ))
-
-    # Add corrected trace if provided
-    if df_corrected is not None:
-        df_ssi_corrected = get_SSI_data(df_corrected)
-        df_ssi_corrected_sorted = df_ssi_corrected.sort_index()[str(since_year):]
+    for label, (symbol, color) in SSI_SERIES_STYLES.items():
+        if label not in df_ssi:
+            continue
+        ssi = _valid_span(df_ssi[label])
         fig.add_trace(go.Scatter(
-            x=df_ssi_corrected_sorted.index,
-            y=df_ssi_corrected_sorted['SSI'],
+            x=ssi.index,
+            y=ssi,
             mode='lines+markers',
-            name='Bias-Corrected SSI',
-            marker=dict(symbol='square', color='red', size=5),
-            line=dict(color='red')
+            name=f'{label} SSI',
+            marker=dict(symbol=symbol, color=color, size=5),
+            line=dict(color=color)
         ))
 
     fig.update_layout(
@@ -518,6 +529,7 @@ def plot_ssi_each_month_since_year(since_year=None, df_retro=None, df_corrected=
     return fig
 
 
+@traced()
 def plot_ssi_all_months(df_retro=None, df_corrected=None):
     """
     Plots SSI for all months across years.
@@ -535,13 +547,12 @@ def plot_ssi_all_months(df_retro=None, df_corrected=None):
 
     fig = go.Figure()
 
-    # --- Get all monthly SSI data ---
-    df_ssi_all = get_SSI_data(df_retro)
-    df_ssi_all['year'] = df_ssi_all.index.year
-    df_ssi_all['month'] = df_ssi_all.index.month
+    # --- Get all monthly SSI data, retro and corrected in one pass ---
+    df_ssi_all = _ssi_by_series(df_retro, df_corrected)
+    ssi_original = _valid_span(df_ssi_all["Original"])
 
     # --- Compute yearly average SSI (default visible line) ---
-    yearly_avg = df_ssi_all.groupby('year')['SSI'].mean()
+    yearly_avg = ssi_original.groupby(ssi_original.index.year).mean()
     fig.add_trace(go.Scatter(
         x=yearly_avg.index,
         y=yearly_avg.values,
@@ -552,36 +563,20 @@ def plot_ssi_all_months(df_retro=None, df_corrected=None):
         visible=True
     ))
 
-    # --- Add retro month-specific traces (one value per year per month) ---
-    for month in range(1, 13):
-        df_month = df_ssi_all[df_ssi_all['month'] == month]
-        # Take monthly average per year
-        month_per_year = df_month.groupby('year')['SSI'].mean()
-        fig.add_trace(go.Scatter(
-            x=month_per_year.index,
-            y=month_per_year.values,
-            mode='lines+markers',
-            name=f'Original SSI - {number_to_month[month]}',
-            marker=dict(symbol='circle', size=5),
-            line=dict(color='blue'),
-            visible='legendonly'
-        ))
-
-    # --- Add corrected month-specific traces if provided ---
-    if df_corrected is not None:
-        df_ssi_corr_all = get_SSI_data(df_corrected)
-        df_ssi_corr_all['year'] = df_ssi_corr_all.index.year
-        df_ssi_corr_all['month'] = df_ssi_corr_all.index.month
+    # --- Add month-specific traces (one value per year per month) ---
+    for label, (symbol, color) in SSI_SERIES_STYLES.items():
+        if label not in df_ssi_all:
+            continue
+        ssi = _valid_span(df_ssi_all[label])
         for month in range(1, 13):
-            df_month_corr = df_ssi_corr_all[df_ssi_corr_all['month'] == month]
-            month_per_year_corr = df_month_corr.groupby('year')['SSI'].mean()
+            month_per_year = ssi[ssi.index.month == month]
             fig.add_trace(go.Scatter(
-                x=month_per_year_corr.index,
-                y=month_per_year_corr.values,
+                x=month_per_year.index.year,
+                y=month_per_year.values,
                 mode='lines+markers',
-                name=f'Bias-Corrected SSI - {number_to_month[month]}',
-                marker=dict(symbol='square', size=5),
-                line=dict(color='red'),
+                name=f'{label} SSI - {number_to_month[month]}',
+                marker=dict(symbol=symbol, size=5),
+                line=dict(color=color),
                 visible='legendonly'
             ))
 
@@ -0,0 +1,38 @@
+"""Single-flight locking so each cache key is fetched once at a time.
+
+Concurrent callers that miss the cache for the same key queue on one lock.
+Threads in a process share an in-memory lock, and worker processes sharing
+the workspace are coordinated through an advisory lock file. The first
+caller fetches and fills the cache; the rest wait and then find it warm.
+"""
+import fcntl
+import threading
+from contextlib import contextmanager
+
+_thread_locks = {}
+_thread_locks_guard = threading.Lock()
+
+
+@contextmanager
+def single_flight(lock_path):
+    """Hold the process-wide and cross-process lock identified by lock_path.
+
+    Args:
+        lock_path (str): lock file path; its directory must already exist
+    """
+    with _thread_locks_guard:
+        holder = _thread_locks.setdefault(lock_path, [threading.Lock(), 0])
+        holder[1] += 1
+    try:
+        with holder[0]:
+            with open(lock_path, "a") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+    finally:
+        with _thread_locks_guard:
+            holder[1] -= 1
+            if holder[1] == 0:
+                del _thread_locks[lock_path]
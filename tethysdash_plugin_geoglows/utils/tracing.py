@@ -0,0 +1,194 @@
+"""Stage timing spans for finding where a slow plot spends its time.
+
+Plots.read(), the data loaders, the cache, the bias corrections and the plot
+builders open named spans around their work. Finished spans are handed to the
+sink set with set_span_sink: any callable taking a Span, such as
+``spans.append``, log_span, or opentelemetry_sink(tracer). Setting
+``GEOGLOWS_PLOTS_TRACE=log`` at startup logs every span. With no sink (the
+default) span() returns a shared no-op span, so instrumented code pays one
+global lookup per span.
+
+Spans nest per thread and asyncio task, and prefetch carries the current span
+into its worker threads (see propagate), so a span's parent is the stage that
+started it. Sinks are called from the thread that finished the span and must
+be thread-safe.
+"""
+import contextvars
+import functools
+import logging
+import os
+import time
+
+TRACE_ENV = "GEOGLOWS_PLOTS_TRACE"
+
+logger = logging.getLogger(__name__)
+
+_current_span = contextvars.ContextVar("geoglows_plots_span", default=None)
+_sink = None
+
+
+class Span:
+    """One timed stage. Use it as a context manager; the sink receives it when it ends.
+
+    Attributes:
+        name (str): stage name, e.g. 'plots.read' or 'cache.read'
+        attributes (dict): str, int, float or bool values describing the stage,
+            e.g. the dataset and whether the cache was hit ('cache')
+        parent (Span or None): the span that was current when this one started
+        start_ns (int): wall-clock start, in nanoseconds since the epoch
+        duration_ns (int): elapsed time, measured with a monotonic clock
+    """
+
+    __slots__ = ("name", "attributes", "parent", "start_ns", "duration_ns", "_started", "_token")
+
+    def __init__(self, name, attributes=None):
+        self.name = name
+        self.attributes = attributes or {}
+        self.parent = None
+        self.start_ns = None
+        self.duration_ns = None
+
+    @property
+    def end_ns(self):
+        return self.start_ns + self.duration_ns
+
+    @property
+    def seconds(self):
+        return self.duration_ns / 1e9
+
+    def set_attribute(self, key, value):
+        self.attributes[key] = value
+
+    def __enter__(self):
+        self.parent = _current_span.get()
+        self._token = _current_span.set(self)
+        self.start_ns = time.time_ns()
+        self._started = time.perf_counter_ns()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.duration_ns = time.perf_counter_ns() - self._started
+        _current_span.reset(self._token)
+        if exc_type is not None:
+            self.attributes["error"] = exc_type.__name__
+        sink = _sink
+        if sink is not None:
+            try:
+                sink(self)
+            except Exception:
+                logger.exception("Span sink failed on %s", self.name)
+        return False
+
+
+class _NoopSpan:
+    """Stands in for a Span while tracing is off."""
+
+    __slots__ = ()
+
+    def set_attribute(self, key, value):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def span(name, **attributes):
+    """Return a span timing the with-block it is entered in, or NOOP_SPAN when tracing is off.
+
+    Args:
+        name (str): stage name
+        **attributes: initial attributes of the span
+    """
+    if _sink is None:
+        return NOOP_SPAN
+    return Span(name, attributes)
+
+
+def current_span():
+    """Return the innermost open span of this thread or task, or NOOP_SPAN."""
+    return _current_span.get() or NOOP_SPAN
+
+
+def traced(name=None):
+    """Decorate a function so that each call runs in a span.
+
+    Args:
+        name (str, optional): span name, defaults to '<module>.<function>'
+            with the last part of the module path, e.g. 'simu_plots.plot_retro_fdc'
+    """
+    def decorate(function):
+        span_name = name or f"{function.__module__.rsplit('.', 1)[-1]}.{function.__name__}"
+
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if _sink is None:
+                return function(*args, **kwargs)
+            with Span(span_name):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorate
+
+
+def propagate(function):
+    """Return function bound to the current span, to run it in another thread.
+
+    Unchanged while tracing is off. Bind once per call: the result cannot run
+    in two threads at the same time.
+    """
+    if _sink is None:
+        return function
+    return functools.partial(contextvars.copy_context().run, function)
+
+
+def set_span_sink(sink):
+    """Send finished spans to sink, or stop tracing with None.
+
+    Args:
+        sink (callable or None): called with each finished Span
+
+    Returns:
+        the previous sink, so that callers can restore it
+    """
+    global _sink
+    previous, _sink = _sink, sink
+    return previous
+
+
+def get_span_sink():
+    return _sink
+
+
+def log_span(span):
+    """Sink writing one INFO line per span to this module's logger."""
+    attributes = " ".join(f"{key}={value}" for key, value in span.attributes.items())
+    parent = span.parent.name if span.parent is not None else "-"
+    logger.info("%s %.1f ms parent=%s %s", span.name, span.duration_ns / 1e6, parent, attributes)
+
+
+def opentelemetry_sink(tracer):
+    """Return a sink re-recording finished spans with an OpenTelemetry tracer.
+
+    Each span is exported with its own start and end time and attributes,
+    plus the name of its parent stage in 'parent'; exported spans are not
+    linked to each other.
+
+    Args:
+        tracer: an opentelemetry.trace.Tracer, e.g. trace.get_tracer(__name__)
+    """
+    def export(span):
+        attributes = dict(span.attributes)
+        if span.parent is not None:
+            attributes["parent"] = span.parent.name
+        exported = tracer.start_span(span.name, start_time=span.start_ns, attributes=attributes)
+        exported.end(end_time=span.end_ns)
+    return export
+
+
+if os.environ.get(TRACE_ENV, "").strip().lower() == "log":
+    set_span_sink(log_span)